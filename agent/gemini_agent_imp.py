@@ -1,27 +1,30 @@
-from agent.agent import AgentInterface
-from agent.instruction_template import agent_instruction_template
-from pydantic import SecretStr
 from agno.agent import Agent, RunResponse
-from agno.models.google import Gemini
+from agno.knowledge.document import DocumentKnowledgeBase
 from agno.memory.v2.db.redis import RedisMemoryDb
 from agno.memory.v2.memory import Memory
+from agno.models.google import Gemini
 from agno.storage.redis import RedisStorage
-from agno.knowledge.document import DocumentKnowledgeBase
-from typing import Optional
+from pydantic import SecretStr
+
+from agent.agent import AgentInterface
+from agent.instruction_template import agent_instruction_template
+from core.settings import settings
 from utils.tools.log_tool import log_message
 
 
 class GeminiAgentImp(AgentInterface):
-    _instance: Optional[AgentInterface] = None
+    _instance: AgentInterface | None = None
     _agent = None
-    model: str = "gemini-2.5-flash"
+    model: str = settings.model_default
 
     def __new__(cls):
         if not cls._instance:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    async def initialize(self, key: SecretStr, knowledge_base: DocumentKnowledgeBase) -> None:
+    async def initialize(
+        self, key: SecretStr, knowledge_base: DocumentKnowledgeBase
+    ) -> None:
         """Initialize the agent."""
         try:
             api_key_str = key.get_secret_value()
@@ -32,7 +35,7 @@ class GeminiAgentImp(AgentInterface):
                     port=6379,
                     db=0,
                 ),
-                model=Gemini(id=self.model, api_key=api_key_str),
+                model=Gemini(id=settings.model_memory, api_key=api_key_str),
             )
 
             storage = RedisStorage(
@@ -52,7 +55,7 @@ class GeminiAgentImp(AgentInterface):
                 add_history_to_messages=True,
                 search_knowledge=True,
                 show_tool_calls=True,
-                knowledge=knowledge_base
+                knowledge=knowledge_base,
             )
             log_message("Gemini agent initialized successfully", "INFO")
         except Exception as e:
@@ -63,12 +66,12 @@ class GeminiAgentImp(AgentInterface):
         """Get an answer to a question."""
         if not self._agent:
             log_message(
-                "Agent not initialized. Please call initialize() first.", "ERROR")
+                "Agent not initialized. Please call initialize() first.", "ERROR"
+            )
             return RunResponse(content="Agent not initialized.")
         try:
             response = self._agent.run(question, user_id=user_id)
             return response
         except Exception as e:
-            log_message(
-                f"Error getting answer from Gemini agent: {e}", "ERROR")
+            log_message(f"Error getting answer from Gemini agent: {e}", "ERROR")
             return RunResponse(content="Sorry, I couldn't get an answer.")
@@ -0,0 +1,58 @@
+# Intents that can be answered without calling the LLM.
+# - patterns: regex rules applied to the normalized message (lowercase, no accents).
+#   FAQ rules match the whole message in a question form, so a message that only
+#   mentions the keyword ("meu endereco e...", "ja fiz o pix") goes to the agent
+# - examples: utterances embedded once at startup for nearest-neighbour matching
+# - knowledge_keys: keys searched in the knowledge base to fill the answer template
+# - answer: reply template; "{value}" is replaced by the fact found in the knowledge base
+intent_templates = {
+    "saudacao": {
+        "patterns": [
+            r"^(oi+|ola|opa|e ai|eai|bom dia|boa tarde|boa noite|hey|hello)( tudo (bem|bom|certo))?( pessoal)?$",
+        ],
+        "examples": ["oi", "ola, tudo bem?", "bom dia", "boa noite pessoal"],
+        "knowledge_keys": [],
+        "answer": "Olá, seja bem vindo ao Espeto do Vale. Como posso te ajudar hoje?",
+    },
+    "agradecimento": {
+        "patterns": [
+            r"^(muito )?(obrigad[oa]|brigad[oa]|valeu|vlw|agradeco|obg)( mesmo| demais| pela ajuda)?$",
+        ],
+        "examples": ["obrigado", "valeu!", "muito obrigada pela ajuda"],
+        "knowledge_keys": [],
+        "answer": "Nós que agradecemos! Se precisar de algo mais, é só chamar.",
+    },
+    "endereco": {
+        "patterns": [
+            r"^(qual|qual e|me passa|me manda|passa|manda)( o| a)?( seu| sua)? (endereco|localizacao)( de voces| da loja| do espeto)?$",
+            r"^(onde|aonde) (fica|ficam|voces ficam|voces estao|e o espeto|e a loja|fica o espeto|fica a loja)( localizados?)?$",
+            r"^como (chego|faco para chegar|faco pra chegar)( ai| la| ate voces)?$",
+        ],
+        "examples": ["qual o endereço?", "onde vocês ficam?", "como chego aí?"],
+        "knowledge_keys": ["endereco", "localizacao", "address"],
+        "answer": "Nosso endereço é: {value}",
+    },
+    "horario": {
+        "patterns": [
+            r"^(qual|quais)( e| sao)?( o| os)? (horario|horarios)( de funcionamento| de atendimento)?( de voces| da loja| hoje)?$",
+            r"^(a )?que horas (voces )?(abre|abrem|fecha|fecham)( hoje)?$",
+            r"^(voces )?(esta|estao|ta|tao) abertos?( hoje| agora)?$",
+        ],
+        "examples": [
+            "qual o horário de funcionamento?",
+            "que horas vocês abrem?",
+            "está aberto hoje?",
+        ],
+        "knowledge_keys": ["horario", "funcionamento", "opening_hours"],
+        "answer": "Nosso horário de funcionamento é: {value}",
+    },
+    "pix": {
+        "patterns": [
+            r"^(qual|qual e|me passa|me manda|passa|manda)( a| o)?( sua| seu)? (chave )?pix( de voces| da loja)?$",
+            r"^(voces )?(aceita|aceitam) pix$",
+        ],
+        "examples": ["qual a chave pix?", "aceita pix?", "me passa o pix"],
+        "knowledge_keys": ["pix", "chave_pix"],
+        "answer": "Nossa chave Pix é: {value}",
+    },
+}
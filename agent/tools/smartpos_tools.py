@@ -0,0 +1,65 @@
+"""
+Agent tools backed by the local SmartPOS catalogue snapshot.
+
+They read the in-memory index kept by CatalogueService, so checking a price or
+the stock of a product costs a dict lookup instead of a knowledge search.
+"""
+
+import json
+from collections.abc import Callable
+
+from services.catalogue_service import CatalogueService, format_price
+
+
+def check_product(product: str) -> str:
+    """
+    Looks up a product of the menu by name or SKU and returns its price and
+    whether it is available today. Use it for any question about prices,
+    availability or stock of a menu item.
+
+    Args:
+        product: Product name (for example "espeto de picanha") or SKU.
+    """
+    service = CatalogueService()
+    found = service.lookup(product)
+    if found is None:
+        return json.dumps({"found": False, "query": product}, ensure_ascii=False)
+    return json.dumps(
+        {
+            "found": True,
+            "sku": found.sku,
+            "name": found.name,
+            "price": format_price(found.price),
+            "available": found.available,
+            "stock": found.stock,
+            "category": found.category,
+            "up_to_date": service.is_fresh,
+        },
+        ensure_ascii=False,
+    )
+
+
+def list_products(category: str = "") -> str:
+    """
+    Lists the products available today with their prices, optionally only
+    those of one category (for example "espetos" or "bebidas").
+
+    Args:
+        category: Category to filter by; empty for the whole menu.
+    """
+    wanted = category.strip().lower()
+    products = [
+        {
+            "name": product.name,
+            "price": format_price(product.price),
+            "category": product.category,
+        }
+        for product in CatalogueService().index.by_sku.values()
+        if product.available
+        and (not wanted or (product.category or "").lower() == wanted)
+    ]
+    return json.dumps(products, ensure_ascii=False)
+
+
+def catalogue_tools() -> list[Callable[..., str]]:
+    return [check_product, list_products]
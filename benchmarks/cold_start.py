@@ -0,0 +1,199 @@
+"""
+Cold start benchmark: import time of `main` and time to first request.
+
+Each run starts a fresh Python process. The import run measures `import main`
+and lists the heavy dependencies it pulled in (they should all be deferred to
+first use). The serve run starts uvicorn with the stub Telegram API (polling
+mode) and unreachable Redis/Postgres, and measures the time from process
+start until /health/live answers, along with the per-phase startup report
+exported on /metrics.
+
+Usage:
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --runs 3 --max-seconds 5  # exits 1 on regression
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any
+
+import httpx
+
+from benchmarks.fakes import StubTelegramServer
+from benchmarks.replay import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = (
+    "agno",
+    "google.genai",
+    "langchain_community",
+    "langchain_core",
+    "pyngrok",
+    "asyncpg",
+    "pypdf",
+)
+PHASE_PATTERN = re.compile(
+    r'^espetos_startup_phase_seconds\{phase="([^"]+)"\} (\S+)$', re.MULTILINE
+)
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "modules": len(sys.modules), "heavy_modules": heavy}}))
+"""
+
+
+def benchmark_env(telegram_url: str) -> dict[str, str]:
+    """
+    Environment for a self-contained app: polling against the stub Telegram
+    API, no tracing, no embeddings and nothing listening on the database ports.
+    """
+    env = dict(os.environ)
+    env.update(
+        {
+            "TELEGRAM_UPDATE_MODE": "polling",
+            "TELEGRAM_API_URL": telegram_url,
+            "TELEGRAM_BOT_TOKEN": "benchmark",
+            "UPDATE_DISPATCH_MODE": "inline",
+            "TRACING_ENABLED": "false",
+            "INTENT_EMBEDDINGS_ENABLED": "false",
+            "NOTION_TOKEN": "",
+            "REDIS_PORT": "1",
+            "POSTGRES_PORT": "1",
+            "HEALTH_PROBE_TIMEOUT": "0.2",
+        }
+    )
+    return env
+
+
+def measure_import(env: dict[str, str] | None = None) -> dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_request(env: dict[str, str], timeout: float = 60.0) -> dict[str, Any]:
+    """
+    Starts the app under uvicorn and polls /health/live until it answers.
+    """
+    port = StubTelegramServer._free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(
+                        f"App exited with code {process.returncode} before serving"
+                    )
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"App did not serve a request within {timeout}s")
+                try:
+                    if client.get("/health/live").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+            elapsed = time.perf_counter() - started
+            metrics = client.get("/metrics").text
+        phases = {
+            name: round(float(value) * 1000, 1)
+            for name, value in PHASE_PATTERN.findall(metrics)
+        }
+        return {"seconds": elapsed, "phases_ms": phases}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_benchmark(runs: int = 3) -> dict[str, Any]:
+    telegram = StubTelegramServer().start()
+    try:
+        env = benchmark_env(telegram.url)
+        imports = [measure_import(env) for _ in range(runs)]
+        first_requests = [measure_first_request(env) for _ in range(runs)]
+    finally:
+        telegram.stop()
+    import_times = [run["seconds"] for run in imports]
+    ttfr = [run["seconds"] for run in first_requests]
+    return {
+        "runs": runs,
+        "import_ms": {
+            "p50": round(percentile(import_times, 50) * 1000, 1),
+            "max": round(max(import_times) * 1000, 1),
+        },
+        "modules_after_import": imports[-1]["modules"],
+        "heavy_modules_imported": imports[-1]["heavy_modules"],
+        "time_to_first_request_ms": {
+            "p50": round(percentile(ttfr, 50) * 1000, 1),
+            "max": round(max(ttfr) * 1000, 1),
+        },
+        "startup_phases_ms": first_requests[-1]["phases_ms"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--runs", type=int, default=3, help="fresh processes per measurement"
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=0.0,
+        help="fail when the median time to first request exceeds this (0 = no budget)",
+    )
+    args = parser.parse_args()
+    report = run_benchmark(args.runs)
+    print(json.dumps(report, indent=2))
+    failures: list[str] = []
+    if report["heavy_modules_imported"]:
+        failures.append(
+            f"heavy modules imported eagerly: {report['heavy_modules_imported']}"
+        )
+    if (
+        args.max_seconds
+        and report["time_to_first_request_ms"]["p50"] > args.max_seconds * 1000
+    ):
+        failures.append(f"time to first request above {args.max_seconds}s")
+    if failures:
+        print("; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""
+Local stand-ins for the external services used by the webhook -> agent -> reply path.
+"""
+
+import asyncio
+import socket
+import threading
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any
+
+import uvicorn
+from agno.exceptions import ModelProviderError
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FakeGemini:
+    """
+    Fake agent with a configurable time-to-first-token and token rate.
+
+    `run` blocks like the synchronous agno `Agent.run`, `arun` yields to the loop.
+    Every `fail_every`th call fails with a provider 503 and every `slow_every`th
+    call takes `slow_latency` seconds instead, to exercise retries and hedging.
+    """
+
+    latency: float = 0.5
+    tokens_per_second: float = 200.0
+    answer_tokens: int = 60
+    fail_every: int = 0
+    slow_every: int = 0
+    slow_latency: float = 5.0
+    calls: int = 0
+
+    def _start(self) -> tuple[int, float]:
+        self.calls += 1
+        generation = (
+            self.answer_tokens / self.tokens_per_second
+            if self.tokens_per_second
+            else 0.0
+        )
+        latency = (
+            self.slow_latency
+            if self.slow_every and self.calls % self.slow_every == 0
+            else self.latency
+        )
+        return self.calls, latency + generation
+
+    def _response(self, call: int, message: str) -> Any:
+        if self.fail_every and call % self.fail_every == 0:
+            raise ModelProviderError(
+                "Fake Gemini injected failure", status_code=503, model_id="fake-gemini"
+            )
+        content = " ".join(["espeto"] * self.answer_tokens)
+        return SimpleNamespace(
+            content=content, tools=[], model="fake-gemini", input=message
+        )
+
+    def run(self, message: str, **kwargs) -> Any:
+        call, duration = self._start()
+        time.sleep(duration)
+        return self._response(call, message)
+
+    async def arun(self, message: str, **kwargs) -> Any:
+        call, duration = self._start()
+        await asyncio.sleep(duration)
+        return self._response(call, message)
+
+
+@dataclass
+class FakeRedis:
+    """
+    Minimal async Redis stand-in with configurable latency.
+    """
+
+    latency: float = 0.0005
+    data: dict[str, Any] = field(default_factory=dict)
+
+    async def ping(self) -> bool:
+        await asyncio.sleep(self.latency)
+        return True
+
+    async def get(self, key: str) -> Any:
+        await asyncio.sleep(self.latency)
+        return self.data.get(key)
+
+    async def set(self, key: str, value: Any, **kwargs) -> bool:
+        await asyncio.sleep(self.latency)
+        if kwargs.get("nx") and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    async def close(self) -> None:
+        return None
+
+    async def aclose(self) -> None:
+        return None
+
+
+@dataclass
+class FakePostgresConnection:
+    """
+    Minimal asyncpg connection stand-in with configurable latency.
+    """
+
+    latency: float = 0.001
+
+    async def fetchval(self, query: str, *args) -> Any:
+        await asyncio.sleep(self.latency)
+        return 1
+
+    async def close(self) -> None:
+        return None
+
+
+@dataclass
+class FakePostgresPool:
+    """
+    Minimal asyncpg pool stand-in handing out `FakePostgresConnection`s.
+    """
+
+    latency: float = 0.001
+    acquired: int = 0
+
+    @asynccontextmanager
+    async def acquire(
+        self, timeout: float | None = None
+    ) -> AsyncIterator[FakePostgresConnection]:
+        self.acquired += 1
+        yield FakePostgresConnection(latency=self.latency)
+
+    async def close(self) -> None:
+        return None
+
+
+class StubServer:
+    """
+    FastAPI app served by uvicorn on a local port in a background thread.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int | None = None):
+        self.host = host
+        self.port = port or self._free_port()
+        self.app = self._build_app()
+        self._server: uvicorn.Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def _build_app(self) -> FastAPI:
+        raise NotImplementedError
+
+    def start(self) -> "StubServer":
+        config = uvicorn.Config(
+            self.app,
+            host=self.host,
+            port=self.port,
+            log_level="warning",
+            lifespan="off",
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{type(self).__name__} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+
+class StubTelegramServer(StubServer):
+    """
+    Telegram Bot API stub.
+
+    Updates queued with `enqueue_update` are served to getUpdates long polls,
+    and every sendMessage is recorded with its `time.perf_counter()` timestamp.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, host: str = "127.0.0.1", port: int | None = None
+    ):
+        self.latency = latency
+        self.sent_messages: list[dict[str, Any]] = []
+        self.sent_at: list[float] = []
+        self.updates: list[dict[str, Any]] = []
+        self._updates_lock = threading.Lock()
+        super().__init__(host, port)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/bot{token}/sendMessage")
+        async def send_message(token: str, request: Request):
+            payload = await request.json()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self.sent_messages.append(payload)
+            self.sent_at.append(time.perf_counter())
+            return {
+                "ok": True,
+                "result": {
+                    "message_id": len(self.sent_messages),
+                    "chat": {"id": payload.get("chat_id")},
+                },
+            }
+
+        @app.post("/bot{token}/setWebhook")
+        async def set_webhook(token: str):
+            return {"ok": True, "result": True}
+
+        @app.post("/bot{token}/deleteWebhook")
+        async def delete_webhook(token: str):
+            return {"ok": True, "result": True}
+
+        @app.post("/bot{token}/getUpdates")
+        async def get_updates(token: str, request: Request):
+            payload = await request.json()
+            offset = payload.get("offset", 0)
+            limit = payload.get("limit", 100)
+            deadline = time.monotonic() + payload.get("timeout", 0)
+            while True:
+                with self._updates_lock:
+                    # Confirmed updates (below the offset) are dropped, like Telegram does
+                    self.updates = [
+                        update
+                        for update in self.updates
+                        if update["update_id"] >= offset
+                    ]
+                    batch = self.updates[:limit]
+                if batch or time.monotonic() >= deadline:
+                    return {"ok": True, "result": batch}
+                await asyncio.sleep(0.005)
+
+        @app.get("/bot{token}/getMe")
+        async def get_me(token: str):
+            return {
+                "ok": True,
+                "result": {
+                    "id": 1,
+                    "is_bot": True,
+                    "first_name": "Stub",
+                    "username": "stub_bot",
+                },
+            }
+
+        return app
+
+    def enqueue_update(self, update: dict[str, Any]) -> None:
+        with self._updates_lock:
+            self.updates.append(update)
+
+
+class StubGraphAPIServer(StubServer):
+    """
+    WhatsApp Cloud API (Graph API) stub.
+
+    Every message sent to POST /{version}/{phone_number_id}/messages with the
+    expected bearer token is recorded with its `time.perf_counter()` timestamp.
+    """
+
+    def __init__(
+        self,
+        access_token: str = "graph-test-token",
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int | None = None,
+    ):
+        self.access_token = access_token
+        self.latency = latency
+        self.sent_messages: list[dict[str, Any]] = []
+        self.sent_at: list[float] = []
+        super().__init__(host, port)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/{version}/{phone_number_id}/messages")
+        async def send_message(version: str, phone_number_id: str, request: Request):
+            if request.headers.get("authorization") != f"Bearer {self.access_token}":
+                return JSONResponse(
+                    {
+                        "error": {
+                            "message": "Invalid OAuth access token",
+                            "type": "OAuthException",
+                            "code": 190,
+                        }
+                    },
+                    status_code=401,
+                )
+            payload = await request.json()
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self.sent_messages.append(dict(payload, phone_number_id=phone_number_id))
+            self.sent_at.append(time.perf_counter())
+            return {
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": payload.get("to"), "wa_id": payload.get("to")}],
+                "messages": [{"id": f"wamid.stub{len(self.sent_messages)}"}],
+            }
+
+        return app
+
+
+SAMPLE_CATALOGUE: list[dict[str, Any]] = [
+    {
+        "sku": "ESP-001",
+        "name": "Espeto de Picanha",
+        "price": 14.0,
+        "stock": 40,
+        "category": "espetos",
+    },
+    {
+        "sku": "ESP-002",
+        "name": "Espeto de Frango",
+        "price": 9.5,
+        "stock": 60,
+        "category": "espetos",
+    },
+    {
+        "sku": "ESP-003",
+        "name": "Espeto de Coração de Frango",
+        "price": 10.0,
+        "stock": 0,
+        "category": "espetos",
+    },
+    {
+        "sku": "ESP-004",
+        "name": "Espeto de Linguiça",
+        "price": 9.0,
+        "stock": 25,
+        "category": "espetos",
+    },
+    {
+        "sku": "ESP-005",
+        "name": "Espeto de Queijo Coalho",
+        "price": 8.0,
+        "stock": 30,
+        "category": "espetos",
+    },
+    {
+        "sku": "BEB-001",
+        "name": "Refrigerante Lata",
+        "price": 6.0,
+        "stock": 120,
+        "category": "bebidas",
+    },
+    {
+        "sku": "BEB-002",
+        "name": "Cerveja Long Neck",
+        "price": 10.0,
+        "stock": None,
+        "category": "bebidas",
+    },
+    {
+        "sku": "ACO-001",
+        "name": "Farofa",
+        "price": 5.0,
+        "stock": 15,
+        "category": "acompanhamentos",
+        "active": False,
+    },
+]
+
+
+class FakeSmartPOSServer(StubServer):
+    """
+    SmartPOS product API stub: GET /v1/products with bearer authentication and
+    page/page_size pagination. `products` can be changed between syncs, and
+    every request is counted in `requests`.
+    """
+
+    def __init__(
+        self,
+        products: list[dict[str, Any]] | None = None,
+        api_key: str = "smartpos-test-key",
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int | None = None,
+    ):
+        self.products = [
+            dict(product)
+            for product in (products if products is not None else SAMPLE_CATALOGUE)
+        ]
+        self.api_key = api_key
+        self.latency = latency
+        self.requests = 0
+        self.fail = False
+        super().__init__(host, port)
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/v1/products")
+        async def products(request: Request, page: int = 1, page_size: int = 100):
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.fail:
+                return JSONResponse({"error": "unavailable"}, status_code=503)
+            if request.headers.get("authorization") != f"Bearer {self.api_key}":
+                return JSONResponse({"error": "unauthorized"}, status_code=401)
+            total_pages = max(1, -(-len(self.products) // page_size))
+            start = (page - 1) * page_size
+            return {
+                "data": self.products[start : start + page_size],
+                "page": page,
+                "total_pages": total_pages,
+            }
+
+        return app
+
+    def set_stock(self, sku: str, stock: float | None) -> None:
+        for product in self.products:
+            if product["sku"] == sku:
+                product["stock"] = stock
@@ -0,0 +1,215 @@
+"""
+Micro-benchmark of the Notion metadata flattening and document conversion.
+
+Builds a synthetic Notion export (pages with rich, date, people, relation and
+deeply nested rollup properties) and compares:
+
+- flattening time of the previous recursive `data_handler`, which copies
+  every nested level into its parent, with the current single-pass one;
+- peak memory of converting the whole export into a list before ingestion
+  with the generator pipeline that hands documents over one at a time, and
+  with `StreamingDocumentKnowledgeBase`, which streams the pages but keeps the
+  converted documents for later passes. Only the raw pages are saved there;
+  the converted documents stay in memory.
+
+Usage:
+    python -m benchmarks.notion_flatten --pages 2000 --depth 8
+    python -m benchmarks.notion_flatten --pages 500 --properties Name,Preço
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from datetime import date, datetime
+from typing import Any
+
+from langchain_core.documents.base import Document
+
+from core.instrumentation import StreamingDocumentKnowledgeBase
+from utils.handlers.metadata_handler import data_handler, parse_properties
+from utils.handlers.to_agnodoc_handler import iter_agnodocs
+
+
+def recursive_data_handler(data: Any, parent_key: str = "") -> dict[str, Any]:
+    """The previous recursive flattener, kept as the baseline."""
+    if not data:
+        return {}
+    cleaned_data: dict[str, Any] = {}
+    if isinstance(data, dict):
+        if "start" in data or "end" in data:
+            if data.get("start"):
+                cleaned_data[f"{parent_key}_start"] = str(data["start"])
+            if data.get("end"):
+                cleaned_data[f"{parent_key}_end"] = str(data["end"])
+            return cleaned_data
+        for key, value in data.items():
+            cleaned_data.update(
+                recursive_data_handler(
+                    value, f"{parent_key}_{key}" if parent_key else key
+                )
+            )
+        return cleaned_data
+    if isinstance(data, list):
+        for index, item in enumerate(data):
+            cleaned_data.update(
+                recursive_data_handler(
+                    item, f"{parent_key}_{index}" if parent_key else str(index)
+                )
+            )
+        return cleaned_data
+    if isinstance(data, (datetime, date)):
+        if parent_key:
+            cleaned_data[parent_key] = data.isoformat()
+        return cleaned_data
+    if parent_key:
+        cleaned_data[parent_key] = data
+    return cleaned_data
+
+
+def nested_rollup(depth: int, width: int, seed: int) -> Any:
+    if depth == 0:
+        return f"valor {seed}"
+    return {
+        f"n{index}": nested_rollup(depth - 1, width, seed + index)
+        for index in range(width)
+    }
+
+
+def synthetic_metadata(page: int, depth: int, width: int) -> dict[str, Any]:
+    return {
+        "id": f"page-{page}",
+        "Name": f"Espeto {page}",
+        "Preço": 10 + page % 30,
+        "Categoria": ["espetos", "carnes"] if page % 2 else ["bebidas"],
+        "Disponível": page % 3 != 0,
+        "Atualizado": {"start": date(2025, 1, 1 + page % 28), "end": None},
+        "Responsável": [
+            {"name": f"Pessoa {page % 7}", "email": f"p{page % 7}@example.com"}
+        ],
+        "Relacionados": [{"id": f"page-{page + offset}"} for offset in range(1, 4)],
+        "Rollup": nested_rollup(depth, width, page),
+    }
+
+
+def synthetic_export(
+    pages: int, depth: int, width: int, content_size: int
+) -> Iterator[Document]:
+    content = "Espeto assado na brasa. " * max(1, content_size // 24)
+    for page in range(pages):
+        yield Document(
+            id=f"page-{page}",
+            page_content=content,
+            metadata=synthetic_metadata(page, depth, width),
+        )
+
+
+def time_flatten(
+    handler: Callable[[Any], dict[str, Any]], metadata: list[dict[str, Any]]
+) -> float:
+    started = time.perf_counter()
+    for item in metadata:
+        handler(item)
+    return time.perf_counter() - started
+
+
+def peak_memory(run: Callable[[], int]) -> dict[str, float]:
+    tracemalloc.start()
+    try:
+        documents = run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"documents": documents, "peak_mb": round(peak / 1024 / 1024, 2)}
+
+
+def run_benchmark(
+    pages: int = 1000,
+    depth: int = 6,
+    width: int = 3,
+    content_size: int = 2000,
+    properties: list[str] | None = None,
+) -> dict[str, Any]:
+    metadata = [synthetic_metadata(page, depth, width) for page in range(pages)]
+    recursive = time_flatten(recursive_data_handler, metadata)
+    iterative = time_flatten(data_handler, metadata)
+    whitelisted = time_flatten(
+        lambda item: data_handler(item, properties=properties), metadata
+    )
+    del metadata
+
+    def as_list() -> int:
+        loaded = list(synthetic_export(pages, depth, width, content_size))
+        converted = list(iter_agnodocs(loaded, properties))
+        return len(converted)
+
+    def as_stream() -> int:
+        # Each document is dropped once consumed, as chunking/embedding would
+        return sum(
+            1
+            for _ in iter_agnodocs(
+                synthetic_export(pages, depth, width, content_size), properties
+            )
+        )
+
+    def as_knowledge_base() -> int:
+        knowledge_base = StreamingDocumentKnowledgeBase()
+        knowledge_base.stream_from(
+            iter_agnodocs(
+                synthetic_export(pages, depth, width, content_size), properties
+            )
+        )
+        return sum(len(documents) for documents in knowledge_base.document_lists)
+
+    return {
+        "pages": pages,
+        "depth": depth,
+        "width": width,
+        "keys_per_page": len(data_handler(synthetic_metadata(0, depth, width))),
+        "flatten_ms": {
+            "recursive": round(recursive * 1000, 2),
+            "iterative": round(iterative * 1000, 2),
+            "iterative_whitelist": round(whitelisted * 1000, 2) if properties else None,
+            "speedup": round(recursive / iterative, 2) if iterative else None,
+        },
+        "conversion_memory": {
+            "list": peak_memory(as_list),
+            "generator": peak_memory(as_stream),
+            "knowledge_base": peak_memory(as_knowledge_base),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--pages", type=int, default=1000, help="pages in the synthetic export"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=6, help="nesting depth of the rollup property"
+    )
+    parser.add_argument(
+        "--width", type=int, default=3, help="children per nested level"
+    )
+    parser.add_argument(
+        "--content-size", type=int, default=2000, help="page content size (characters)"
+    )
+    parser.add_argument(
+        "--properties", default="", help="comma separated property whitelist"
+    )
+    args = parser.parse_args()
+    report = run_benchmark(
+        args.pages,
+        args.depth,
+        args.width,
+        args.content_size,
+        parse_properties(args.properties),
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+"""
+Replay-based load test of the update -> agent -> reply path.
+
+Replays recorded Telegram updates against the FastAPI app at a fixed rate,
+with a fake Gemini, a stub Telegram HTTP server and fake (or local) Redis and
+Postgres, and reports latency percentiles, throughput, error rate and
+event-loop lag. In webhook mode updates are POSTed to /webhook/telegram; in
+polling mode they are queued on the stub and fetched by the getUpdates poller,
+and latency is measured from enqueue to the matching sendMessage.
+
+Usage:
+    python -m benchmarks.replay --rate 20 --count 200 --llm-latency 0.8
+    python -m benchmarks.replay --payloads requests.jsonl --backends local
+    python -m benchmarks.replay --mode polling --rate 20 --count 200
+    python -m benchmarks.replay --llm-slow-every 20 --llm-fail-every 15 --hedging
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import math
+import os
+import time
+from typing import Any
+
+import httpx
+
+from benchmarks.fakes import FakeGemini, FakePostgresPool, FakeRedis, StubTelegramServer
+from core.metrics import llm_calls
+from core.settings import settings
+
+DEFAULT_PAYLOADS = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "payloads", "telegram_updates.jsonl"
+)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of an unsorted list.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_payloads(path: str) -> list[dict[str, Any]]:
+    """
+    Loads recorded Telegram updates. Lines that only carry a "text" field are
+    wrapped into a private-chat update.
+    """
+    payloads: list[dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as file:
+        for index, line in enumerate(file):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "message" in record or "edited_message" in record:
+                payloads.append(record)
+            elif isinstance(record.get("text"), str):
+                chat_id = 1000 + index % 10
+                payloads.append(
+                    {
+                        "update_id": index,
+                        "message": {
+                            "message_id": index,
+                            "date": int(time.time()),
+                            "chat": {"id": chat_id, "type": "private"},
+                            "from": {
+                                "id": chat_id,
+                                "is_bot": False,
+                                "first_name": "Bench",
+                            },
+                            "text": record["text"],
+                        },
+                    }
+                )
+    if not payloads:
+        raise ValueError(f"No Telegram updates found in {path}")
+    return payloads
+
+
+async def measure_loop_lag(
+    samples: list[float], stop: asyncio.Event, interval: float = 0.01
+) -> None:
+    """
+    Records how late the event loop wakes up a task sleeping for `interval`.
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+
+async def setup_app(
+    fake_gemini: FakeGemini,
+    telegram_url: str,
+    redis_client: Any,
+    postgres_pool: Any,
+    webhook_url: str | None = "http://benchmark/webhook/telegram",
+):
+    """
+    Wires the services on the app state the same way `startup_event` does,
+    without ngrok, Notion or pgvector.
+    """
+    from main import app
+    from services.admission_service import AdmissionService
+    from services.health_service import HealthService
+    from services.knowledge_service import KnowledgeService
+    from services.telegram_service import TelegramService
+    from services.update_service import UpdateService
+    from services.user_request_service import UserRequestService
+
+    settings.telegram_api_url = telegram_url
+    knowledge_service = KnowledgeService()
+    health_service = HealthService()
+    await health_service.initialize(
+        redis_client=redis_client,
+        postgres_pool=postgres_pool,
+        knowledge_service=knowledge_service,
+        interval=settings.health_probe_interval,
+        timeout=settings.health_probe_timeout,
+        max_staleness=settings.health_max_staleness,
+        max_queue_depth=settings.readiness_max_queue_depth,
+    )
+    await health_service.start()
+    admission_service = AdmissionService()
+    await admission_service.initialize(
+        max_in_flight=settings.admission_max_in_flight,
+        max_waiting=settings.admission_max_waiting,
+        max_wait=settings.admission_max_wait,
+        queue_wait_threshold=settings.admission_queue_wait_threshold,
+        llm_latency_threshold=settings.admission_llm_latency_threshold,
+        max_deferred=settings.admission_max_deferred,
+    )
+    user_request_service = UserRequestService()
+    await user_request_service.initialize(
+        knowledge_service,
+        admission_service=admission_service if settings.admission_enabled else None,
+    )
+
+    async def get_fake_agent(model_id: str | None = None, agentic_memory: bool = True):
+        return fake_gemini
+
+    user_request_service.get_classic_agent = get_fake_agent
+    telegram_service = TelegramService()
+    await telegram_service.initialize(token="benchmark", webhook_url=webhook_url)
+    update_service = UpdateService()
+    await update_service.initialize(user_request_service, telegram_service)
+
+    app.state.knowledge_service = knowledge_service
+    app.state.health_service = health_service
+    app.state.user_request_service = user_request_service
+    app.state.telegram_service = telegram_service
+    app.state.update_service = update_service
+    return app
+
+
+async def run_benchmark(
+    payloads: list[dict[str, Any]],
+    rate: float,
+    count: int,
+    fake_gemini: FakeGemini,
+    telegram_url: str,
+    health_interval: float = 0.0,
+    redis_client: Any = None,
+    postgres_pool: Any = None,
+) -> dict[str, Any]:
+    """
+    Sends `count` updates at `rate` per second (open loop) and returns the report.
+    """
+    app = await setup_app(
+        fake_gemini,
+        telegram_url,
+        redis_client=redis_client or FakeRedis(),
+        postgres_pool=postgres_pool or FakePostgresPool(),
+    )
+    latencies: list[float] = []
+    health_latencies: list[float] = []
+    lag_samples: list[float] = []
+    errors = 0
+    stop = asyncio.Event()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=120
+    ) as client:
+
+        async def send(index: int) -> None:
+            nonlocal errors
+            payload = copy.deepcopy(payloads[index % len(payloads)])
+            payload["update_id"] = payload.get("update_id", 0) * 10000 + index
+            start = time.perf_counter()
+            try:
+                response = await client.post("/webhook/telegram", json=payload)
+                if response.status_code != 200 or response.json().get("status") != "ok":
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+        async def probe_health() -> None:
+            while not stop.is_set():
+                start = time.perf_counter()
+                with contextlib.suppress(httpx.HTTPError):
+                    await client.get("/health/")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(health_interval)
+
+        lag_task = asyncio.create_task(measure_loop_lag(lag_samples, stop))
+        health_task = (
+            asyncio.create_task(probe_health()) if health_interval > 0 else None
+        )
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = []
+        for index in range(count):
+            delay = started + index / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(index)))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+        stop.set()
+        await lag_task
+        if health_task:
+            await health_task
+        await app.state.health_service.stop()
+
+    report = build_report(
+        count, rate, elapsed, errors, latencies, lag_samples, fake_gemini
+    )
+    report["health_p95_ms"] = (
+        round(percentile(health_latencies, 95) * 1000, 2) if health_latencies else None
+    )
+    return report
+
+
+async def run_polling_benchmark(
+    payloads: list[dict[str, Any]],
+    rate: float,
+    count: int,
+    fake_gemini: FakeGemini,
+    telegram: StubTelegramServer,
+    redis_client: Any = None,
+    postgres_pool: Any = None,
+    drain_timeout: float = 120.0,
+) -> dict[str, Any]:
+    """
+    Queues `count` updates on the stub at `rate` per second, lets the
+    getUpdates poller consume them and returns the report. Every replayed
+    update is expected to produce one reply; replies are matched to updates in
+    order within each chat.
+    """
+    from services.telegram_poller import TelegramPoller
+
+    app = await setup_app(
+        fake_gemini,
+        telegram.url,
+        redis_client=redis_client or FakeRedis(),
+        postgres_pool=postgres_pool or FakePostgresPool(),
+        webhook_url=None,
+    )
+    poller = TelegramPoller()
+    await poller.initialize(
+        telegram_service=app.state.telegram_service,
+        update_service=app.state.update_service,
+        timeout=1,
+        limit=settings.telegram_polling_limit,
+        concurrency=settings.telegram_polling_concurrency,
+    )
+    app.state.telegram_poller = poller
+    already_sent = len(telegram.sent_messages)
+    enqueued_at: dict[Any, list[float]] = {}
+    lag_samples: list[float] = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lag_samples, stop))
+    await poller.start()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    for index in range(count):
+        delay = started + index / rate - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        payload = copy.deepcopy(payloads[index % len(payloads)])
+        payload["update_id"] = index + 1
+        chat_id = (
+            (payload.get("message") or payload.get("edited_message") or {})
+            .get("chat", {})
+            .get("id")
+        )
+        enqueued_at.setdefault(chat_id, []).append(time.perf_counter())
+        telegram.enqueue_update(payload)
+    deadline = loop.time() + drain_timeout
+    while len(replies_sent(telegram, already_sent)) < count and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = loop.time() - started
+    stop.set()
+    await lag_task
+    await poller.stop()
+    await app.state.health_service.stop()
+    await app.state.telegram_service.close()
+
+    latencies: list[float] = []
+    for message, sent_at in replies_sent(telegram, already_sent):
+        pending = enqueued_at.get(message.get("chat_id"))
+        if pending:
+            latencies.append(sent_at - pending.pop(0))
+    errors = count - len(latencies)
+    return build_report(
+        count, rate, elapsed, errors, latencies, lag_samples, fake_gemini
+    )
+
+
+def replies_sent(
+    telegram: StubTelegramServer, start: int = 0
+) -> list[tuple[dict[str, Any], float]]:
+    """
+    Messages sent from index `start` and when, leaving out the busy notices
+    sent to requests waiting for an agent slot.
+    """
+    return [
+        (message, sent_at)
+        for message, sent_at in zip(
+            telegram.sent_messages[start:], telegram.sent_at[start:]
+        )
+        if message.get("text") != settings.admission_busy_message
+    ]
+
+
+def build_report(
+    count: int,
+    rate: float,
+    elapsed: float,
+    errors: int,
+    latencies: list[float],
+    lag_samples: list[float],
+    fake_gemini: FakeGemini,
+) -> dict[str, Any]:
+    return {
+        "requests": count,
+        "target_rate": rate,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+        },
+        "event_loop_lag_ms": {
+            "p50": round(percentile(lag_samples, 50) * 1000, 2),
+            "p99": round(percentile(lag_samples, 99) * 1000, 2),
+            "max": round(max(lag_samples, default=0.0) * 1000, 2),
+        },
+        "llm_calls": fake_gemini.calls,
+        "llm_outcomes": llm_outcomes(),
+    }
+
+
+def llm_outcomes() -> dict[str, int]:
+    """Model call outcomes (success, retry, hedged, ...) summed over the model tiers."""
+    outcomes: dict[str, int] = {}
+    for (_, outcome), value in list(llm_calls._values.items()):
+        outcomes[outcome] = outcomes.get(outcome, 0) + int(value)
+    return dict(sorted(outcomes.items()))
+
+
+async def create_backends(kind: str, redis_latency: float, postgres_latency: float):
+    """
+    Returns in-memory fakes or the local Redis client and Postgres pool.
+    """
+    if kind == "local":
+        from core.pools import create_postgres_pool, create_redis_client
+
+        return create_redis_client(), await create_postgres_pool()
+    return FakeRedis(latency=redis_latency), FakePostgresPool(latency=postgres_latency)
+
+
+async def run_with_backends(
+    args: argparse.Namespace,
+    fake_gemini: FakeGemini,
+    telegram: StubTelegramServer,
+) -> dict[str, Any]:
+    redis_client, postgres_pool = await create_backends(
+        args.backends, args.redis_latency, args.postgres_latency
+    )
+    try:
+        if args.mode == "polling":
+            return await run_polling_benchmark(
+                load_payloads(args.payloads),
+                rate=args.rate,
+                count=args.count,
+                fake_gemini=fake_gemini,
+                telegram=telegram,
+                redis_client=redis_client,
+                postgres_pool=postgres_pool,
+            )
+        return await run_benchmark(
+            load_payloads(args.payloads),
+            rate=args.rate,
+            count=args.count,
+            fake_gemini=fake_gemini,
+            telegram_url=telegram.url,
+            health_interval=args.health_interval,
+            redis_client=redis_client,
+            postgres_pool=postgres_pool,
+        )
+    finally:
+        await postgres_pool.close()
+        await redis_client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--payloads",
+        default=DEFAULT_PAYLOADS,
+        help="JSONL file of recorded Telegram updates",
+    )
+    parser.add_argument("--rate", type=float, default=10.0, help="updates per second")
+    parser.add_argument(
+        "--count", type=int, default=100, help="number of updates to send"
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.5,
+        help="fake Gemini time to first token (s)",
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=200.0, help="fake Gemini token rate"
+    )
+    parser.add_argument(
+        "--answer-tokens", type=int, default=60, help="tokens per fake answer"
+    )
+    parser.add_argument(
+        "--llm-fail-every", type=int, default=0, help="fail every Nth fake Gemini call"
+    )
+    parser.add_argument(
+        "--llm-slow-every",
+        type=int,
+        default=0,
+        help="make every Nth fake Gemini call slow",
+    )
+    parser.add_argument(
+        "--llm-slow-latency",
+        type=float,
+        default=5.0,
+        help="latency of the slow calls (s)",
+    )
+    parser.add_argument(
+        "--hedging",
+        action="store_true",
+        help="hedge model calls slower than the recent p95",
+    )
+    parser.add_argument(
+        "--telegram-latency",
+        type=float,
+        default=0.02,
+        help="stub Telegram sendMessage latency (s)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["webhook", "polling"],
+        default="webhook",
+        help="update ingestion mode",
+    )
+    parser.add_argument(
+        "--backends",
+        choices=["fake", "local"],
+        default="fake",
+        help="fake or local Redis/Postgres",
+    )
+    parser.add_argument("--redis-latency", type=float, default=0.0005)
+    parser.add_argument("--postgres-latency", type=float, default=0.001)
+    parser.add_argument(
+        "--health-interval",
+        type=float,
+        default=0.0,
+        help="probe /health/ every N seconds (0 = off)",
+    )
+    args = parser.parse_args()
+    settings.llm_hedging_enabled = settings.llm_hedging_enabled or args.hedging
+
+    fake_gemini = FakeGemini(
+        latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        fail_every=args.llm_fail_every,
+        slow_every=args.llm_slow_every,
+        slow_latency=args.llm_slow_latency,
+    )
+    telegram = StubTelegramServer(latency=args.telegram_latency).start()
+    try:
+        report = asyncio.run(run_with_backends(args, fake_gemini, telegram))
+        report["telegram_messages_sent"] = len(telegram.sent_messages)
+        print(json.dumps(report, indent=2))
+    finally:
+        telegram.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,80 @@
-from fastapi import Request, HTTPException, status
+from fastapi import HTTPException, Request, status
+
+from services.health_service import HealthService
 from services.knowledge_service import KnowledgeService
 from services.telegram_service import TelegramService
+from services.update_service import UpdateService
 from services.user_request_service import UserRequestService
+from services.whatsapp_service import WhatsAppService
+
 
 def get_knowledge_service(request: Request) -> KnowledgeService:
     """
     Dependency function to get the KnowledgeService instance from the app state.
     """
-    if not hasattr(request.app.state, 'knowledge_service'):
+    if not hasattr(request.app.state, "knowledge_service"):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Knowledge service is not available."
+            detail="Knowledge service is not available.",
         )
     return request.app.state.knowledge_service
 
+
 def get_telegram_service(request: Request) -> TelegramService:
     """
     Dependency function to get the TelegramService instance from the app state.
     """
-    if not hasattr(request.app.state, 'telegram_service'):
+    if not hasattr(request.app.state, "telegram_service"):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Telegram service is not available."
+            detail="Telegram service is not available.",
         )
     return request.app.state.telegram_service
 
+
 def get_user_request_service(request: Request) -> UserRequestService:
     """
     Dependency function to get the UserRequestService instance from the app state.
     """
-    if not hasattr(request.app.state, 'user_request_service'):
+    if not hasattr(request.app.state, "user_request_service"):
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="User request service is not available."
+            detail="User request service is not available.",
         )
     return request.app.state.user_request_service
+
+
+def get_health_service(request: Request) -> HealthService:
+    """
+    Dependency function to get the HealthService instance from the app state.
+    """
+    if not hasattr(request.app.state, "health_service"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Health service is not available.",
+        )
+    return request.app.state.health_service
+
+
+def get_update_service(request: Request) -> UpdateService:
+    """
+    Dependency function to get the UpdateService instance from the app state.
+    """
+    if not hasattr(request.app.state, "update_service"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Update service is not available.",
+        )
+    return request.app.state.update_service
+
+
+def get_whatsapp_service(request: Request) -> WhatsAppService:
+    """
+    Dependency function to get the WhatsAppService instance from the app state.
+    """
+    if not hasattr(request.app.state, "whatsapp_service"):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="WhatsApp service is not available.",
+        )
+    return request.app.state.whatsapp_service
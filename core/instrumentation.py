@@ -0,0 +1,101 @@
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import Any
+
+from agno.document import Document
+from agno.embedder.google import GeminiEmbedder
+from agno.knowledge.combined import CombinedKnowledgeBase
+from agno.knowledge.document import DocumentKnowledgeBase
+from pydantic import PrivateAttr
+
+from core.metrics import track_stage
+
+
+class InstrumentedGeminiEmbedder(GeminiEmbedder):
+    """
+    GeminiEmbedder that records the embedding stage metrics.
+    """
+
+    def get_embedding(self, text: str) -> list[float]:
+        with track_stage("embedding"):
+            return super().get_embedding(text)
+
+    def get_embedding_and_usage(
+        self, text: str
+    ) -> tuple[list[float], dict[str, Any] | None]:
+        with track_stage("embedding"):
+            return super().get_embedding_and_usage(text)
+
+
+class InstrumentedCombinedKnowledgeBase(CombinedKnowledgeBase):
+    """
+    CombinedKnowledgeBase that records the knowledge search stage metrics.
+    """
+
+    def search(
+        self,
+        query: str,
+        num_documents: int | None = None,
+        filters: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        with track_stage("knowledge_search"):
+            return super().search(
+                query=query, num_documents=num_documents, filters=filters
+            )
+
+    async def async_search(
+        self,
+        query: str,
+        num_documents: int | None = None,
+        filters: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        with track_stage("knowledge_search"):
+            return await super().async_search(
+                query=query, num_documents=num_documents, filters=filters
+            )
+
+
+class StreamingDocumentKnowledgeBase(DocumentKnowledgeBase):
+    """
+    DocumentKnowledgeBase fed from a document iterator.
+
+    The first pass pulls documents from the iterator as chunking and embedding
+    consume them, instead of converting the whole source up front, and keeps
+    them in `documents` so later passes reuse them. Only the raw source pages
+    are dropped as they go; the converted documents stay in memory.
+    """
+
+    _source: Iterator[Document] | None = PrivateAttr(default=None)
+
+    def stream_from(self, source: Iterable[Document]) -> list[Document]:
+        """
+        Sets the document source. Returns the list that is filled as it is consumed.
+        """
+        self._source = iter(source)
+        self.documents = []
+        return self.documents
+
+    def _iter_documents(self) -> Iterator[Document]:
+        index = 0
+        while True:
+            if index < len(self.documents or []):
+                yield self.documents[index]
+                index += 1
+                continue
+            if self._source is None:
+                return
+            try:
+                document = next(self._source)
+            except StopIteration:
+                self._source = None
+                return
+            self.documents.append(document)
+
+    @property
+    def document_lists(self) -> Iterator[list[Document]]:
+        for document in self._iter_documents():
+            yield [document]
+
+    @property
+    async def async_document_lists(self) -> AsyncIterator[list[Document]]:
+        for document in self._iter_documents():
+            yield [document]
@@ -0,0 +1,56 @@
+from typing import Any
+
+# Compare-and-set scripts: only the current owner may extend or drop a lease
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    """
+    Expiring ownership of a Redis key, used to give a single worker a stream
+    partition or the getUpdates poller. The owner must renew it before
+    `ttl_ms` elapses; otherwise another worker can take it over.
+    """
+
+    def __init__(self, redis_client: Any, key: str, owner: str, ttl_ms: int):
+        self.redis_client = redis_client
+        self.key = key
+        self.owner = owner
+        self.ttl_ms = ttl_ms
+
+    async def acquire(self) -> bool:
+        """
+        Takes the lease if it is free, or extends it if it is already ours.
+        """
+        if await self.redis_client.set(self.key, self.owner, nx=True, px=self.ttl_ms):
+            return True
+        return await self.renew()
+
+    async def renew(self) -> bool:
+        return bool(
+            await self.redis_client.eval(
+                RENEW_SCRIPT, 1, self.key, self.owner, self.ttl_ms
+            )
+        )
+
+    async def held(self) -> bool:
+        """
+        Tells whether the lease is still ours.
+        """
+        owner = await self.redis_client.get(self.key)
+        if isinstance(owner, bytes):
+            owner = owner.decode("utf-8")
+        return owner == self.owner
+
+    async def release(self) -> None:
+        await self.redis_client.eval(RELEASE_SCRIPT, 1, self.key, self.owner)
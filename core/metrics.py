@@ -0,0 +1,317 @@
+"""
+Minimal Prometheus-compatible metrics registry.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock, so
+recording a sample costs a dict lookup and an addition and can stay enabled in
+production. `render()` produces the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+from core.tracing import tracer
+from utils.tools.log_tool import dropped_records
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(
+    names: Sequence[str], values: Sequence[str], extra: tuple[str, str] | None = None
+) -> str:
+    pairs = [
+        f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape_label_value(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., sum, count]
+        self._values: dict[LabelValues, list[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: str) -> float:
+        series = self._values.get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(
+                    self.label_names, key, ("le", _format_value(bound))
+                )
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.label_names, key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {_format_value(series[-1])}")
+            plain = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{plain} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{plain} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        update_cache_ratios()
+        update_log_drops()
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.register(
+    Histogram(
+        "espetos_stage_duration_seconds",
+        "Duration of each stage of a request.",
+        labels=("stage",),
+    )
+)
+in_flight = registry.register(
+    Gauge(
+        "espetos_in_flight",
+        "Work currently in progress per stage.",
+        labels=("stage",),
+    )
+)
+requests_total = registry.register(
+    Counter(
+        "espetos_requests_total",
+        "Processed updates by channel and outcome.",
+        labels=("channel", "outcome"),
+    )
+)
+message_statuses = registry.register(
+    Counter(
+        "espetos_message_statuses_total",
+        "Delivery statuses of sent replies reported by the channels (sent, delivered, read, failed).",
+        labels=("channel", "status"),
+    )
+)
+stage_errors = registry.register(
+    Counter(
+        "espetos_stage_errors_total",
+        "Errors raised per stage.",
+        labels=("stage",),
+    )
+)
+cache_requests = registry.register(
+    Counter(
+        "espetos_cache_requests_total",
+        "Cache lookups by cache and result (hit or miss).",
+        labels=("cache", "result"),
+    )
+)
+cache_hit_ratio = registry.register(
+    Gauge(
+        "espetos_cache_hit_ratio",
+        "Hit ratio of each cache since startup.",
+        labels=("cache",),
+    )
+)
+model_decisions = registry.register(
+    Counter(
+        "espetos_model_decisions_total",
+        "Model tier chosen per request.",
+        labels=("tier", "reason"),
+    )
+)
+
+admission_decisions = registry.register(
+    Counter(
+        "espetos_admission_decisions_total",
+        "Admission controller decisions per request (admitted, degraded, queued, rejected, cache).",
+        labels=("decision",),
+    )
+)
+admission_state = registry.register(
+    Gauge(
+        "espetos_admission_state",
+        "Admission controller state: agent runs, waiting requests, deferred tasks, pressure (0/1).",
+        labels=("state",),
+    )
+)
+llm_calls = registry.register(
+    Counter(
+        "espetos_llm_calls_total",
+        "Model calls by model and outcome (success, retry, error, deadline_exceeded, circuit_open, hedged, hedge_won).",
+        labels=("model", "outcome"),
+    )
+)
+circuit_state = registry.register(
+    Gauge(
+        "espetos_llm_circuit_state",
+        "Circuit breaker state per model: 0 closed, 1 half-open, 2 open.",
+        labels=("model",),
+    )
+)
+startup_phase_duration = registry.register(
+    Gauge(
+        "espetos_startup_phase_seconds",
+        "Duration of each application startup phase, including module imports.",
+        labels=("phase",),
+    )
+)
+log_records_dropped = registry.register(
+    Counter(
+        "espetos_log_records_dropped_total",
+        "Log records dropped because the log queue was full.",
+    )
+)
+
+
+def update_cache_ratios() -> None:
+    with cache_requests._lock:
+        caches = {key[0] for key in cache_requests._values}
+    for cache in caches:
+        hits = cache_requests.value(cache=cache, result="hit")
+        total = hits + cache_requests.value(cache=cache, result="miss")
+        cache_hit_ratio.set(hits / total if total else 0.0, cache=cache)
+
+
+def update_log_drops() -> None:
+    with log_records_dropped._lock:
+        log_records_dropped._values[()] = float(dropped_records())
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """
+    Times a request stage, counts its errors and tracks it as in flight.
+    The stage is also recorded as a span of the current trace.
+    """
+    start = time.perf_counter()
+    in_flight.inc(stage=stage)
+    try:
+        with tracer.span(stage):
+            yield
+    except Exception:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        in_flight.dec(stage=stage)
+        stage_duration.observe(time.perf_counter() - start, stage=stage)
@@ -0,0 +1,21 @@
+import time
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RequestTimingMiddleware:
+    """
+    Pure ASGI middleware that stamps the time a request was received, so
+    handlers can measure body parsing and validation (`request.state.received_at`)
+    and start their trace at arrival (`request.state.received_at_ns`).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            state = scope.setdefault("state", {})
+            state["received_at"] = time.perf_counter()
+            state["received_at_ns"] = time.time_ns()
+        await self.app(scope, receive, send)
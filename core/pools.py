@@ -0,0 +1,35 @@
+from typing import TYPE_CHECKING
+
+from redis.asyncio import Redis
+
+from core.settings import settings
+
+if TYPE_CHECKING:
+    import asyncpg
+
+
+def create_redis_client() -> Redis:
+    """
+    Creates the shared async Redis client (backed by its own connection pool).
+    """
+    return Redis(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        decode_responses=True,
+        socket_timeout=settings.redis_socket_timeout,
+    )
+
+
+async def create_postgres_pool() -> "asyncpg.Pool":
+    """
+    Creates the shared asyncpg pool. Connections are opened lazily, so startup
+    does not fail when Postgres is down; the health prober reports it instead.
+    """
+    import asyncpg
+
+    return await asyncpg.create_pool(
+        settings.db_url,
+        min_size=0,
+        max_size=settings.postgres_pool_size,
+    )
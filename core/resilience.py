@@ -0,0 +1,343 @@
+"""
+Resilience primitives for calls to the model provider.
+
+A request deadline is set once where an update is received (webhook, poller or
+stream worker) and kept in a context variable, so every model call made while
+answering it knows how much time is left. `ResilientCaller` runs a call within
+that deadline, retries transient errors with jittered exponential backoff,
+fails fast through a per-model circuit breaker while the provider is degraded,
+and can hedge a slow call with a second request once it passes the recent p95
+latency.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+import httpx
+
+from core.metrics import circuit_state, llm_calls
+from utils.tools.log_tool import log_message
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+TRANSIENT_MARKERS = (
+    "RESOURCE_EXHAUSTED",
+    "UNAVAILABLE",
+    "DEADLINE_EXCEEDED",
+    "overloaded",
+    "timed out",
+)
+
+# Wall clock deadline (time.time()) of the request being answered
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class LLMUnavailableError(Exception):
+    """The model could not answer within the request's deadline or retry budget."""
+
+
+class DeadlineExceededError(LLMUnavailableError):
+    pass
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+@contextmanager
+def request_deadline(budget: float, started_at: float | None = None) -> Iterator[float]:
+    """
+    Sets the deadline of the current request to `budget` seconds after
+    `started_at` (a time.time() timestamp, defaults to now). An enclosing
+    deadline that is earlier is kept.
+    """
+    deadline = (started_at if started_at is not None else time.time()) + budget
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> float | None:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed call is worth retrying: timeouts, connection errors,
+    rate limits and 5xx responses from the provider.
+    """
+    if isinstance(
+        error,
+        (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError),
+    ):
+        return True
+    for attribute in ("status_code", "code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int):
+            return status in TRANSIENT_STATUS_CODES
+    message = str(error)
+    return any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+class CircuitBreaker:
+    """
+    Closed while calls succeed. After `failure_threshold` consecutive failures
+    it opens and rejects calls for `recovery_time` seconds, then lets a single
+    trial call through (half-open): success closes it, failure reopens it,
+    and a cancelled trial lets the next call try again.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, recovery_time: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+        self._set_state("closed")
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.recovery_time:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            self._set_state("half_open")
+            return True
+        return False
+
+    def abandon_trial(self) -> None:
+        """
+        Ends a half-open trial that neither succeeded nor failed (it was cancelled).
+        """
+        self._trial_running = False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            log_message(f"Circuit for {self.name} closed", "INFO")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._set_state("closed")
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                log_message(
+                    f"Circuit for {self.name} opened after {self.failures} failures",
+                    "WARNING",
+                )
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+            self._set_state("open")
+
+    def _set_state(self, state: str) -> None:
+        circuit_state.set(
+            {"closed": 0, "half_open": 1, "open": 2}[state], model=self.name
+        )
+
+
+class LatencyWindow:
+    """Recent successful call latencies, used for the hedging threshold."""
+
+    def __init__(self, size: int = 200):
+        self.samples: deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        return ordered[
+            min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        ]
+
+
+class ResilientCaller:
+    """
+    Runs model calls with deadlines, retries, circuit breaking and hedging.
+    Breakers and latency windows are kept per key (the model id).
+    """
+
+    def __init__(
+        self,
+        attempt_timeout: float = 20.0,
+        max_attempts: int = 3,
+        retry_base_delay: float = 0.5,
+        retry_max_delay: float = 4.0,
+        breaker_failure_threshold: int = 5,
+        breaker_recovery_time: float = 30.0,
+        hedging_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_recovery_time = breaker_recovery_time
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.latencies: dict[str, LatencyWindow] = {}
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(
+                key, self.breaker_failure_threshold, self.breaker_recovery_time
+            )
+        return self.breakers[key]
+
+    def available(self, key: str) -> bool:
+        """Whether calls for `key` are currently let through by its breaker."""
+        return self.breaker(key).state != "open"
+
+    def hedge_delay(self, key: str) -> float | None:
+        """Seconds after which a call is hedged, or None when hedging is off or not yet calibrated."""
+        window = self.latencies.get(key)
+        if (
+            not self.hedging_enabled
+            or window is None
+            or len(window.samples) < self.hedge_min_samples
+        ):
+            return None
+        return window.percentile(self.hedge_percentile)
+
+    async def call(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Awaits `factory()` for the model `key`. Transient failures are retried
+        while attempts and time remain; raises CircuitOpenError,
+        DeadlineExceededError, or the last error once it gives up.
+        """
+        breaker = self.breaker(key)
+        for attempt in range(self.max_attempts):
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                llm_calls.inc(model=key, outcome="deadline_exceeded")
+                raise DeadlineExceededError(
+                    f"Request deadline passed before calling {key}"
+                )
+            trial = breaker.state == "half_open"
+            if not breaker.allow():
+                llm_calls.inc(model=key, outcome="circuit_open")
+                raise CircuitOpenError(f"Circuit for {key} is open")
+            timeout = (
+                self.attempt_timeout
+                if remaining is None
+                else min(self.attempt_timeout, remaining)
+            )
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(
+                    self._hedged(key, factory), timeout=timeout
+                )
+            except asyncio.CancelledError:
+                if trial:
+                    breaker.abandon_trial()
+                raise
+            except Exception as e:
+                transient = is_transient(e)
+                if transient:
+                    breaker.record_failure()
+                else:
+                    # The provider answered; the request itself was bad
+                    breaker.record_success()
+                remaining = remaining_time()
+                if remaining is not None and remaining <= 0:
+                    llm_calls.inc(model=key, outcome="deadline_exceeded")
+                    raise DeadlineExceededError(
+                        f"Request deadline passed while calling {key}"
+                    ) from e
+                if not transient or attempt + 1 >= self.max_attempts:
+                    llm_calls.inc(model=key, outcome="error")
+                    raise
+                delay = backoff_delay(
+                    attempt, self.retry_base_delay, self.retry_max_delay
+                )
+                if remaining is not None and delay >= remaining:
+                    llm_calls.inc(model=key, outcome="deadline_exceeded")
+                    raise DeadlineExceededError(f"No time left to retry {key}") from e
+                llm_calls.inc(model=key, outcome="retry")
+                log_message(
+                    f"Retrying {key} in {delay:.2f}s after transient error: {e}",
+                    "WARNING",
+                )
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            self.latencies.setdefault(key, LatencyWindow()).observe(
+                time.perf_counter() - started
+            )
+            llm_calls.inc(model=key, outcome="success")
+            return result
+        raise LLMUnavailableError(f"No attempts left for {key}")
+
+    async def _hedged(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs the call and, if it is still running after the hedge delay, a
+        second identical one; the first to succeed wins and the other is cancelled.
+        """
+        delay = self.hedge_delay(key)
+        if delay is None:
+            return await factory()
+        primary = asyncio.ensure_future(factory())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self.breaker(key).allow():
+                return await primary
+            llm_calls.inc(model=key, outcome="hedged")
+            hedge = asyncio.ensure_future(factory())
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            llm_calls.inc(model=key, outcome="hedge_won")
+                        return task.result()
+            # Both failed: surface the primary's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
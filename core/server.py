@@ -0,0 +1,82 @@
+"""
+Serving and the start of the shutdown.
+
+uvicorn only runs the lifespan shutdown after it has closed the listener and
+waited for the requests in progress, so draining cannot wait for it: the
+instance has to stop looking ready while the load balancer still routes
+traffic to it. `begin_drain` does that. It is called by the pre-stop endpoint
+(`POST /health/drain`) and, when served with `serve`, as soon as SIGTERM or
+SIGINT arrives. The lifespan shutdown then finishes the drain within what is
+left of `SHUTDOWN_DRAIN_TIMEOUT`.
+"""
+
+import time
+from collections.abc import Callable
+from types import FrameType
+from typing import Any
+
+import uvicorn
+
+from core.settings import settings
+from utils.tools.log_tool import log_message
+
+
+def begin_drain(app: Any) -> None:
+    """
+    Turns readiness to 503 and makes the update service park the events it
+    receives from now on. Idempotent; the drain deadline counts from the
+    first call.
+    """
+    if getattr(app.state, "drain_started_at", None) is not None:
+        return
+    app.state.drain_started_at = time.monotonic()
+    if hasattr(app.state, "health_service"):
+        app.state.health_service.draining = True
+    if hasattr(app.state, "update_service"):
+        app.state.update_service.draining = True
+    log_message("Draining: readiness is now 503 and new updates are parked", "INFO")
+
+
+def drain_time_left(app: Any, timeout: float) -> float:
+    """
+    Seconds left of a `timeout` drain that started with `begin_drain`.
+    """
+    started_at = getattr(app.state, "drain_started_at", None)
+    if started_at is None:
+        return timeout
+    return max(0.0, timeout - (time.monotonic() - started_at))
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    uvicorn server that calls `on_exit` as soon as a shutdown signal arrives,
+    before it stops accepting connections.
+    """
+
+    def __init__(self, config: uvicorn.Config, on_exit: Callable[[], None]):
+        super().__init__(config)
+        self.on_exit = on_exit
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        if not self.should_exit:
+            try:
+                self.on_exit()
+            except Exception as e:
+                log_message(f"Error starting the drain: {e}", "ERROR")
+        super().handle_exit(sig, frame)
+
+
+def create_server(
+    app: Any, host: str = "0.0.0.0", port: int = 8000, **options: Any
+) -> DrainingServer:
+    """
+    Builds the server for `app`. Requests still running `SHUTDOWN_DRAIN_TIMEOUT`
+    seconds after the signal are cancelled, which parks their updates.
+    """
+    options.setdefault("timeout_graceful_shutdown", settings.shutdown_drain_timeout)
+    config = uvicorn.Config(app, host=host, port=port, **options)
+    return DrainingServer(config, on_exit=lambda: begin_drain(app))
+
+
+def serve(app: Any, host: str = "0.0.0.0", port: int = 8000) -> None:
+    create_server(app, host=host, port=port).run()
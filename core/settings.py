@@ -1,40 +1,185 @@
 import os
+import socket
+from functools import cached_property
+from typing import Any
+
 from dotenv import load_dotenv
-from utils.tools.log_tool import log_message
 from pydantic_settings import BaseSettings
-from agno.embedder.google import GeminiEmbedder
+
+from utils.tools.log_tool import log_message
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-env_path = os.path.join(BASE_DIR, '.env')
+env_path = os.path.join(BASE_DIR, ".env")
 
 if os.path.exists(env_path):
     load_dotenv(env_path)
     log_message(f".env file loaded from {env_path}", "INFO")
 else:
     log_message(f"Warning: .env file not found at {env_path}", "WARNING")
-    
+
+
 class EnvironmentSettings(BaseSettings):
     google_api_key: str = os.getenv("GOOGLE_API_KEY", "")
-    embedder: GeminiEmbedder = GeminiEmbedder()
     notion_token: str = os.getenv("NOTION_TOKEN", "")
     notion_database_id: str = os.getenv("NOTION_DATABASE_ID", "")
+    notion_api_url: str = os.getenv("NOTION_API_URL", "https://api.notion.com/v1")
+    # Comma separated Notion properties kept as document metadata (empty = all)
+    notion_metadata_properties: str = os.getenv("NOTION_METADATA_PROPERTIES", "")
     ngrok_auth_token: str = os.getenv("NGROK_AUTH_TOKEN", "")
     telegram_bot_token: str = os.getenv("TELEGRAM_BOT_TOKEN", "")
     telegram_webhook_url: str = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+    telegram_api_url: str = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    # "webhook" (ngrok or TELEGRAM_WEBHOOK_URL) or "polling" (getUpdates long polling)
+    telegram_update_mode: str = os.getenv("TELEGRAM_UPDATE_MODE", "webhook")
+    telegram_polling_timeout: int = int(os.getenv("TELEGRAM_POLLING_TIMEOUT", "30"))
+    telegram_polling_limit: int = int(os.getenv("TELEGRAM_POLLING_LIMIT", "100"))
+    telegram_polling_concurrency: int = int(
+        os.getenv("TELEGRAM_POLLING_CONCURRENCY", "16")
+    )
+    whatsapp_access_token: str = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
+    whatsapp_phone_number_id: str = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
+    whatsapp_verify_token: str = os.getenv("WHATSAPP_VERIFY_TOKEN", "")
+    whatsapp_app_secret: str = os.getenv("WHATSAPP_APP_SECRET", "")
+    whatsapp_api_url: str = os.getenv("WHATSAPP_API_URL", "https://graph.facebook.com")
+    whatsapp_api_version: str = os.getenv("WHATSAPP_API_VERSION", "v21.0")
+    # Replies being sent at once per channel
+    outbound_max_concurrency: int = int(os.getenv("OUTBOUND_MAX_CONCURRENCY", "16"))
     postgres_user: str = os.getenv("POSTGRES_USER", "postgres")
     postgres_password: str = os.getenv("POSTGRES_PASSWORD", "postgres")
     postgres_host: str = os.getenv("POSTGRES_HOST", "localhost")
-    postgres_port: int = int(os.getenv("POSTGRES_PORT", 5432))
+    postgres_port: int = int(os.getenv("POSTGRES_PORT", "5432"))
     postgres_db: str = os.getenv("POSTGRES_DB", "espetos_llm_bot")
     db_url: str = f"postgresql://{postgres_user}:{postgres_password}@{postgres_host}:{postgres_port}/{postgres_db}"
+    postgres_pool_size: int = int(os.getenv("POSTGRES_POOL_SIZE", "5"))
+    # Note: docker-compose exposes redis on 6380
+    redis_host: str = os.getenv("REDIS_HOST", "localhost")
+    redis_port: int = int(os.getenv("REDIS_PORT", "6380"))
+    redis_db: int = int(os.getenv("REDIS_DB", "0"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2.0"))
+    health_probe_interval: float = float(os.getenv("HEALTH_PROBE_INTERVAL", "5.0"))
+    health_probe_timeout: float = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2.0"))
+    health_max_staleness: float = float(os.getenv("HEALTH_MAX_STALENESS", "15.0"))
+    readiness_max_queue_depth: int = int(os.getenv("READINESS_MAX_QUEUE_DEPTH", "100"))
+    # "inline" answers updates in the receiving process; "stream" partitions them by
+    # chat_id over Redis streams so any number of workers can consume them
+    update_dispatch_mode: str = os.getenv("UPDATE_DISPATCH_MODE", "inline")
+    worker_id: str = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+    redis_key_prefix: str = os.getenv("REDIS_KEY_PREFIX", "espetos")
+    stream_partitions: int = int(os.getenv("STREAM_PARTITIONS", "32"))
+    stream_lease_ms: int = int(os.getenv("STREAM_LEASE_MS", "15000"))
+    stream_max_len: int = int(os.getenv("STREAM_MAX_LEN", "10000"))
+    update_dedup_ttl: int = int(os.getenv("UPDATE_DEDUP_TTL", "86400"))
+    # Seconds in-flight work gets to finish on shutdown; what is still running is
+    # then parked in Redis (or left on the stream) for the next instance
+    shutdown_drain_timeout: float = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20.0"))
+    # Seconds to wait for the Postgres pool to close before terminating its connections
+    shutdown_pool_timeout: float = float(os.getenv("SHUTDOWN_POOL_TIMEOUT", "5.0"))
+    # Token of the pre-stop endpoint (POST /health/drain); the endpoint is off without it
+    shutdown_drain_token: str = os.getenv("SHUTDOWN_DRAIN_TOKEN", "")
+    # Seconds between two checks for events parked by instances that shut down
+    parked_resume_interval: float = float(os.getenv("PARKED_RESUME_INTERVAL", "5.0"))
+    answer_cache_enabled: bool = (
+        os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    )
+    answer_cache_ttl: int = int(os.getenv("ANSWER_CACHE_TTL", "600"))
     smart_pos_api_key: str = os.getenv("SMART_POS_API_KEY", "")
+    smart_pos_api_url: str = os.getenv("SMART_POS_API_URL", "")
+    smart_pos_timeout: float = float(os.getenv("SMART_POS_TIMEOUT", "10.0"))
+    smart_pos_page_size: int = int(os.getenv("SMART_POS_PAGE_SIZE", "100"))
+    smart_pos_refresh_interval: float = float(
+        os.getenv("SMART_POS_REFRESH_INTERVAL", "300.0")
+    )
+    # Older snapshots are not used to answer stock questions directly
+    smart_pos_max_staleness: float = float(
+        os.getenv("SMART_POS_MAX_STALENESS", "900.0")
+    )
+    intent_router_enabled: bool = (
+        os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+    )
+    intent_embeddings_enabled: bool = (
+        os.getenv("INTENT_EMBEDDINGS_ENABLED", "true").lower() == "true"
+    )
+    intent_similarity_threshold: float = float(
+        os.getenv("INTENT_SIMILARITY_THRESHOLD", "0.82")
+    )
+    intent_embedding_concurrency: int = int(
+        os.getenv("INTENT_EMBEDDING_CONCURRENCY", "4")
+    )
+    intent_embedding_timeout: float = float(
+        os.getenv("INTENT_EMBEDDING_TIMEOUT", "1.0")
+    )
+    model_routing_enabled: bool = (
+        os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+    )
+    model_fast: str = os.getenv("MODEL_FAST", "gemini-2.5-flash-lite")
+    model_default: str = os.getenv("MODEL_DEFAULT", "gemini-2.5-flash")
+    model_memory: str = os.getenv("MODEL_MEMORY", "gemini-2.5-flash")
+    model_fast_max_words: int = int(os.getenv("MODEL_FAST_MAX_WORDS", "20"))
+    model_escalation_enabled: bool = (
+        os.getenv("MODEL_ESCALATION_ENABLED", "true").lower() == "true"
+    )
+    admission_enabled: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    admission_max_in_flight: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "8"))
+    admission_max_waiting: int = int(os.getenv("ADMISSION_MAX_WAITING", "32"))
+    admission_max_wait: float = float(os.getenv("ADMISSION_MAX_WAIT", "30.0"))
+    admission_queue_wait_threshold: float = float(
+        os.getenv("ADMISSION_QUEUE_WAIT_THRESHOLD", "5.0")
+    )
+    admission_llm_latency_threshold: float = float(
+        os.getenv("ADMISSION_LLM_LATENCY_THRESHOLD", "8.0")
+    )
+    admission_max_deferred: int = int(os.getenv("ADMISSION_MAX_DEFERRED", "200"))
+    admission_busy_message: str = os.getenv(
+        "ADMISSION_BUSY_MESSAGE",
+        "Estamos com muitas mensagens agora, já te respondo! ⏳",
+    )
+    admission_overloaded_message: str = os.getenv(
+        "ADMISSION_OVERLOADED_MESSAGE",
+        "Estamos com muitas mensagens agora. Por favor, tente novamente em alguns minutos.",
+    )
+    llm_request_deadline: float = float(os.getenv("LLM_REQUEST_DEADLINE", "45.0"))
+    llm_attempt_timeout: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "20.0"))
+    llm_max_attempts: int = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+    llm_retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    llm_retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "4.0"))
+    llm_breaker_failure_threshold: int = int(
+        os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5")
+    )
+    llm_breaker_recovery_time: float = float(
+        os.getenv("LLM_BREAKER_RECOVERY_TIME", "30.0")
+    )
+    llm_hedging_enabled: bool = (
+        os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+    )
+    llm_hedge_percentile: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95.0"))
+    llm_hedge_min_samples: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    llm_unavailable_message: str = os.getenv(
+        "LLM_UNAVAILABLE_MESSAGE",
+        "Desculpe, não consegui responder agora. Por favor, tente novamente em instantes.",
+    )
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    tracing_sample_rate: float = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+    tracing_exporter: str = os.getenv("TRACING_EXPORTER", "none")
+    tracing_file_path: str = os.getenv("TRACING_FILE_PATH", "traces/spans.jsonl")
+    tracing_otlp_endpoint: str = os.getenv("TRACING_OTLP_ENDPOINT", "")
+    slow_request_threshold: float = float(os.getenv("SLOW_REQUEST_THRESHOLD", "5.0"))
     env_path: str = env_path
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
-    
+
+    @cached_property
+    def embedder(self) -> Any:
+        """
+        Gemini embedder, built on first use: importing it pulls in agno and google.genai.
+        """
+        from core.instrumentation import InstrumentedGeminiEmbedder
+
+        return InstrumentedGeminiEmbedder()
+
     class Config:
         env_file = env_path
-        env_file_encoding = 'utf-8'
+        env_file_encoding = "utf-8"
         case_sensitive = True
         extra = "ignore"
-        
+
+
 settings = EnvironmentSettings()
@@ -0,0 +1,77 @@
+"""
+Startup timing report.
+
+Each step of the application startup runs inside `startup_timer.phase(name)`,
+which records how long it took and how many modules it imported (heavy
+dependencies are imported lazily, so they show up in the phase that first
+needs them). The report is logged once startup completes and exported as the
+`espetos_startup_phase_seconds` gauge.
+
+The "import" phase starts when this module is imported, which is why main.py
+imports it before anything else. For the same reason it only imports the
+standard library up front: metrics and logging (and through them tracing and
+httpx) are imported when first used, inside the phase being measured.
+"""
+
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+_import_started, _modules_before = time.perf_counter(), len(sys.modules)
+
+
+class StartupTimer:
+    def __init__(self) -> None:
+        self.phases: dict[str, dict[str, float]] = {}
+
+    def record(self, name: str, seconds: float, modules: int = 0) -> None:
+        from core.metrics import startup_phase_duration
+
+        self.phases[name] = {"seconds": seconds, "modules": modules}
+        startup_phase_duration.set(seconds, phase=name)
+
+    def record_imports(self) -> None:
+        """
+        Records the "import" phase, from the import of this module to now.
+        """
+        self.record(
+            "import",
+            time.perf_counter() - _import_started,
+            len(sys.modules) - _modules_before,
+        )
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started, modules = time.perf_counter(), len(sys.modules)
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, len(sys.modules) - modules)
+
+    @property
+    def total(self) -> float:
+        return sum(phase["seconds"] for phase in self.phases.values())
+
+    def report(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "phase": name,
+                "ms": round(phase["seconds"] * 1000, 1),
+                "modules": int(phase["modules"]),
+            }
+            for name, phase in self.phases.items()
+        ]
+
+    def log_report(self) -> None:
+        from utils.tools.log_tool import log_message
+
+        phases = ", ".join(
+            f"{item['phase']} {item['ms']}ms ({item['modules']} modules)"
+            for item in self.report()
+        )
+        log_message(f"Startup took {self.total * 1000:.1f}ms: {phases}", "INFO")
+
+
+startup_timer = StartupTimer()
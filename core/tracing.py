@@ -0,0 +1,336 @@
+"""
+Lightweight per-request tracing.
+
+A trace is started at the webhook and spans are nested through context
+variables, so they follow the request across `await` points and
+`asyncio.to_thread` calls. Finished traces are exported as OpenTelemetry
+(OTLP/JSON) spans to a file or a collector when sampled, and traces slower than
+the configured threshold are always exported and logged as a span tree.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from utils.tools.log_tool import log_message
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2 if self.status == "error" else 1},
+        }
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    sampled: bool
+    spans: list[Span] = field(default_factory=list)
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(ABC):
+    """
+    Exports finished traces from a background thread so the request path only
+    pays for a queue put. Traces are dropped when the queue is full.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: queue.Queue[list[Span] | None] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(
+            target=self._worker, daemon=True, name="span-exporter"
+        )
+        self._thread.start()
+
+    def export(self, spans: list[Span]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+    @staticmethod
+    def to_otlp_payload(spans: list[Span]) -> dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": "espetos-llm-bot"},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "espetos.tracing"},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    def _worker(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            try:
+                self.write(self.to_otlp_payload(spans))
+            except Exception as e:
+                log_message(f"Error exporting spans: {e}", "ERROR")
+
+    @abstractmethod
+    def write(self, payload: dict[str, Any]) -> None:
+        """Sends one OTLP/JSON payload; called from the exporter thread."""
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends one OTLP/JSON payload per trace to a JSONL file.
+    """
+
+    def __init__(self, path: str, max_queue: int = 1000):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(max_queue=max_queue)
+
+    def write(self, payload: dict[str, Any]) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(payload) + "\n")
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """
+    Posts OTLP/JSON payloads to a collector (`<endpoint>/v1/traces`).
+    """
+
+    def __init__(self, endpoint: str, max_queue: int = 1000):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.client = httpx.Client(timeout=5.0)
+        super().__init__(max_queue=max_queue)
+
+    def write(self, payload: dict[str, Any]) -> None:
+        self.client.post(self.url, json=payload).raise_for_status()
+
+
+def format_span_tree(spans: list[Span]) -> str:
+    """
+    Renders the spans of a trace as an indented tree with durations.
+    """
+    children: dict[str | None, list[Span]] = {}
+    for span in spans:
+        children.setdefault(span.parent_id, []).append(span)
+    lines: list[str] = []
+
+    def walk(parent_id: str | None, depth: int) -> None:
+        for span in sorted(children.get(parent_id, []), key=lambda item: item.start_ns):
+            attributes = " ".join(
+                f"{key}={value}" for key, value in span.attributes.items()
+            )
+            status = " [error]" if span.status == "error" else ""
+            lines.append(
+                f"{'  ' * depth}{span.name} {span.duration_ms:.1f}ms{status} {attributes}".rstrip()
+            )
+            walk(span.span_id, depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.enabled = True
+        self.sample_rate = 0.0
+        self.slow_threshold = 5.0
+        self.exporter: SpanExporter | None = None
+
+    def configure(
+        self,
+        enabled: bool = True,
+        sample_rate: float = 0.0,
+        slow_threshold: float = 5.0,
+        exporter: SpanExporter | None = None,
+    ) -> None:
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.exporter = exporter
+
+    @contextmanager
+    def start_trace(
+        self, name: str, start_ns: int | None = None, **attributes: Any
+    ) -> Iterator[Span | None]:
+        """
+        Starts a new trace with `name` as its root span.
+        """
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace(
+            trace_id=os.urandom(16).hex(), sampled=random.random() < self.sample_rate
+        )
+        root = Span(
+            name=name,
+            trace_id=trace.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=None,
+            start_ns=start_ns or time.time_ns(),
+            attributes=dict(attributes, request_id=trace.trace_id),
+        )
+        trace.spans.append(root)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+        try:
+            yield root
+        except Exception:
+            root.status = "error"
+            raise
+        finally:
+            root.end_ns = time.time_ns()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self._finish(trace, root)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        """
+        Opens a child span of the current span; does nothing outside a trace.
+        """
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        if trace is None or parent is None:
+            yield None
+            return
+        span = Span(
+            name=name,
+            trace_id=trace.trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id,
+            start_ns=time.time_ns(),
+            attributes=dict(attributes),
+        )
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.status = "error"
+            span.set_attribute("error", str(e)[:200])
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+
+    def record_span(
+        self, name: str, start_ns: int, end_ns: int, **attributes: Any
+    ) -> None:
+        """
+        Records an already finished span under the current span.
+        """
+        trace = _current_trace.get()
+        parent = _current_span.get()
+        if trace is None or parent is None:
+            return
+        trace.spans.append(
+            Span(
+                name=name,
+                trace_id=trace.trace_id,
+                span_id=os.urandom(8).hex(),
+                parent_id=parent.span_id,
+                start_ns=start_ns,
+                end_ns=end_ns,
+                attributes=dict(attributes),
+            )
+        )
+
+    def _finish(self, trace: Trace, root: Span) -> None:
+        slow = root.duration_ms >= self.slow_threshold * 1000
+        if slow:
+            log_message(
+                f"Slow request {trace.trace_id} took {root.duration_ms:.0f}ms:\n{format_span_tree(trace.spans)}",
+                "WARNING",
+            )
+        if self.exporter and (trace.sampled or slow):
+            self.exporter.export(trace.spans)
+
+
+tracer = Tracer()
+
+
+def set_span_attributes(**attributes: Any) -> None:
+    """
+    Adds attributes to the current span, if any.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def current_request_id() -> str | None:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def create_span_exporter(
+    kind: str, file_path: str = "", endpoint: str = ""
+) -> SpanExporter | None:
+    """
+    Builds the span exporter selected in settings ("file", "otlp" or "none").
+    Export is off unless one is selected.
+    """
+    if kind == "file" and file_path:
+        return FileSpanExporter(file_path)
+    if kind == "otlp" and endpoint:
+        return OtlpHttpSpanExporter(endpoint)
+    return None
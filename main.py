@@ -1,15 +1,43 @@
+from core.startup import startup_timer
+
+# isort: split
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.concurrency import asynccontextmanager
+
+from core.deps import (
+    get_knowledge_service,
+    get_telegram_service,
+    get_user_request_service,
+)
+from core.leases import RedisLease
+from core.metrics import in_flight, stage_duration
+from core.middleware import RequestTimingMiddleware
+from core.pools import create_postgres_pool, create_redis_client
+from core.server import begin_drain, drain_time_left, serve
 from core.settings import settings
-from routers.webhooks import webhooks
+from core.tracing import create_span_exporter, tracer
 from routers.health import router as health_router
-from utils.tools.log_tool import log_message
+from routers.metrics import router as metrics_router
+from routers.webhooks import webhooks
+from services.admission_service import AdmissionService
+from services.cache_service import CacheService
+from services.catalogue_service import CatalogueService, SmartPOSClient
+from services.health_service import HealthService
 from services.knowledge_service import KnowledgeService
+from services.telegram_poller import TelegramPoller
 from services.telegram_service import TelegramService
+from services.update_service import UpdateService
+from services.update_stream import UpdateStream
 from services.user_request_service import UserRequestService
-from core.deps import get_knowledge_service, get_telegram_service, get_user_request_service
-from fastapi import FastAPI, Depends
-from fastapi.concurrency import asynccontextmanager
-from pyngrok import ngrok, conf
-from typing import Optional
+from services.whatsapp_service import WhatsAppService
+from utils.tools.log_tool import log_message
+
+# Heavy dependencies (agno, google.genai, pgvector, LangChain, asyncpg, pyngrok)
+# are imported on first use, so this only covers the web stack
+startup_timer.record_imports()
 
 
 @asynccontextmanager
@@ -25,13 +53,19 @@ async def lifespan(app: FastAPI):
         await shutdown_event(app)
         log_message("Application shutdown complete.", "INFO")
 
+
 app = FastAPI(lifespan=lifespan)
-app.include_router(webhooks, dependencies=[
-    Depends(get_knowledge_service),
-    Depends(get_user_request_service),
-    Depends(get_telegram_service)
-])
+app.add_middleware(RequestTimingMiddleware)
+app.include_router(
+    webhooks,
+    dependencies=[
+        Depends(get_knowledge_service),
+        Depends(get_user_request_service),
+        Depends(get_telegram_service),
+    ],
+)
 app.include_router(health_router)
+app.include_router(metrics_router)
 
 
 async def startup_event(app: FastAPI) -> None:
@@ -41,20 +75,161 @@ async def startup_event(app: FastAPI) -> None:
     log_message("Application is starting up...", "INFO")
     # Additional startup tasks can be added here
     try:
-        app.state.knowledge_service = KnowledgeService()
-        await app.state.knowledge_service.process_knowledge()
-        app.state.user_request_service = UserRequestService()
-        await app.state.user_request_service.initialize(app.state.knowledge_service)
-        app.state.public_url = await start_ngrok_tunnel(port="8000", bind_tls=True)
-        if not app.state.public_url:
-            raise Exception("Failed to start ngrok tunnel.")
-        app.state.telegram_service = TelegramService()
-        await app.state.telegram_service.initialize(
-            token=settings.telegram_bot_token,
-            webhook_url=f"{app.state.public_url}/webhook/telegram"
-        )
+        with startup_timer.phase("tracing"):
+            tracer.configure(
+                enabled=settings.tracing_enabled,
+                sample_rate=settings.tracing_sample_rate,
+                slow_threshold=settings.slow_request_threshold,
+                exporter=create_span_exporter(
+                    settings.tracing_exporter,
+                    settings.tracing_file_path,
+                    settings.tracing_otlp_endpoint,
+                ),
+            )
+        with startup_timer.phase("pools"):
+            app.state.redis = create_redis_client()
+            app.state.pg_pool = await create_postgres_pool()
+        with startup_timer.phase("health"):
+            app.state.knowledge_service = KnowledgeService()
+            app.state.health_service = HealthService()
+            await app.state.health_service.initialize(
+                redis_client=app.state.redis,
+                postgres_pool=app.state.pg_pool,
+                knowledge_service=app.state.knowledge_service,
+                queue_depth=lambda: queue_depth(app),
+                interval=settings.health_probe_interval,
+                timeout=settings.health_probe_timeout,
+                max_staleness=settings.health_max_staleness,
+                max_queue_depth=settings.readiness_max_queue_depth,
+            )
+            await app.state.health_service.start()
+        with startup_timer.phase("knowledge"):
+            await app.state.knowledge_service.process_knowledge()
+        with startup_timer.phase("services"):
+            app.state.cache_service = CacheService()
+            await app.state.cache_service.initialize(
+                redis_client=app.state.redis,
+                prefix=settings.redis_key_prefix,
+                dedup_ttl=settings.update_dedup_ttl,
+                answer_ttl=settings.answer_cache_ttl,
+            )
+            if settings.admission_enabled:
+                app.state.admission_service = AdmissionService()
+                await app.state.admission_service.initialize(
+                    max_in_flight=settings.admission_max_in_flight,
+                    max_waiting=settings.admission_max_waiting,
+                    max_wait=settings.admission_max_wait,
+                    queue_wait_threshold=settings.admission_queue_wait_threshold,
+                    llm_latency_threshold=settings.admission_llm_latency_threshold,
+                    max_deferred=settings.admission_max_deferred,
+                )
+                await app.state.admission_service.start()
+        if settings.smart_pos_api_key and settings.smart_pos_api_url:
+            with startup_timer.phase("catalogue"):
+                app.state.catalogue_service = CatalogueService()
+                await app.state.catalogue_service.initialize(
+                    client=SmartPOSClient(
+                        settings.smart_pos_api_url,
+                        settings.smart_pos_api_key,
+                        timeout=settings.smart_pos_timeout,
+                        page_size=settings.smart_pos_page_size,
+                    ),
+                    refresh_interval=settings.smart_pos_refresh_interval,
+                    max_staleness=settings.smart_pos_max_staleness,
+                )
+                await app.state.catalogue_service.start()
+        with startup_timer.phase("agent"):
+            app.state.user_request_service = UserRequestService()
+            await app.state.user_request_service.initialize(
+                app.state.knowledge_service,
+                cache_service=app.state.cache_service
+                if settings.answer_cache_enabled
+                else None,
+                admission_service=getattr(app.state, "admission_service", None),
+                catalogue_service=getattr(app.state, "catalogue_service", None),
+            )
+        with startup_timer.phase("dispatch"):
+            app.state.telegram_service = TelegramService()
+            app.state.update_service = UpdateService()
+            if (
+                settings.whatsapp_access_token
+                and settings.whatsapp_phone_number_id
+                and not settings.whatsapp_app_secret
+            ):
+                log_message(
+                    "WHATSAPP_APP_SECRET is not set, the WhatsApp channel is disabled",
+                    "ERROR",
+                )
+            elif settings.whatsapp_access_token and settings.whatsapp_phone_number_id:
+                app.state.whatsapp_service = WhatsAppService()
+                await app.state.whatsapp_service.initialize(
+                    access_token=settings.whatsapp_access_token,
+                    phone_number_id=settings.whatsapp_phone_number_id,
+                    verify_token=settings.whatsapp_verify_token,
+                    app_secret=settings.whatsapp_app_secret,
+                )
+            if settings.update_dispatch_mode == "stream":
+                app.state.update_stream = UpdateStream(
+                    redis_client=app.state.redis,
+                    update_service=app.state.update_service,
+                    worker_id=settings.worker_id,
+                    prefix=settings.redis_key_prefix,
+                    partitions=settings.stream_partitions,
+                    lease_ms=settings.stream_lease_ms,
+                    max_len=settings.stream_max_len,
+                    admission_service=getattr(app.state, "admission_service", None),
+                )
+            await app.state.update_service.initialize(
+                app.state.user_request_service,
+                app.state.telegram_service,
+                cache_service=app.state.cache_service,
+                update_stream=getattr(app.state, "update_stream", None),
+                whatsapp_service=getattr(app.state, "whatsapp_service", None),
+            )
+            if hasattr(app.state, "update_stream"):
+                await app.state.update_stream.start()
+            app.state.update_service.start_resuming(settings.parked_resume_interval)
+        with startup_timer.phase("ingestion"):
+            if settings.telegram_update_mode == "polling":
+                await app.state.telegram_service.initialize(
+                    token=settings.telegram_bot_token
+                )
+                app.state.telegram_poller = TelegramPoller()
+                await app.state.telegram_poller.initialize(
+                    telegram_service=app.state.telegram_service,
+                    update_service=app.state.update_service,
+                    timeout=settings.telegram_polling_timeout,
+                    limit=settings.telegram_polling_limit,
+                    concurrency=settings.telegram_polling_concurrency,
+                    # The lease outlives one long poll so the leader keeps it between polls
+                    leader_lease=RedisLease(
+                        app.state.redis,
+                        f"{settings.redis_key_prefix}:poller",
+                        settings.worker_id,
+                        (settings.telegram_polling_timeout + 15) * 1000,
+                    )
+                    if hasattr(app.state, "update_stream")
+                    else None,
+                )
+                await app.state.telegram_poller.start()
+            else:
+                webhook_url = settings.telegram_webhook_url
+                if not webhook_url:
+                    app.state.public_url = await start_ngrok_tunnel(
+                        port="8000", bind_tls=True
+                    )
+                    if not app.state.public_url:
+                        raise Exception(
+                            "Failed to start ngrok tunnel; set TELEGRAM_WEBHOOK_URL or TELEGRAM_UPDATE_MODE=polling."
+                        )
+                    webhook_url = f"{app.state.public_url}/webhook/telegram"
+                await app.state.telegram_service.initialize(
+                    token=settings.telegram_bot_token, webhook_url=webhook_url
+                )
     except Exception as e:
         log_message(f"Error during startup: {e}", "ERROR")
+    app.state.startup_report = startup_timer.report()
+    startup_timer.log_report()
     log_message("Application startup complete.", "INFO")
 
 
@@ -63,17 +238,108 @@ async def shutdown_event(app: FastAPI) -> None:
     Shutdown event handler to clean up resources.
     """
     log_message("Application is shutting down...", "INFO")
-    # Additional shutdown tasks can be added here
+    await drain(app, settings.shutdown_drain_timeout)
     try:
-        if hasattr(app.state, 'ngrok_data') and app.state.ngrok_data:
+        if hasattr(app.state, "ngrok_data") and app.state.ngrok_data:
+            from pyngrok import ngrok
+
             ngrok.disconnect(app.state.ngrok_data.public_url)
             log_message("ngrok tunnel disconnected.", "INFO")
     except Exception as e:
         log_message(f"Error during ngrok disconnection: {e}", "ERROR")
+    try:
+        if hasattr(app.state, "admission_service"):
+            await app.state.admission_service.stop()
+        if hasattr(app.state, "catalogue_service"):
+            await app.state.catalogue_service.stop()
+        if hasattr(app.state, "telegram_service"):
+            await app.state.telegram_service.close()
+        if hasattr(app.state, "whatsapp_service"):
+            await app.state.whatsapp_service.close()
+    except Exception as e:
+        log_message(f"Error stopping services: {e}", "ERROR")
+    try:
+        if hasattr(app.state, "health_service"):
+            await app.state.health_service.stop()
+        if hasattr(app.state, "knowledge_service"):
+            app.state.knowledge_service.close()
+        if hasattr(app.state, "pg_pool"):
+            await close_postgres_pool(app.state.pg_pool, settings.shutdown_pool_timeout)
+        if hasattr(app.state, "redis"):
+            await app.state.redis.aclose()
+    except Exception as e:
+        log_message(f"Error closing connection pools: {e}", "ERROR")
+    if tracer.exporter:
+        tracer.exporter.shutdown()
     log_message("Application shutdown complete.", "INFO")
 
 
-async def start_ngrok_tunnel(port: str = "8000", bind_tls: bool = True) -> Optional[str]:
+async def drain(app: FastAPI, timeout: float) -> None:
+    """
+    Drain phase of the shutdown. Readiness turns to 503 and no new work is
+    taken: the poller stops fetching, the stream consumers stop reading and
+    events still received are parked. Work in progress then gets what is left
+    of `timeout` seconds since the drain began (on SIGTERM or at the pre-stop
+    endpoint, see core.server) to finish. At the deadline inline runs and
+    updates waiting in the poller are parked in Redis for the next instance,
+    and stream entries stay unacknowledged for the next partition owner.
+    """
+    started = time.perf_counter()
+    begin_drain(app)
+    timeout = drain_time_left(app, timeout)
+    stops = []
+    if hasattr(app.state, "telegram_poller"):
+        stops.append(app.state.telegram_poller.stop(timeout=timeout))
+    if hasattr(app.state, "update_stream"):
+        stops.append(app.state.update_stream.stop(timeout=timeout))
+    if hasattr(app.state, "update_service"):
+        stops.append(app.state.update_service.drain(timeout))
+    for result in await asyncio.gather(*stops, return_exceptions=True):
+        if isinstance(result, Exception):
+            log_message(f"Error draining update ingestion: {result}", "ERROR")
+    elapsed = time.perf_counter() - started
+    stage_duration.observe(elapsed, stage="shutdown_drain")
+    log_message(f"Drained in-flight work in {elapsed:.2f}s", "INFO")
+
+
+async def close_postgres_pool(pool, timeout: float) -> None:
+    """
+    Closes the pool once its connections are released, terminating them after `timeout` seconds.
+    """
+    try:
+        await asyncio.wait_for(pool.close(), timeout)
+    except TimeoutError:
+        log_message(
+            "Postgres pool did not close in time, terminating its connections",
+            "WARNING",
+        )
+        pool.terminate()
+
+
+def queue_depth(app: FastAPI) -> float:
+    """
+    Updates being processed by the webhook, waiting in the poller or on this
+    worker's stream partitions, waiting for agent capacity, or replies
+    waiting to be sent.
+    """
+    poller = getattr(app.state, "telegram_poller", None)
+    update_stream = getattr(app.state, "update_stream", None)
+    admission_service = getattr(app.state, "admission_service", None)
+    update_service = getattr(app.state, "update_service", None)
+    return (
+        in_flight.value(stage="webhook")
+        + (poller.pending if poller else 0)
+        + (update_stream.pending if update_stream else 0)
+        + (admission_service.waiting if admission_service else 0)
+        + (
+            update_service.outbound.pending
+            if getattr(update_service, "outbound", None)
+            else 0
+        )
+    )
+
+
+async def start_ngrok_tunnel(port: str = "8000", bind_tls: bool = True) -> str | None:
     """
     Start an ngrok tunnel to expose the application.
     """
@@ -81,14 +347,21 @@ async def start_ngrok_tunnel(port: str = "8000", bind_tls: bool = True) -> Optio
         log_message("Skipping ngrok tunnel in production environment.", "INFO")
         return None
     try:
+        from pyngrok import conf, ngrok
+
         ngrok_auth_token = settings.ngrok_auth_token
         if ngrok_auth_token:
             conf.get_default().auth_token = ngrok_auth_token
 
         app.state.ngrok_data = ngrok.connect(port, bind_tls=bind_tls)
         log_message(
-            f"ngrok tunnel opened at: {app.state.ngrok_data.public_url}", "SUCCESS")
+            f"ngrok tunnel opened at: {app.state.ngrok_data.public_url}", "SUCCESS"
+        )
         return app.state.ngrok_data.public_url
     except Exception as e:
         log_message(f"Failed to start ngrok tunnel: {e}", "ERROR")
         return None
+
+
+if __name__ == "__main__":
+    serve(app, port=8000)
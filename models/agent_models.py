@@ -1,8 +1,18 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
+
 class RunResponse(BaseModel):
     answer: str
     content: str
-    
+    model: str | None = None
+
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+
+class ModelDecision(BaseModel):
+    tier: Literal["fast", "default"]
+    model_id: str
+    reason: str
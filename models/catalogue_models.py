@@ -0,0 +1,25 @@
+from decimal import Decimal
+
+from pydantic import BaseModel, Field
+
+
+class Product(BaseModel):
+    sku: str
+    name: str
+    # Exact amount in reais, never a binary float
+    price: Decimal
+    stock: float | None = None
+    active: bool = True
+    category: str | None = None
+    unit: str | None = None
+
+    @property
+    def available(self) -> bool:
+        """Active and in stock (products without stock control are always available)."""
+        return self.active and (self.stock is None or self.stock > 0)
+
+
+class CataloguePage(BaseModel):
+    data: list[Product] = Field(default_factory=list)
+    page: int = 1
+    total_pages: int = 1
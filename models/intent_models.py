@@ -0,0 +1,15 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+
+class IntentMatch(BaseModel):
+    intent: str | None = None
+    confidence: float = 0.0
+    method: Literal["rule", "embedding", "none"] = "none"
+    answer: str | None = None
+
+    @property
+    def is_templated(self) -> bool:
+        """True when the message can be answered without calling the LLM."""
+        return self.answer is not None
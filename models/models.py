@@ -1,59 +1,208 @@
 # models.py
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Literal, Optional, Dict, Any
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
 
 class IngestRequest(BaseModel):
     collection: str
     source_type: Literal["local", "notion"]
-    path: Optional[str] = None  # e.g., 'data/project_a' for local
+    path: str | None = None  # e.g., 'data/project_a' for local
+
 
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
 
+
 class ResponseModel(BaseModel):
     status: str
     message: str
-    data: Optional[Dict[str, Any]] = None
+    data: dict[str, Any] | None = None
+
 
 class TelegramUser(BaseModel):
     id: int
     is_bot: bool
     first_name: str
-    last_name: Optional[str] = None
-    username: Optional[str] = None
-    language_code: Optional[str] = None
+    last_name: str | None = None
+    username: str | None = None
+    language_code: str | None = None
+
 
 class TelegramChat(BaseModel):
     id: int
     type: str
-    title: Optional[str] = None
-    username: Optional[str] = None
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
+    title: str | None = None
+    username: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+
 
 class TelegramMessage(BaseModel):
     message_id: int
-    from_: Optional[TelegramUser] = Field(None, alias="from")
+    from_: TelegramUser | None = Field(None, alias="from")
     date: int
     chat: TelegramChat
-    text: Optional[str] = None
-    photo: Optional[list] = None
-    document: Optional[Dict[str, Any]] = None
-    voice: Optional[Dict[str, Any]] = None
-    
+    text: str | None = None
+    photo: list | None = None
+    document: dict[str, Any] | None = None
+    voice: dict[str, Any] | None = None
+
     model_config = ConfigDict(
         populate_by_name=True,
         extra="allow",
     )
 
+
 class TelegramUpdate(BaseModel):
     update_id: int
-    message: Optional[TelegramMessage] = None
-    edited_message: Optional[TelegramMessage] = None
-    channel_post: Optional[TelegramMessage] = None
-    edited_channel_post: Optional[TelegramMessage] = None
-    
+    message: TelegramMessage | None = None
+    edited_message: TelegramMessage | None = None
+    channel_post: TelegramMessage | None = None
+    edited_channel_post: TelegramMessage | None = None
+
     model_config = ConfigDict(
         extra="allow",
-    )
\ No newline at end of file
+    )
+
+    @property
+    def chat_id(self) -> int:
+        """Chat the update belongs to (0 when it carries no message)."""
+        message = (
+            self.message
+            or self.edited_message
+            or self.channel_post
+            or self.edited_channel_post
+        )
+        return message.chat.id if message else 0
+
+
+class InboundEvent(BaseModel):
+    """
+    Message received on any channel, normalised for the shared pipeline.
+    `event_id` is the channel's delivery id, used for de-duplication.
+    """
+
+    channel: Literal["telegram", "whatsapp"]
+    event_id: str
+    chat_id: int | str
+    text: str | None = None
+    from_bot: bool = False
+
+    @classmethod
+    def from_telegram(cls, update: "TelegramUpdate") -> Optional["InboundEvent"]:
+        """Event for an update's message (None for updates without one)."""
+        message = update.message
+        if not message:
+            return None
+        return cls(
+            channel="telegram",
+            event_id=str(update.update_id),
+            chat_id=message.chat.id,
+            text=message.text,
+            from_bot=bool(message.from_ and message.from_.is_bot),
+        )
+
+
+class WhatsAppText(BaseModel):
+    body: str
+
+
+class WhatsAppMessage(BaseModel):
+    id: str
+    from_: str = Field(alias="from")
+    timestamp: str | None = None
+    type: str
+    text: WhatsAppText | None = None
+    button: dict[str, Any] | None = None
+    interactive: dict[str, Any] | None = None
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        extra="allow",
+    )
+
+    @property
+    def body(self) -> str | None:
+        """Text typed or chosen by the customer (None for media and other types)."""
+        if self.text:
+            return self.text.body
+        if self.button:
+            return self.button.get("text")
+        if self.interactive:
+            reply = (
+                self.interactive.get("button_reply")
+                or self.interactive.get("list_reply")
+                or {}
+            )
+            return reply.get("title")
+        return None
+
+
+class WhatsAppStatus(BaseModel):
+    id: str
+    status: str
+    timestamp: str | None = None
+    recipient_id: str | None = None
+    errors: list[dict[str, Any]] | None = None
+
+    model_config = ConfigDict(
+        extra="allow",
+    )
+
+
+class WhatsAppValue(BaseModel):
+    messaging_product: str = "whatsapp"
+    metadata: dict[str, Any] | None = None
+    messages: list[WhatsAppMessage] = Field(default_factory=list)
+    statuses: list[WhatsAppStatus] = Field(default_factory=list)
+
+    model_config = ConfigDict(
+        extra="allow",
+    )
+
+
+class WhatsAppChange(BaseModel):
+    field: str
+    value: WhatsAppValue
+
+
+class WhatsAppEntry(BaseModel):
+    id: str
+    changes: list[WhatsAppChange] = Field(default_factory=list)
+
+
+class WhatsAppWebhook(BaseModel):
+    """
+    WhatsApp Cloud API webhook payload: a batch of entries, each carrying
+    changes with several messages and delivery statuses.
+    """
+
+    object: str
+    entry: list[WhatsAppEntry] = Field(default_factory=list)
+
+    def events(self) -> list[InboundEvent]:
+        """Every message of the batch, in delivery order."""
+        return [
+            InboundEvent(
+                channel="whatsapp",
+                event_id=message.id,
+                chat_id=message.from_,
+                text=message.body,
+            )
+            for entry in self.entry
+            for change in entry.changes
+            if change.field == "messages"
+            for message in change.value.messages
+        ]
+
+    def statuses(self) -> list[WhatsAppStatus]:
+        """Every delivery status (sent, delivered, read, failed) of the batch."""
+        return [
+            status
+            for entry in self.entry
+            for change in entry.changes
+            if change.field == "messages"
+            for status in change.value.statuses
+        ]
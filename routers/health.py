@@ -1,46 +1,65 @@
-from fastapi import APIRouter, status, Response
-from redis.asyncio import Redis
-import asyncpg
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+
+from core.deps import get_health_service
+from core.server import begin_drain
 from core.settings import settings
+from services.health_service import HealthService
 
 router = APIRouter(prefix="/health", tags=["health"])
 
+
 @router.get("/", status_code=status.HTTP_200_OK)
-async def health_check(response: Response):
-    """
-    Checks the health of the service and its dependencies.
-    """
-    redis_ok = False
-    postgres_ok = False
-
-    # Check Redis connection
-    try:
-        # Note: docker-compose exposes redis on 6380
-        redis_client = Redis(host='localhost', port=6380, db=0, decode_responses=True)
-        if await redis_client.ping():
-            redis_ok = True
-        await redis_client.close()
-    except Exception:
-        pass
-
-    # Check PostgreSQL connection
-    try:
-        conn = await asyncpg.connect(settings.db_url)
-        result = await conn.fetchval('SELECT 1')
-        if result == 1:
-            postgres_ok = True
-        await conn.close()
-    except Exception:
-        pass
-
-    if redis_ok and postgres_ok:
-        return {"status": "ok", "details": {"redis": "ok", "postgres": "ok"}}
-    else:
-        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
-        return {
-            "status": "error",
-            "details": {
-                "redis": "ok" if redis_ok else "error",
-                "postgres": "ok" if postgres_ok else "error",
-            },
-        }
+async def health_check(
+    response: Response, health_service: HealthService = Depends(get_health_service)
+):
+    """
+    Checks the health of the service and its dependencies, as last seen by the
+    background prober.
+    """
+    healthy, details = health_service.dependencies()
+    if healthy:
+        return {"status": "ok", "details": details}
+    response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "error", "details": details}
+
+
+@router.get("/live", status_code=status.HTTP_200_OK)
+async def liveness_check():
+    """
+    Liveness probe: the process is up and the event loop is serving requests.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready", status_code=status.HTTP_200_OK)
+async def readiness_check(
+    response: Response, health_service: HealthService = Depends(get_health_service)
+):
+    """
+    Readiness probe: stores reachable, knowledge base loaded and queue depth
+    below its limit.
+    """
+    ready, details = health_service.readiness()
+    if ready:
+        return {"status": "ok", "details": details}
+    response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "error", "details": details}
+
+
+@router.post("/drain", status_code=status.HTTP_200_OK)
+async def drain(request: Request, x_drain_token: str | None = Header(default=None)):
+    """
+    Pre-stop hook: starts draining before the process is signalled, so
+    readiness is 503 while traffic is still routed here and the updates
+    received from now on are parked for the next instance. Needs the
+    `SHUTDOWN_DRAIN_TOKEN` in the X-Drain-Token header.
+    """
+    token = settings.shutdown_drain_token
+    if not token or not hmac.compare_digest(x_drain_token or "", token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid drain token"
+        )
+    begin_drain(request.app)
+    return {"status": "ok", "details": {"draining": True}}
@@ -1,12 +1,18 @@
+import time
+
 import httpx
-from fastapi import APIRouter, Depends, Request
-from core.deps import get_user_request_service, get_telegram_service
-from services.telegram_service import TelegramService
-from services.user_request_service import UserRequestService
-from utils.tools.log_tool import log_message
-from core.settings import settings
-from models.models import TelegramUpdate, ResponseModel
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from pydantic import ValidationError
 
+from core.deps import get_update_service, get_whatsapp_service
+from core.metrics import stage_duration
+from core.settings import settings
+from core.tracing import tracer
+from models.models import ResponseModel, TelegramUpdate, WhatsAppWebhook
+from services.update_service import UpdateService
+from services.whatsapp_service import WhatsAppService
+from utils.tools.log_tool import log_message
 
 # Webhooks router
 webhooks = APIRouter(prefix="/webhook", tags=["telegram", "whatsapp"])
@@ -14,69 +20,95 @@ webhooks = APIRouter(prefix="/webhook", tags=["telegram", "whatsapp"])
 
 @webhooks.post("/telegram")
 async def telegram_webhook(
-        update: TelegramUpdate,
-        user_request_service: UserRequestService = Depends(get_user_request_service),
-        telegram_service: TelegramService = Depends(get_telegram_service)
-    ) -> ResponseModel:
+    update: TelegramUpdate,
+    request: Request,
+    update_service: UpdateService = Depends(get_update_service),
+) -> ResponseModel:
     """
     Telegram webhook endpoint to receive updates from Telegram Bot API.
 
     This endpoint receives updates from Telegram when users interact with your bot.
     It processes different types of updates like messages, edited messages, etc.
+    Errors are returned with 200 OK so Telegram does not retry the update.
     """
-    try:
-        log_message(f"Received Telegram update: {update.update_id}", "INFO")
-        # Extract the message from different update types
-        message = None
-        chat = None
-        if update.message:
-            message = update.message
-            chat = update.message.chat
-        elif update.edited_message:
-            message = update.edited_message
-        elif update.channel_post:
-            message = update.channel_post
-        elif update.edited_channel_post:
-            message = update.edited_channel_post
-        if not message or not chat:
-            log_message("No message found in update", "WARNING")
-            return ResponseModel(status="ok", message="No message to process")
-        # Check if the message is from a bot to prevent infinite loops
-        if message.from_ and message.from_.is_bot:
-            log_message(
-                f"Ignoring message from bot {message.from_.id} to prevent loops", "INFO")
-            return ResponseModel(status="ok", message="Bot message ignored")
-        if not message.text or message.text.strip() == "":
-            log_message("Empty message text, ignoring", "WARNING")
-            return ResponseModel(status="ok", message="Empty message ignored")
-        # Process the message (this will handle the Oracle AI integration and response)
-        telegram_reply = await user_request_service.process_user_request(message.text, chat.id)
-        response = await telegram_service.send_message(chat.id, telegram_reply.content)
-        log_message(f"Successfully processed update {update.update_id}", "INFO")
-        return ResponseModel(status="ok", message="Message processed successfully", data={"response": response})
-    except Exception as e:
-        log_message(f"Error processing Telegram webhook: {str(e)}", "ERROR")
-        # Return 200 OK to Telegram even on errors to prevent retries
-        return ResponseModel(status="error", message="Internal error occurred", data={"error": str(e)})
+    received_at = getattr(request.state, "received_at", None)
+    received_at_ns = getattr(request.state, "received_at_ns", None)
+    with tracer.start_trace(
+        "telegram_webhook", start_ns=received_at_ns, update_id=update.update_id
+    ):
+        if received_at is not None:
+            stage_duration.observe(
+                time.perf_counter() - received_at, stage="webhook_parse"
+            )
+            tracer.record_span("webhook_parse", received_at_ns, time.time_ns())
+        return await update_service.submit(
+            update,
+            source="webhook",
+            received_at=received_at_ns / 1e9 if received_at_ns is not None else None,
+        )
+
+
+@webhooks.get("/whatsapp")
+async def whatsapp_verify(
+    request: Request, whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)
+) -> PlainTextResponse:
+    """
+    Verification request Meta sends when the WhatsApp webhook is registered:
+    echoes `hub.challenge` when `hub.verify_token` matches.
+    """
+    params = request.query_params
+    if not whatsapp_service.verify_subscription(
+        params.get("hub.mode"), params.get("hub.verify_token")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Webhook verification failed"
+        )
+    return PlainTextResponse(params.get("hub.challenge", ""))
 
 
 @webhooks.post("/whatsapp")
-async def whatsapp_webhook(request: Request) -> ResponseModel:
+async def whatsapp_webhook(
+    request: Request,
+    update_service: UpdateService = Depends(get_update_service),
+    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service),
+) -> ResponseModel:
     """
-    WhatsApp webhook endpoint to receive updates from WhatsApp Business API.
+    WhatsApp webhook endpoint to receive updates from the WhatsApp Cloud API.
 
-    This endpoint receives updates from WhatsApp when users interact with your business account.
-    It processes different types of updates like messages, status updates, etc.
+    Each delivery batches several entries and changes, with the messages and
+    the delivery statuses of sent replies, and is processed as one batch.
+    Invalid payloads are answered with 200 OK so Meta does not retry them.
     """
+    received_at = getattr(request.state, "received_at", None)
+    received_at_ns = getattr(request.state, "received_at_ns", None)
+    body = await request.body()
+    if not whatsapp_service.verify_signature(
+        body, request.headers.get("X-Hub-Signature-256")
+    ):
+        log_message("Rejected WhatsApp webhook with an invalid signature", "WARNING")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature"
+        )
     try:
-        log_message("Received WhatsApp update", "INFO")
-        # Process WhatsApp updates here
-        # For now, we will just return a success message
-        return ResponseModel(status="ok", message="WhatsApp webhook received successfully")
-
-    except Exception as e:
-        log_message(f"Error processing WhatsApp webhook: {str(e)}", "ERROR")
-        return ResponseModel(status="error", message="Internal error occurred", data={"error": str(e)})
+        payload = WhatsAppWebhook.model_validate_json(body)
+    except ValidationError as e:
+        log_message(f"Invalid WhatsApp webhook payload: {e}", "WARNING")
+        return ResponseModel(
+            status="error", message="Invalid payload", data={"error": str(e)}
+        )
+    with tracer.start_trace(
+        "whatsapp_webhook", start_ns=received_at_ns, entries=len(payload.entry)
+    ):
+        if received_at is not None:
+            stage_duration.observe(
+                time.perf_counter() - received_at, stage="webhook_parse"
+            )
+            tracer.record_span("webhook_parse", received_at_ns, time.time_ns())
+        return await update_service.submit_whatsapp(
+            payload,
+            source="webhook",
+            received_at=received_at_ns / 1e9 if received_at_ns is not None else None,
+        )
 
 
 @webhooks.get("/test-api")
@@ -87,7 +119,7 @@ async def test_telegram_api():
     try:
         if not settings.telegram_bot_token:
             return {"status": "error", "message": "No bot token configured"}
-        url = f"https://api.telegram.org/bot{settings.telegram_bot_token}/getMe"
+        url = f"{settings.telegram_api_url}/bot{settings.telegram_bot_token}/getMe"
         async with httpx.AsyncClient(timeout=10.0) as client:
             response = await client.get(url)
             result = response.json()
@@ -100,21 +132,21 @@ async def test_telegram_api():
                     "id": bot_info.get("id"),
                     "username": bot_info.get("username"),
                     "first_name": bot_info.get("first_name"),
-                    "is_bot": bot_info.get("is_bot")
-                }
+                    "is_bot": bot_info.get("is_bot"),
+                },
             }
         else:
             return {
                 "status": "error",
                 "message": "Telegram API returned error",
-                "error": result.get("description", "Unknown error")
+                "error": result.get("description", "Unknown error"),
             }
 
     except Exception as e:
         return {
             "status": "error",
             "message": "Failed to connect to Telegram API",
-            "error": str(e)
+            "error": str(e),
         }
 
 
@@ -127,11 +159,14 @@ async def webhook_info():
     return {
         "status": "active",
         "endpoint": "/webhook",
-        "supported_updates": [
-            "message",
-            "edited_message",
-            "channel_post",
-            "edited_channel_post"
-        ],
-        "description": "Webhooks for Oracle Celim application"
+        "supported_updates": {
+            "telegram": [
+                "message",
+                "edited_message",
+                "channel_post",
+                "edited_channel_post",
+            ],
+            "whatsapp": ["messages", "statuses"],
+        },
+        "description": "Webhooks for Oracle Celim application",
     }
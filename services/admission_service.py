@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Optional
+
+from core.metrics import admission_decisions, admission_state
+from core.resilience import remaining_time
+from utils.tools.log_tool import log_message
+
+
+class AdmissionService:
+    """
+    Admission control for agent runs.
+
+    At most `max_in_flight` agent runs execute at once and at most
+    `max_waiting` requests wait for a slot (for up to `max_wait` seconds);
+    anything beyond that is rejected, so the amount of work in the process
+    stays bounded. The service is "under pressure" while every slot is taken or
+    requests are waiting, or while the recent LLM latency or queue wait exceeds
+    its threshold. Callers then degrade: answer from the caches, use the fast
+    model and defer low-priority work (such as memory updates) until the
+    pressure is gone.
+    """
+
+    _instance: Optional["AdmissionService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        max_in_flight: int = 8,
+        max_waiting: int = 32,
+        max_wait: float = 30.0,
+        queue_wait_threshold: float = 5.0,
+        llm_latency_threshold: float = 8.0,
+        max_deferred: int = 200,
+        window: float = 60.0,
+    ) -> None:
+        """
+        Initialize the controller with its limits and pressure thresholds.
+        """
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.queue_wait_threshold = queue_wait_threshold
+        self.llm_latency_threshold = llm_latency_threshold
+        self.window = window
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._llm_latencies: deque[tuple[float, float]] = deque(maxlen=50)
+        self._queue_waits: deque[tuple[float, float]] = deque(maxlen=50)
+        self.deferred: asyncio.Queue = asyncio.Queue(maxsize=max_deferred)
+        self._task: asyncio.Task | None = None
+        self._update_state()
+        log_message("AdmissionService initialized successfully", "INFO")
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run_deferred())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _recent_mean(self, samples: deque[tuple[float, float]]) -> float:
+        cutoff = time.monotonic() - self.window
+        recent = [value for observed_at, value in samples if observed_at >= cutoff]
+        return sum(recent) / len(recent) if recent else 0.0
+
+    @property
+    def llm_latency(self) -> float:
+        return self._recent_mean(self._llm_latencies)
+
+    @property
+    def queue_wait(self) -> float:
+        return self._recent_mean(self._queue_waits)
+
+    @property
+    def under_pressure(self) -> bool:
+        return (
+            self.in_flight >= self.max_in_flight
+            or self.waiting > 0
+            or self.llm_latency > self.llm_latency_threshold
+            or self.queue_wait > self.queue_wait_threshold
+        )
+
+    def observe_llm_latency(self, seconds: float) -> None:
+        self._llm_latencies.append((time.monotonic(), seconds))
+        self._update_state()
+
+    def observe_queue_wait(self, seconds: float) -> None:
+        self._queue_waits.append((time.monotonic(), seconds))
+        self._update_state()
+
+    async def acquire(self, on_busy: Callable[[], Awaitable] | None = None) -> bool:
+        """
+        Takes an agent run slot. When none is free the request waits in line
+        (calling `on_busy` first so the user can be told), unless the line is
+        full or the wait exceeds `max_wait` (or the request deadline), in which
+        case False is returned.
+        """
+        under_pressure = self.under_pressure
+        if not self._semaphore.locked() and self.waiting == 0:
+            await self._semaphore.acquire()
+            return self._admitted(under_pressure)
+        if self.waiting >= self.max_waiting:
+            admission_decisions.inc(decision="rejected")
+            return False
+        admission_decisions.inc(decision="queued")
+        self.waiting += 1
+        self._update_state()
+        started = time.monotonic()
+        try:
+            if on_busy:
+                try:
+                    await on_busy()
+                except Exception as e:
+                    log_message(f"Error sending busy message: {e}", "WARNING")
+            remaining = self.max_wait - (time.monotonic() - started)
+            deadline_left = remaining_time()
+            if deadline_left is not None:
+                remaining = min(remaining, deadline_left)
+            remaining = max(0.0, remaining)
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=remaining)
+        except TimeoutError:
+            admission_decisions.inc(decision="rejected")
+            return False
+        finally:
+            self.waiting -= 1
+            self.observe_queue_wait(time.monotonic() - started)
+        return self._admitted(True)
+
+    def _admitted(self, degraded: bool) -> bool:
+        self.in_flight += 1
+        admission_decisions.inc(decision="degraded" if degraded else "admitted")
+        self._update_state()
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+        self._update_state()
+
+    def defer(self, task: Callable[[], Awaitable]) -> bool:
+        """
+        Queues low-priority work to run once the pressure is gone. The work is
+        dropped when the deferred queue is full.
+        """
+        try:
+            self.deferred.put_nowait(task)
+            return True
+        except asyncio.QueueFull:
+            admission_decisions.inc(decision="deferred_dropped")
+            return False
+        finally:
+            self._update_state()
+
+    async def _run_deferred(self) -> None:
+        while True:
+            task = await self.deferred.get()
+            while self.under_pressure:
+                await asyncio.sleep(1.0)
+            try:
+                await task()
+            except Exception as e:
+                log_message(f"Error running deferred task: {e}", "ERROR")
+            self._update_state()
+
+    def _update_state(self) -> None:
+        admission_state.set(self.in_flight, state="agent_runs")
+        admission_state.set(self.waiting, state="waiting")
+        admission_state.set(self.deferred.qsize(), state="deferred")
+        admission_state.set(1 if self.under_pressure else 0, state="pressure")
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from typing import Any, Optional
+
+from pydantic import ValidationError
+
+from core.metrics import cache_requests, track_stage
+from models.models import InboundEvent
+from services.intent_service import normalize_text
+from utils.tools.log_tool import log_message
+
+
+class CacheService:
+    """
+    State shared by all workers through Redis: update de-duplication, the
+    answer cache and the events parked by a worker that shut down before
+    answering them. Redis errors never fail a request; dedup lets the update
+    through and the cache reports a miss. Every round trip is timed as the
+    "redis" stage.
+    """
+
+    _instance: Optional["CacheService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        redis_client: Any,
+        prefix: str = "espetos",
+        dedup_ttl: int = 86400,
+        answer_ttl: int = 600,
+    ) -> None:
+        """
+        Initialize the cache with the shared Redis client.
+        """
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.dedup_ttl = dedup_ttl
+        self.answer_ttl = answer_ttl
+        log_message("CacheService initialized successfully", "INFO")
+
+    async def is_duplicate(self, kind: str, key: Any) -> bool:
+        """
+        Marks `key` as seen and tells whether any worker had already seen it.
+        """
+        try:
+            with track_stage("redis"):
+                first = await self.redis_client.set(
+                    f"{self.prefix}:dedup:{kind}:{key}", 1, nx=True, ex=self.dedup_ttl
+                )
+            return not first
+        except Exception as e:
+            log_message(f"Error checking duplicate {kind} {key}: {e}", "WARNING")
+            return False
+
+    async def are_duplicates(self, kind: str, keys: list[Any]) -> list[bool]:
+        """
+        `is_duplicate` for a batch of keys in a single Redis round trip.
+        """
+        if not keys:
+            return []
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.set(
+                    f"{self.prefix}:dedup:{kind}:{key}", 1, nx=True, ex=self.dedup_ttl
+                )
+            with track_stage("redis"):
+                return [not first for first in await pipeline.execute()]
+        except Exception as e:
+            log_message(f"Error checking duplicate {kind} batch: {e}", "WARNING")
+            return [False] * len(keys)
+
+    @property
+    def _parked_key(self) -> str:
+        return f"{self.prefix}:parked"
+
+    async def park_events(self, events: list[InboundEvent]) -> int:
+        """
+        Stores events this worker accepted but could not answer, for the next
+        instance to pick up. Returns how many were stored.
+        """
+        if not events:
+            return 0
+        try:
+            with track_stage("redis"):
+                await self.redis_client.rpush(
+                    self._parked_key,
+                    *(event.model_dump_json(exclude_none=True) for event in events),
+                )
+            return len(events)
+        except Exception as e:
+            log_message(
+                f"Error parking {len(events)} events, they will not be answered: {e}",
+                "ERROR",
+            )
+            return 0
+
+    async def take_parked_events(self, batch_size: int = 100) -> list[InboundEvent]:
+        """
+        Claims every parked event, in the order they were parked. Each event
+        is handed to a single instance.
+        """
+        events: list[InboundEvent] = []
+        while True:
+            try:
+                with track_stage("redis"):
+                    batch = await self.redis_client.lpop(self._parked_key, batch_size)
+            except Exception as e:
+                log_message(f"Error reading parked events: {e}", "WARNING")
+                return events
+            for item in batch or []:
+                try:
+                    events.append(InboundEvent.model_validate_json(item))
+                except ValidationError as e:
+                    log_message(f"Dropping malformed parked event: {e}", "WARNING")
+            if not batch or len(batch) < batch_size:
+                return events
+
+    def _answer_key(self, question: str) -> str:
+        digest = hashlib.sha1(normalize_text(question).encode("utf-8")).hexdigest()
+        return f"{self.prefix}:answer:{digest}"
+
+    async def get_answer(self, question: str) -> str | None:
+        try:
+            with track_stage("redis"):
+                answer = await self.redis_client.get(self._answer_key(question))
+        except Exception as e:
+            log_message(f"Error reading answer cache: {e}", "WARNING")
+            answer = None
+        cache_requests.inc(cache="answer", result="hit" if answer else "miss")
+        return answer
+
+    async def set_answer(self, question: str, answer: str) -> None:
+        try:
+            with track_stage("redis"):
+                await self.redis_client.set(
+                    self._answer_key(question), answer, ex=self.answer_ttl
+                )
+        except Exception as e:
+            log_message(f"Error writing answer cache: {e}", "WARNING")
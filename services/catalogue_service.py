@@ -0,0 +1,284 @@
+import asyncio
+import re
+import threading
+import time
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Optional
+
+import httpx
+
+from core.metrics import cache_requests, track_stage
+from models.catalogue_models import CataloguePage, Product
+from services.intent_service import normalize_text
+from utils.tools.log_tool import log_message
+
+# Words dropped when building the lookup keys of a product name or a question
+STOPWORDS = frozenset(
+    {"o", "a", "os", "as", "um", "uma", "de", "do", "da", "dos", "das", "com", "e"}
+)
+# Generic words that alone do not identify a product
+GENERIC_WORDS = frozenset(
+    {
+        "espeto",
+        "espetos",
+        "espetinho",
+        "espetinhos",
+        "porcao",
+        "porcoes",
+        "lata",
+        "garrafa",
+    }
+)
+
+AVAILABILITY_PATTERN = re.compile(
+    r"^(?:voces )?(?:ainda )?(?:tem|teria|tera|ha|vai ter)\s+(?P<item>.+?)(?:\s+(?:hoje|ai|agora|disponivel|ainda))*$"
+)
+PRICE_PATTERN = re.compile(
+    r"^(?:quanto (?:custa|custam|e|eh|ta|sai|fica)|qual (?:e )?(?:o )?(?:preco|valor)|preco)\s+(?P<item>.+?)"
+    r"(?:\s+(?:hoje|ai|agora))*$"
+)
+
+
+def format_price(price: Decimal) -> str:
+    cents = Decimal(price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return "R$ " + f"{cents:,}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def name_keys(text: str) -> list[str]:
+    """
+    Lookup keys of a product name or of the item asked about: the normalized
+    text, without stopwords, without generic words and in the singular.
+    """
+    words = normalize_text(text).split()
+    content = [word for word in words if word not in STOPWORDS]
+    specific = [word for word in content if word not in GENERIC_WORDS]
+    keys = []
+    for candidate in (
+        words,
+        content,
+        specific,
+        [word.removesuffix("s") for word in specific],
+    ):
+        key = " ".join(candidate)
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+class CatalogueIndex:
+    """
+    Immutable snapshot of the catalogue indexed by SKU, by name keys and by
+    distinctive words, so each lookup is a few dict lookups.
+    """
+
+    def __init__(self, products: list[Product], synced_at: float | None = None):
+        self.synced_at = synced_at if synced_at is not None else time.time()
+        self.by_sku: dict[str, Product] = {}
+        names: dict[str, set[str]] = defaultdict(set)
+        words: dict[str, set[str]] = defaultdict(set)
+        for product in products:
+            self.by_sku[normalize_text(product.sku)] = product
+            for key in name_keys(product.name):
+                names[key].add(product.sku)
+            for word in name_keys(product.name)[-1].split():
+                words[word].add(product.sku)
+        # A key names every product it is a key of or whose name has all its
+        # words; a key naming several ("frango") maps to None and is left to the agent
+        self.by_name: dict[str, Product | None] = {}
+        for key, skus in names.items():
+            owners = skus | set.intersection(
+                *(words.get(word, set()) for word in key.split())
+            )
+            self.by_name[key] = (
+                self.by_sku[normalize_text(next(iter(owners)))]
+                if len(owners) == 1
+                else None
+            )
+        # Words that identify a single product ("picanha", "coracao")
+        self.by_word: dict[str, Product] = {
+            word: self.by_sku[normalize_text(next(iter(skus)))]
+            for word, skus in words.items()
+            if len(skus) == 1
+        }
+
+    def __len__(self) -> int:
+        return len(self.by_sku)
+
+    def lookup(self, query: str) -> Product | None:
+        """
+        Finds a product by SKU, name or distinctive word. Returns None when
+        nothing (or more than one product) matches.
+        """
+        product = self.by_sku.get(normalize_text(query))
+        if product:
+            return product
+        keys = name_keys(query)
+        for key in keys:
+            if key in self.by_name:
+                return self.by_name[key]
+        if keys and len(keys[-1].split()) == 1:
+            return self.by_word.get(keys[-1])
+        return None
+
+
+class SmartPOSClient:
+    """
+    HTTP client for the SmartPOS product API (GET /v1/products, paginated,
+    bearer token authentication).
+    """
+
+    def __init__(
+        self, base_url: str, api_key: str, timeout: float = 10.0, page_size: int = 100
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.page_size = page_size
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+
+    async def fetch_products(self) -> list[Product]:
+        """
+        Fetches every page of the product catalogue with prices and stock.
+        """
+        products: list[Product] = []
+        page, total_pages = 1, 1
+        while page <= total_pages:
+            response = await self.client.get(
+                "/v1/products", params={"page": page, "page_size": self.page_size}
+            )
+            response.raise_for_status()
+            # Parsed from the raw body so prices keep their exact decimal value
+            result = CataloguePage.model_validate_json(response.content)
+            products.extend(result.data)
+            total_pages = result.total_pages
+            page += 1
+        return products
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class CatalogueService:
+    """
+    Local copy of the SmartPOS catalogue (products, prices and stock).
+
+    The catalogue is synced into a `CatalogueIndex` at startup and refreshed in
+    the background; a failed refresh keeps the previous snapshot. Availability
+    and price questions ("tem X hoje?", "quanto custa Y?") are answered straight
+    from the index, without retrieval or generation, while the snapshot is
+    fresh; the agent gets the same lookups as tools for everything else.
+    """
+
+    _instance: Optional["CatalogueService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        client: SmartPOSClient,
+        refresh_interval: float = 300.0,
+        max_staleness: float = 900.0,
+    ) -> None:
+        """
+        Initialize the service with the SmartPOS client and refresh policy.
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.index = CatalogueIndex([], synced_at=0.0)
+        self._task: asyncio.Task | None = None
+        log_message("CatalogueService initialized successfully", "INFO")
+
+    async def start(self) -> None:
+        """
+        Runs the first sync and starts the background refresh.
+        """
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.client.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def refresh(self) -> bool:
+        """
+        Fetches the catalogue and swaps in a new index. Returns False (and
+        keeps the current snapshot) when the sync fails.
+        """
+        try:
+            with track_stage("catalogue_sync"):
+                products = await self.client.fetch_products()
+            self.index = CatalogueIndex(products)
+            log_message(f"Catalogue synced: {len(products)} products", "INFO")
+            return True
+        except Exception as e:
+            log_message(
+                f"Error syncing the SmartPOS catalogue, keeping the previous snapshot: {e}",
+                "ERROR",
+            )
+            return False
+
+    @property
+    def is_fresh(self) -> bool:
+        return (
+            len(self.index) > 0
+            and time.time() - self.index.synced_at <= self.max_staleness
+        )
+
+    def lookup(self, query: str) -> Product | None:
+        return self.index.lookup(query)
+
+    def parse_question(self, user_input: str) -> tuple[str, str] | None:
+        """
+        Recognises availability and price questions. Returns (kind, item).
+        """
+        normalized = normalize_text(user_input)
+        for kind, pattern in (
+            ("availability", AVAILABILITY_PATTERN),
+            ("price", PRICE_PATTERN),
+        ):
+            match = pattern.match(normalized)
+            if match:
+                return kind, match.group("item")
+        return None
+
+    def answer(self, user_input: str) -> str | None:
+        """
+        Answers "tem X hoje?" and "quanto custa Y?" from the index. Returns
+        None when the message is not such a question, the product is unknown
+        or the snapshot is stale, so the agent handles it instead.
+        """
+        question = self.parse_question(user_input)
+        if question is None:
+            return None
+        kind, item = question
+        product = self.lookup(item) if self.is_fresh else None
+        cache_requests.inc(cache="catalogue", result="hit" if product else "miss")
+        if product is None:
+            return None
+        price = format_price(product.price)
+        if kind == "price":
+            return f"{product.name} custa {price}."
+        if product.available:
+            return f"Temos sim! {product.name} está disponível hoje por {price}."
+        return f"Infelizmente {product.name} está em falta hoje."
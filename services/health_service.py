@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Optional
+
+from core.metrics import track_stage
+from utils.tools.log_tool import log_message
+
+
+class HealthService:
+    """
+    Probes Redis and Postgres from a background task over the shared pools and
+    caches the results, so health endpoints only read memory and never open a
+    connection themselves.
+    """
+
+    _instance: Optional["HealthService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        redis_client: Any,
+        postgres_pool: Any,
+        knowledge_service: Any = None,
+        queue_depth: Callable[[], float] | None = None,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        max_staleness: float = 15.0,
+        max_queue_depth: int = 100,
+    ) -> None:
+        """
+        Initialize the prober with the shared Redis client and Postgres pool.
+        """
+        try:
+            self.redis_client = redis_client
+            self.postgres_pool = postgres_pool
+            self.knowledge_service = knowledge_service
+            self.queue_depth = queue_depth or (lambda: 0)
+            self.interval = interval
+            self.timeout = timeout
+            self.max_staleness = max_staleness
+            self.max_queue_depth = max_queue_depth
+            self.results: dict[str, bool] = {"redis": False, "postgres": False}
+            self.checked_at: float | None = None
+            self.draining = False
+            self._task: asyncio.Task | None = None
+            log_message("HealthService initialized successfully", "INFO")
+        except Exception as e:
+            log_message(f"Error initializing HealthService: {e}", "ERROR")
+            raise e
+
+    async def start(self) -> None:
+        """
+        Runs a first probe and starts the background prober.
+        """
+        await self.probe()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.probe()
+            except Exception as e:
+                log_message(f"Error running health probe: {e}", "ERROR")
+
+    async def probe(self) -> dict[str, bool]:
+        """
+        Checks both stores concurrently and caches the results.
+        """
+        redis_ok, postgres_ok = await asyncio.gather(
+            self._check_redis(), self._check_postgres()
+        )
+        self.results = {"redis": redis_ok, "postgres": postgres_ok}
+        self.checked_at = time.monotonic()
+        return self.results
+
+    async def _check_redis(self) -> bool:
+        if self.redis_client is None:
+            return False
+        try:
+            with track_stage("redis"):
+                return bool(
+                    await asyncio.wait_for(self.redis_client.ping(), self.timeout)
+                )
+        except Exception:
+            return False
+
+    async def _check_postgres(self) -> bool:
+        if self.postgres_pool is None:
+            return False
+        try:
+            with track_stage("postgres"):
+                async with self.postgres_pool.acquire(timeout=self.timeout) as conn:
+                    return (
+                        await asyncio.wait_for(conn.fetchval("SELECT 1"), self.timeout)
+                        == 1
+                    )
+        except Exception:
+            return False
+
+    def dependencies(self) -> tuple[bool, dict[str, str]]:
+        """
+        Cached store status; everything is reported as an error when the last
+        probe is older than `max_staleness`.
+        """
+        fresh = (
+            self.checked_at is not None
+            and time.monotonic() - self.checked_at <= self.max_staleness
+        )
+        details = {
+            name: "ok" if fresh and ok else "error" for name, ok in self.results.items()
+        }
+        return all(status == "ok" for status in details.values()), details
+
+    def readiness(self) -> tuple[bool, dict[str, Any]]:
+        """
+        Ready when the stores are up, the knowledge base is loaded, the queue
+        is below its limit and the worker is not shutting down.
+        """
+        ready, details = self.dependencies()
+        knowledge = getattr(self.knowledge_service, "load_state", "unknown")
+        depth = self.queue_depth()
+        details = {
+            **details,
+            "knowledge": knowledge,
+            "queue_depth": depth,
+            "draining": self.draining,
+        }
+        ready = (
+            ready
+            and knowledge == "loaded"
+            and depth < self.max_queue_depth
+            and not self.draining
+        )
+        return ready, details
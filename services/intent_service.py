@@ -0,0 +1,226 @@
+import asyncio
+import math
+import re
+import threading
+import unicodedata
+from collections.abc import Iterable
+from typing import Any, Optional
+
+from agent.intent_template import intent_templates
+from models.intent_models import IntentMatch
+from utils.tools.log_tool import log_message
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercases the text, strips accents and punctuation and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class IntentService:
+    """
+    Local intent classifier that runs ahead of the agent.
+
+    Keyword/regex rules are tried first, then nearest-neighbour over cached
+    embeddings of the intent examples. Templated intents are answered from a
+    table precomputed from the knowledge base, everything else goes to the LLM.
+
+    Classification runs before admission control, so the embedding calls have
+    a bound of their own: at most `embedding_concurrency` at a time, and a
+    message whose embedding is not back within `embedding_timeout` seconds
+    (waiting for a slot included) is left to the LLM.
+    """
+
+    _instance: Optional["IntentService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    # Longer messages are treated as open-ended questions
+    max_words: int = 12
+    similarity_threshold: float = 0.82
+    embedding_timeout: float = 1.0
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    @classmethod
+    def standalone(cls) -> "IntentService":
+        """
+        Returns a new instance that is not shared, so initializing it leaves the
+        FAQ table of the running service alone (offline evaluation).
+        """
+        return super().__new__(cls)
+
+    async def initialize(
+        self,
+        documents: Iterable[Any] | None = None,
+        embedder: Any | None = None,
+        similarity_threshold: float | None = None,
+        embedding_concurrency: int = 4,
+        embedding_timeout: float | None = None,
+    ) -> None:
+        """
+        Compiles the rules, builds the FAQ table from the knowledge documents and
+        caches the embeddings of the intent examples.
+        """
+        try:
+            if similarity_threshold is not None:
+                self.similarity_threshold = similarity_threshold
+            if embedding_timeout is not None:
+                self.embedding_timeout = embedding_timeout
+            self._embedding_slots = asyncio.Semaphore(embedding_concurrency)
+            self.rules: list[tuple[str, re.Pattern]] = [
+                (intent, re.compile(pattern))
+                for intent, template in intent_templates.items()
+                for pattern in template["patterns"]
+            ]
+            self.faq_table: dict[str, str] = self.build_faq_table(documents or [])
+            self.embedder = embedder
+            self.example_embeddings: list[tuple[str, list[float]]] = []
+            if embedder is not None:
+                await self._cache_example_embeddings()
+            log_message(
+                f"IntentService initialized with {len(self.faq_table)} templated intents",
+                "INFO",
+            )
+        except Exception as e:
+            log_message(f"Error initializing IntentService: {e}", "ERROR")
+            raise e
+
+    def build_faq_table(self, documents: Iterable[Any]) -> dict[str, str]:
+        """
+        Precomputes the answer of every templated intent.
+
+        Intents with `knowledge_keys` are only answered locally when a matching
+        fact is found in the documents metadata or in a "key: value" content line.
+        """
+        facts: dict[str, str] = {}
+        for doc in documents:
+            meta_data = getattr(doc, "meta_data", None) or {}
+            content = getattr(doc, "content", "") or ""
+            for key, value in meta_data.items():
+                if value not in (None, "") and isinstance(value, (str, int, float)):
+                    facts.setdefault(
+                        normalize_text(str(key)).replace(" ", "_"), str(value).strip()
+                    )
+            for line in content.splitlines():
+                key, sep, value = line.partition(":")
+                if sep and value.strip():
+                    facts.setdefault(
+                        normalize_text(key).replace(" ", "_"), value.strip()
+                    )
+
+        table: dict[str, str] = {}
+        for intent, template in intent_templates.items():
+            keys = template["knowledge_keys"]
+            if not keys:
+                table[intent] = template["answer"]
+                continue
+            value = next(
+                (
+                    fact
+                    for name, fact in facts.items()
+                    for key in keys
+                    if f"_{key}_" in f"_{name}_"
+                ),
+                None,
+            )
+            if value is not None:
+                table[intent] = template["answer"].format(value=value)
+        return table
+
+    async def _cache_example_embeddings(self) -> None:
+        try:
+            for intent, template in intent_templates.items():
+                for example in template["examples"]:
+                    embedding = await asyncio.to_thread(
+                        self.embedder.get_embedding, example
+                    )
+                    if embedding:
+                        self.example_embeddings.append((intent, embedding))
+        except Exception as e:
+            log_message(
+                f"Intent embeddings disabled, could not embed examples: {e}", "WARNING"
+            )
+            self.example_embeddings = []
+
+    def match_rules(self, normalized: str) -> str | None:
+        """
+        Returns the intent when exactly one intent rule matches the message.
+        """
+        matched = {
+            intent for intent, pattern in self.rules if pattern.search(normalized)
+        }
+        return matched.pop() if len(matched) == 1 else None
+
+    async def match_embeddings(self, text: str) -> tuple[str | None, float]:
+        """
+        Returns the nearest intent example and its cosine similarity.
+        """
+        if not self.example_embeddings:
+            return None, 0.0
+        try:
+            query = await asyncio.wait_for(
+                self._embed(text), timeout=self.embedding_timeout
+            )
+        except TimeoutError:
+            log_message(
+                f"Intent embedding timed out after {self.embedding_timeout}s, leaving it to the LLM",
+                "WARNING",
+            )
+            return None, 0.0
+        except Exception as e:
+            log_message(f"Error embedding message for intent matching: {e}", "WARNING")
+            return None, 0.0
+        if not query:
+            return None, 0.0
+        best_intent, best_score = None, 0.0
+        for intent, embedding in self.example_embeddings:
+            score = cosine_similarity(query, embedding)
+            if score > best_score:
+                best_intent, best_score = intent, score
+        return best_intent, best_score
+
+    async def _embed(self, text: str) -> list[float]:
+        async with self._embedding_slots:
+            return await asyncio.to_thread(self.embedder.get_embedding, text)
+
+    async def classify(self, text: str) -> IntentMatch:
+        """
+        Classifies a user message, returning the templated answer when there is one.
+        """
+        normalized = normalize_text(text)
+        if not normalized or len(normalized.split()) > self.max_words:
+            return IntentMatch()
+
+        intent = self.match_rules(normalized)
+        if intent:
+            return IntentMatch(
+                intent=intent,
+                confidence=1.0,
+                method="rule",
+                answer=self.faq_table.get(intent),
+            )
+
+        intent, score = await self.match_embeddings(text)
+        if intent and score >= self.similarity_threshold:
+            return IntentMatch(
+                intent=intent,
+                confidence=score,
+                method="embedding",
+                answer=self.faq_table.get(intent),
+            )
+        return IntentMatch(confidence=score)
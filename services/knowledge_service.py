@@ -1,20 +1,29 @@
 import threading
-from agno.knowledge.pdf import PDFKnowledgeBase
-from agno.knowledge.document import DocumentKnowledgeBase
-from agno.knowledge.combined import CombinedKnowledgeBase
-from agno.vectordb.pgvector import PgVector
-from agno.document.chunking.agentic import AgenticChunking
-from typing import Optional
-from utils.tools.log_tool import log_message
-from utils.handlers.to_agnodoc_handler import to_agnodoc_helper
+from collections.abc import Iterator, Sequence
+from typing import TYPE_CHECKING, Any, Optional
+
+import httpx
+
 from core.settings import settings
-from langchain_community.document_loaders import NotionDBLoader
+from utils.handlers.metadata_handler import parse_properties
+from utils.tools.log_tool import log_message
+
+if TYPE_CHECKING:
+    from agno.knowledge.document import DocumentKnowledgeBase
+    from agno.knowledge.pdf import PDFKnowledgeBase
+    from langchain_community.document_loaders import NotionDBLoader
+    from langchain_core.documents.base import Document
+
 
 class KnowledgeService:
     _instance: Optional["KnowledgeService"] = None
     _lock: threading.Lock = threading.Lock()
+    notion_documents: Sequence[Any] = ()
+    load_state: str = "pending"
 
-    def __new__(cls, ):
+    def __new__(
+        cls,
+    ):
         if not cls._instance:
             with cls._lock:
                 if not cls._instance:
@@ -24,35 +33,53 @@ class KnowledgeService:
     async def process_knowledge(self) -> None:
         """
         Initializes the knowledge bases for the application.
+        agno, pgvector and the Notion loader are imported here rather than
+        at module import, to keep cold starts fast.
         """
+        from agno.document.chunking.agentic import AgenticChunking
+        from agno.vectordb.pgvector import PgVector
+
+        from core.instrumentation import InstrumentedCombinedKnowledgeBase
+
+        self.load_state = "loading"
         try:
             self.pdf_knowledge = await self.get_pdf_knowledge()
             self.document_knowledge = await self.get_notion_knowledge()
-            self.combined_knowledge = CombinedKnowledgeBase(
+            self.combined_knowledge = InstrumentedCombinedKnowledgeBase(
                 sources=[self.pdf_knowledge, self.document_knowledge],
                 chunking_strategy=AgenticChunking(),
                 vector_db=PgVector(
                     table_name="combined_knowledge",
                     db_url=settings.db_url,
-                    embedder=settings.embedder
-                )
+                    embedder=settings.embedder,
+                ),
             )
             # Try to load the combined knowledge base
             try:
-                await self.combined_knowledge.aload(recreate=False, upsert=True, skip_existing=True)
+                await self.combined_knowledge.aload(
+                    recreate=False, upsert=True, skip_existing=True
+                )
             except TypeError as te:
                 # If aload is an async generator, try synchronous load as fallback
                 if "async_generator" in str(te):
-                    self.combined_knowledge.load(recreate=False, upsert=True, skip_existing=True)
+                    self.combined_knowledge.load(
+                        recreate=False, upsert=True, skip_existing=True
+                    )
                 else:
                     raise
+            self.load_state = "loaded"
         except Exception as e:
+            self.load_state = "error"
             log_message(f"Error initializing knowledge bases: {e}", "ERROR")
-    
-    async def get_pdf_knowledge(self) -> PDFKnowledgeBase:
+
+    async def get_pdf_knowledge(self) -> "PDFKnowledgeBase":
         """
         Retrieves a PDF knowledge base using the provided PgVector database.
         """
+        from agno.document.chunking.agentic import AgenticChunking
+        from agno.knowledge.pdf import PDFKnowledgeBase
+        from agno.vectordb.pgvector import PgVector
+
         knowledge_base: PDFKnowledgeBase = PDFKnowledgeBase()
         try:
             knowledge_base = PDFKnowledgeBase(
@@ -61,16 +88,20 @@ class KnowledgeService:
                 vector_db=PgVector(
                     table_name="pdf_knowledge",
                     db_url=settings.db_url,
-                    embedder=settings.embedder
-                )
+                    embedder=settings.embedder,
+                ),
             )
             # Try to load the PDF knowledge base
             try:
-                await knowledge_base.aload(recreate=False, upsert=False, skip_existing=True)
+                await knowledge_base.aload(
+                    recreate=False, upsert=False, skip_existing=True
+                )
             except TypeError as te:
                 # If aload is an async generator, try synchronous load as fallback
                 if "async_generator" in str(te):
-                    knowledge_base.load(recreate=False, upsert=False, skip_existing=True)
+                    knowledge_base.load(
+                        recreate=False, upsert=False, skip_existing=True
+                    )
                 else:
                     raise
         except Exception as e:
@@ -78,11 +109,53 @@ class KnowledgeService:
             return PDFKnowledgeBase()
 
         return knowledge_base
-    
-    async def get_notion_knowledge(self) -> DocumentKnowledgeBase:
+
+    @staticmethod
+    def iter_notion_pages(
+        loader: "NotionDBLoader",
+        client: httpx.Client | None = None,
+        page_size: int = 100,
+    ) -> Iterator["Document"]:
+        """
+        Loads the database pages one at a time (NotionDBLoader.load fetches them all first).
+        The database is queried a result page at a time and each page is read
+        with the loader's `load_page`.
+        """
+        url = f"{settings.notion_api_url}/databases/{loader.database_id}/query"
+        query: dict[str, Any] = {"page_size": page_size}
+        if loader.filter_object:
+            query["filter"] = loader.filter_object
+        owned = client is None
+        client = client or httpx.Client(
+            headers=loader.headers, timeout=loader.request_timeout_sec
+        )
+        try:
+            while True:
+                response = client.post(url, json=query)
+                response.raise_for_status()
+                data = response.json()
+                for page_summary in data.get("results", []):
+                    yield loader.load_page(page_summary)
+                if not data.get("has_more") or not data.get("next_cursor"):
+                    return
+                query["start_cursor"] = data["next_cursor"]
+        finally:
+            if owned:
+                client.close()
+
+    async def get_notion_knowledge(self) -> "DocumentKnowledgeBase":
         """
         Retrieves a Notion knowledge base using the provided PgVector database.
+        Pages are fetched, converted and handed to chunking/embedding one by one.
         """
+        from agno.document.chunking.agentic import AgenticChunking
+        from agno.knowledge.document import DocumentKnowledgeBase
+        from agno.vectordb.pgvector import PgVector
+        from langchain_community.document_loaders import NotionDBLoader
+
+        from core.instrumentation import StreamingDocumentKnowledgeBase
+        from utils.handlers.to_agnodoc_handler import iter_agnodocs
+
         knowledge_base: DocumentKnowledgeBase = DocumentKnowledgeBase()
         try:
             token = settings.notion_token
@@ -90,24 +163,29 @@ class KnowledgeService:
             if not token or not database_id:
                 log_message("Notion token or database ID is not set.", "ERROR")
                 return knowledge_base
-            documents = NotionDBLoader(
-                integration_token=token,
-                database_id=database_id,
-                request_timeout_sec=30
-            ).load()
-            documents = await to_agnodoc_helper(documents)
-            knowledge_base = DocumentKnowledgeBase(
-                documents=documents,
+            loader = NotionDBLoader(
+                integration_token=token, database_id=database_id, request_timeout_sec=30
+            )
+            knowledge_base = StreamingDocumentKnowledgeBase(
                 chunking_strategy=AgenticChunking(),
                 vector_db=PgVector(
                     table_name="notion_knowledge",
                     db_url=settings.db_url,
-                    embedder=settings.embedder
+                    embedder=settings.embedder,
+                ),
+            )
+            # Kept for the intent router FAQ table, filled as the pages are loaded
+            self.notion_documents = knowledge_base.stream_from(
+                iter_agnodocs(
+                    self.iter_notion_pages(loader),
+                    parse_properties(settings.notion_metadata_properties),
                 )
             )
             # Try to load the Notion knowledge base
             try:
-                await knowledge_base.aload(recreate=False, upsert=True, skip_existing=True)
+                await knowledge_base.aload(
+                    recreate=False, upsert=True, skip_existing=True
+                )
             except TypeError as te:
                 # If aload is an async generator, try synchronous load as fallback
                 if "async_generator" in str(te):
@@ -118,4 +196,14 @@ class KnowledgeService:
             log_message(f"Error loading Notion knowledge base: {e}", "ERROR")
             return DocumentKnowledgeBase()
 
-        return knowledge_base
\ No newline at end of file
+        return knowledge_base
+
+    def close(self) -> None:
+        """
+        Closes the Postgres connections held by the pgvector knowledge bases.
+        """
+        for name in ("pdf_knowledge", "document_knowledge", "combined_knowledge"):
+            vector_db = getattr(getattr(self, name, None), "vector_db", None)
+            engine = getattr(vector_db, "db_engine", None)
+            if engine is not None:
+                engine.dispose()
@@ -0,0 +1,116 @@
+import re
+from collections import Counter
+from typing import Any
+
+from core.metrics import model_decisions
+from core.settings import settings
+from models.agent_models import ModelDecision
+from models.intent_models import IntentMatch
+from services.intent_service import normalize_text
+from utils.tools.log_tool import log_message
+
+# Messages that usually need the bigger model: orders, comparisons, complaints
+COMPLEX_PATTERN = re.compile(
+    r"\b(pedido|encomenda|quero pedir|reclama|diferenca|compar|melhor|recomenda|porque|por que)\w*"
+)
+# Answers that mean the model could not find the information
+LOW_CONFIDENCE_PATTERN = re.compile(
+    r"\b(nao posso fornecer|nao encontrei|nao tenho (essa )?informac)"
+)
+
+
+class ModelRouter:
+    """
+    Picks the Gemini model tier for each request and decides when to escalate.
+
+    Simple questions (short, recognised intent, single question) go to the fast
+    tier; everything else goes to the default tier. A fast-tier answer is
+    escalated to the default tier when it is empty, the knowledge search found
+    nothing, or the model says it could not find the information.
+    """
+
+    def __init__(self) -> None:
+        self.stats: Counter = Counter()
+
+    def choose(
+        self,
+        user_input: str,
+        intent: IntentMatch | None = None,
+        under_pressure: bool = False,
+    ) -> ModelDecision:
+        """
+        Chooses the model tier from the message length, intent and complexity.
+        Everything goes to the fast tier while the service is under pressure.
+        """
+        if not settings.model_routing_enabled:
+            return self._decision("default", "routing_disabled")
+        if under_pressure:
+            return self._decision("fast", "under_pressure")
+        words = len(user_input.split())
+        if words > settings.model_fast_max_words:
+            return self._decision("default", "long_message")
+        if user_input.count("?") > 1:
+            return self._decision("default", "multiple_questions")
+        if COMPLEX_PATTERN.search(normalize_text(user_input)):
+            return self._decision("default", "complex_request")
+        if intent is not None and intent.intent:
+            return self._decision("fast", f"intent_{intent.intent}")
+        return self._decision("fast", "short_message")
+
+    def may_escalate(self, decision: ModelDecision) -> bool:
+        """
+        Tells whether an answer produced under `decision` can be escalated.
+        """
+        return (
+            decision.tier != "default"
+            and decision.reason != "under_pressure"
+            and settings.model_escalation_enabled
+        )
+
+    def needs_escalation(
+        self, decision: ModelDecision, response: Any
+    ) -> tuple[bool, str]:
+        """
+        Checks whether a fast-tier answer is low-confidence and must be retried
+        on the default tier.
+        """
+        if not self.may_escalate(decision):
+            return False, ""
+        content = getattr(response, "content", None)
+        if not content or not str(content).strip():
+            return True, "empty_answer"
+        for tool in getattr(response, "tools", None) or []:
+            if getattr(tool, "tool_name", None) == "search_knowledge_base" and (
+                not tool.result or tool.result == "No documents found"
+            ):
+                return True, "no_retrieval"
+        if LOW_CONFIDENCE_PATTERN.search(normalize_text(str(content))):
+            return True, "low_confidence_answer"
+        return False, ""
+
+    def escalate(self, reason: str) -> ModelDecision:
+        """
+        Returns the default-tier decision used to retry a low-confidence answer.
+        """
+        log_message(f"Escalating request to {settings.model_default}: {reason}", "INFO")
+        return self._decision("default", f"escalated_{reason}", escalated=True)
+
+    def fallback(self, decision: ModelDecision) -> ModelDecision:
+        """
+        Returns the other tier's decision, used while the chosen tier's
+        circuit breaker is open.
+        """
+        tier = "default" if decision.tier == "fast" else "fast"
+        log_message(
+            f"Circuit open for {decision.model_id}, falling back to the {tier} tier",
+            "WARNING",
+        )
+        return self._decision(tier, "circuit_open")
+
+    def _decision(
+        self, tier: str, reason: str, escalated: bool = False
+    ) -> ModelDecision:
+        model_id = settings.model_fast if tier == "fast" else settings.model_default
+        self.stats[(tier, "escalated" if escalated else "chosen")] += 1
+        model_decisions.inc(tier=tier, reason=reason)
+        return ModelDecision(tier=tier, model_id=model_id, reason=reason)
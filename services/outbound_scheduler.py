@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any
+
+from utils.tools.log_tool import log_message
+
+
+class OutboundScheduler:
+    """
+    Sends replies on every channel through the client registered for it.
+
+    At most `max_concurrency` sends run at once per channel, so a burst of
+    answers stays within the provider's rate limits and a slow channel does
+    not hold up the others. `pending` counts replies being sent or waiting
+    for a slot.
+    """
+
+    def __init__(self, max_concurrency: int = 16):
+        self.max_concurrency = max_concurrency
+        self.clients: dict[str, Any] = {}
+        self.pending = 0
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def register(self, channel: str, client: Any) -> None:
+        """
+        Registers the client of a channel; it must provide `send_message(chat_id, text)`.
+        """
+        self.clients[channel] = client
+        log_message(f"Outbound channel '{channel}' registered", "INFO")
+
+    async def send(self, channel: str, chat_id: int | str, text: str) -> Any:
+        client = self.clients.get(channel)
+        if client is None:
+            raise ValueError(f"No client registered for channel '{channel}'")
+        semaphore = self._semaphores.setdefault(
+            channel, asyncio.Semaphore(self.max_concurrency)
+        )
+        self.pending += 1
+        try:
+            async with semaphore:
+                return await client.send_message(chat_id, text)
+        finally:
+            self.pending -= 1
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from pydantic import ValidationError
+
+from core.leases import RedisLease
+from core.tracing import tracer
+from models.models import InboundEvent, TelegramUpdate
+from services.telegram_service import TelegramService
+from services.update_service import UpdateService
+from utils.tools.log_tool import log_message
+
+
+class TelegramPoller:
+    """
+    Ingests Telegram updates with getUpdates long polling instead of a webhook.
+
+    Each batch is confirmed by advancing the offset past its last update and
+    handed to the same `UpdateService` pipeline as the webhook. Updates run
+    concurrently (up to `concurrency`) but in order within a chat, and no new
+    batch is fetched while `limit` updates are still pending. With several
+    workers only the holder of `leader_lease` polls, since Telegram allows a
+    single getUpdates consumer per bot.
+    """
+
+    _instance: Optional["TelegramPoller"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        telegram_service: TelegramService,
+        update_service: UpdateService,
+        timeout: int = 30,
+        limit: int = 100,
+        concurrency: int = 16,
+        leader_lease: RedisLease | None = None,
+    ) -> None:
+        """
+        Initialize the poller with the Telegram client and the update pipeline.
+        """
+        self.leader_lease = leader_lease
+        self.telegram_service = telegram_service
+        self.update_service = update_service
+        self.timeout = timeout
+        self.limit = limit
+        self.offset: int | None = None
+        self.tasks: set[asyncio.Task] = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_pending: Counter = Counter()
+        self._task: asyncio.Task | None = None
+        log_message("TelegramPoller initialized successfully", "INFO")
+
+    @property
+    def pending(self) -> int:
+        return len(self.tasks)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        log_message("Telegram long polling started", "INFO")
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops fetching and waits up to `timeout` seconds for the updates
+        already dispatched. Those still pending at the deadline are cancelled
+        and parked for the next instance.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.tasks:
+            _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self.leader_lease:
+            await self.leader_lease.release()
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                if self.leader_lease and not await self.leader_lease.acquire():
+                    await asyncio.sleep(self.leader_lease.ttl_ms / 3000)
+                    continue
+                await self.poll_once()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_message(
+                    f"Error polling Telegram updates, retrying in {backoff:.0f}s: {e}",
+                    "ERROR",
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def poll_once(self) -> int:
+        """
+        Fetches one batch of updates and dispatches it. Returns the batch size.
+        """
+        while self.pending >= self.limit:
+            await asyncio.wait(self.tasks, return_when=asyncio.FIRST_COMPLETED)
+        updates = await self.telegram_service.get_updates(
+            offset=self.offset, timeout=self.timeout, limit=self.limit
+        )
+        for raw_update in updates:
+            self.offset = raw_update["update_id"] + 1
+            try:
+                update = TelegramUpdate.model_validate(raw_update)
+            except ValidationError as e:
+                log_message(
+                    f"Skipping malformed update {raw_update.get('update_id')}: {e}",
+                    "WARNING",
+                )
+                continue
+            self.dispatch(update)
+        return len(updates)
+
+    def dispatch(self, update: TelegramUpdate) -> asyncio.Task:
+        chat_id = update.chat_id
+        self._chat_pending[chat_id] += 1
+        task = asyncio.create_task(self._handle(update, chat_id, time.time()))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _handle(
+        self, update: TelegramUpdate, chat_id: int, received_at: float
+    ) -> None:
+        chat_lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        submitted = False
+        try:
+            async with chat_lock, self._semaphore:
+                submitted = True
+                with tracer.start_trace("telegram_polling", update_id=update.update_id):
+                    await self.update_service.submit(
+                        update, source="polling", received_at=received_at
+                    )
+        except asyncio.CancelledError:
+            # Still waiting for its turn: parked here, a run in progress parks itself
+            event = InboundEvent.from_telegram(update)
+            if not submitted and event is not None:
+                await self.update_service.park([event])
+            raise
+        finally:
+            self._chat_pending[chat_id] -= 1
+            if self._chat_pending[chat_id] <= 0:
+                del self._chat_pending[chat_id]
+                self._chat_locks.pop(chat_id, None)
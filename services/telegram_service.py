@@ -1,8 +1,13 @@
-import httpx
 import threading
 from typing import Optional
+
+import httpx
+
+from core.metrics import track_stage
+from core.settings import settings
 from utils.tools.log_tool import log_message
 
+
 class TelegramService:
     _instance: Optional["TelegramService"] = None
     _lock: threading.Lock = threading.Lock()
@@ -13,46 +18,51 @@ class TelegramService:
                 if not cls._instance:
                     cls._instance = super().__new__(cls)
         return cls._instance
-    
-    async def initialize(self, token: str, webhook_url: str):
+
+    async def initialize(self, token: str, webhook_url: str | None = None):
         """
         Initialize the Telegram service with the provided bot token.
+        Without a webhook URL the webhook is removed so getUpdates can be used.
         """
         try:
             if not token:
                 raise ValueError("Telegram bot token is required")
             self.bot_token = token
-            self.telegram_api_endpoint = f"https://api.telegram.org/bot{self.bot_token}"
-            await self.setup_webhook(webhook_url)
+            self.telegram_api_endpoint = (
+                f"{settings.telegram_api_url}/bot{self.bot_token}"
+            )
+            self.polling_client: httpx.AsyncClient | None = None
+            if webhook_url:
+                await self.setup_webhook(webhook_url)
+            else:
+                await self.delete_webhook()
             log_message("Telegram service initialized successfully", "INFO")
         except Exception as e:
             log_message(f"Error initializing Telegram service: {e}", "ERROR")
             raise e
 
-    async def send_message(self, chat_id: int, text: str, parse_mode: str = "Markdown") -> dict:
+    async def send_message(
+        self, chat_id: int, text: str, parse_mode: str = "Markdown"
+    ) -> dict:
         """
         Send a message to a Telegram chat.
         """
         try:
             log_message(f"Sending message to chat {chat_id}: {text[:50]}...", "INFO")
             url = f"{self.telegram_api_endpoint}/sendMessage"
-            payload = {
-                "chat_id": chat_id,
-                "text": text,
-                "parse_mode": parse_mode
-            }
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(url, json=payload)
-                response.raise_for_status()
-                if response.status_code != 200:
-                    log_message(f"Failed to send message: {response.text}", "ERROR")
-                    return {"status": "error", "message": response.text}
-                return response.json()
+            payload = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+            with track_stage("telegram_send"):
+                async with httpx.AsyncClient(timeout=30) as client:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
+                    if response.status_code != 200:
+                        log_message(f"Failed to send message: {response.text}", "ERROR")
+                        return {"status": "error", "message": response.text}
+                    return response.json()
         except Exception as e:
-            log_message(f"Error sending Telegram message: {str(e)}", "ERROR")
+            log_message(f"Error sending Telegram message: {e!s}", "ERROR")
             raise e
 
-
     async def setup_webhook(self, webhook_url: str):
         """Set up Telegram webhook programmatically during startup."""
         try:
@@ -61,12 +71,73 @@ class TelegramService:
                 return
             payload = {"url": webhook_url}
             async with httpx.AsyncClient() as client:
-                response = await client.post(f"{self.telegram_api_endpoint}/setWebhook", json=payload)
+                response = await client.post(
+                    f"{self.telegram_api_endpoint}/setWebhook", json=payload
+                )
                 response.raise_for_status()
                 result = response.json()
             if result.get("ok"):
-                log_message(f"Telegram webhook successfully set to: {self.telegram_api_endpoint}", "INFO")
+                log_message(
+                    f"Telegram webhook successfully set to: {self.telegram_api_endpoint}",
+                    "INFO",
+                )
             else:
                 log_message(f"Failed to set Telegram webhook: {result}", "ERROR")
         except Exception as e:
-            log_message(f"Error setting up Telegram webhook: {e}", "ERROR")
\ No newline at end of file
+            log_message(f"Error setting up Telegram webhook: {e}", "ERROR")
+
+    async def delete_webhook(self):
+        """Remove the Telegram webhook; getUpdates is rejected while one is set."""
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    f"{self.telegram_api_endpoint}/deleteWebhook"
+                )
+                response.raise_for_status()
+                result = response.json()
+            if result.get("ok"):
+                log_message("Telegram webhook removed, using getUpdates", "INFO")
+            else:
+                log_message(f"Failed to remove Telegram webhook: {result}", "ERROR")
+        except Exception as e:
+            log_message(f"Error removing Telegram webhook: {e}", "ERROR")
+
+    async def get_updates(
+        self, offset: int | None = None, timeout: int = 30, limit: int = 100
+    ) -> list[dict]:
+        """
+        Long-polls Telegram for new updates. Updates below `offset` are
+        confirmed and will not be returned again.
+        """
+        if self.polling_client is None:
+            # One keep-alive connection for all polls; the read timeout must outlast the long poll
+            self.polling_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, read=timeout + 10.0)
+            )
+        payload = {
+            "timeout": timeout,
+            "limit": limit,
+            "allowed_updates": [
+                "message",
+                "edited_message",
+                "channel_post",
+                "edited_channel_post",
+            ],
+        }
+        if offset is not None:
+            payload["offset"] = offset
+        response = await self.polling_client.post(
+            f"{self.telegram_api_endpoint}/getUpdates", json=payload
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("ok"):
+            raise RuntimeError(
+                f"getUpdates failed: {result.get('description', result)}"
+            )
+        return result.get("result", [])
+
+    async def close(self):
+        if getattr(self, "polling_client", None) is not None:
+            await self.polling_client.aclose()
+            self.polling_client = None
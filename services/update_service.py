@@ -0,0 +1,431 @@
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, Optional
+
+from core.metrics import message_statuses, requests_total, track_stage
+from core.resilience import request_deadline
+from core.settings import settings
+from core.tracing import set_span_attributes, tracer
+from models.models import InboundEvent, ResponseModel, TelegramUpdate, WhatsAppWebhook
+from services.cache_service import CacheService
+from services.outbound_scheduler import OutboundScheduler
+from services.telegram_service import TelegramService
+from services.user_request_service import UserRequestService
+from utils.tools.log_tool import log_message
+
+
+class UpdateService:
+    """
+    Processing pipeline shared by every channel and ingestion path: the
+    Telegram webhook and getUpdates poller, the WhatsApp webhook and the
+    stream workers. Channel payloads are normalised into `InboundEvent`s,
+    de-duplicated, then queued or answered, and the replies go out through
+    the `OutboundScheduler`.
+
+    On shutdown `drain` gives the runs in progress until a deadline; runs
+    interrupted at the deadline, and events received while draining, are
+    parked in Redis. Running instances check for parked events every few
+    seconds (`start_resuming`), so events parked by an instance that stops
+    after its successor started are answered too.
+    """
+
+    _instance: Optional["UpdateService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        user_request_service: UserRequestService,
+        telegram_service: TelegramService,
+        cache_service: CacheService | None = None,
+        update_stream: Any | None = None,
+        whatsapp_service: Any | None = None,
+    ) -> None:
+        """
+        Initialize the pipeline with the services it calls. With an
+        `update_stream` incoming events are queued for the stream workers
+        instead of being answered in the receiving process.
+        """
+        self.user_request_service = user_request_service
+        self.telegram_service = telegram_service
+        self.whatsapp_service = whatsapp_service
+        self.cache_service = cache_service
+        self.update_stream = update_stream
+        self.draining = False
+        self._runs: dict[asyncio.Task, InboundEvent] = {}
+        self._background: set[asyncio.Task] = set()
+        self._resume_loop: asyncio.Task | None = None
+        self.outbound = OutboundScheduler(
+            max_concurrency=settings.outbound_max_concurrency
+        )
+        if telegram_service is not None:
+            self.outbound.register("telegram", telegram_service)
+        if whatsapp_service is not None:
+            self.outbound.register("whatsapp", whatsapp_service)
+        log_message("UpdateService initialized successfully", "INFO")
+
+    @property
+    def in_progress(self) -> int:
+        """Events being answered by this worker."""
+        return len(self._runs)
+
+    def _run_in_background(self, work: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(work)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def submit(
+        self,
+        update: TelegramUpdate,
+        source: str = "webhook",
+        received_at: float | None = None,
+    ) -> ResponseModel:
+        """
+        Entry point for Telegram updates (webhook and poller).
+        """
+        event = InboundEvent.from_telegram(update)
+        if event is None:
+            log_message(f"No message found in update {update.update_id}", "WARNING")
+            requests_total.inc(channel="telegram", outcome="ignored")
+            return ResponseModel(status="ok", message="No message to process")
+        results = await self.submit_events(
+            [event], source=source, received_at=received_at
+        )
+        return results[0]
+
+    async def submit_whatsapp(
+        self,
+        payload: WhatsAppWebhook,
+        source: str = "webhook",
+        received_at: float | None = None,
+    ) -> ResponseModel:
+        """
+        Entry point for WhatsApp webhooks: records the delivery statuses and
+        submits the messages of every entry and change as one batch. Without a
+        stream, webhook messages are answered in the background so Meta gets
+        its acknowledgement without waiting for the answers.
+        """
+        statuses = payload.statuses()
+        for status in statuses:
+            message_statuses.inc(channel="whatsapp", status=status.status)
+            if status.status == "failed":
+                log_message(
+                    f"WhatsApp message {status.id} to {status.recipient_id} failed: {status.errors}",
+                    "WARNING",
+                )
+        results = await self.submit_events(
+            payload.events(),
+            source=source,
+            received_at=received_at,
+            background=source == "webhook",
+        )
+        return ResponseModel(
+            status="ok",
+            message=f"Processed {len(results)} messages and {len(statuses)} statuses",
+            data={"results": [result.message for result in results]},
+        )
+
+    async def submit_events(
+        self,
+        events: list[InboundEvent],
+        source: str = "webhook",
+        received_at: float | None = None,
+        background: bool = False,
+    ) -> list[ResponseModel]:
+        """
+        Drops the events any worker has already received, then queues the rest
+        on the stream or processes them inline, in a background task with
+        `background`. Returns one result per event.
+        """
+        duplicates = await self._find_duplicates(events)
+        results: list[ResponseModel | None] = [None] * len(events)
+        fresh = []
+        for index, (event, duplicate) in enumerate(zip(events, duplicates)):
+            if duplicate:
+                log_message(
+                    f"Ignoring duplicate {event.channel} event {event.event_id}", "INFO"
+                )
+                requests_total.inc(channel=event.channel, outcome="duplicate")
+                results[index] = ResponseModel(
+                    status="ok", message="Duplicate update ignored"
+                )
+            else:
+                fresh.append(index)
+        if not fresh:
+            return results
+        if self.draining and source == "webhook" and self.update_stream is None:
+            # Received while shutting down: the next instance answers them
+            await self.park([events[index] for index in fresh])
+            for index in fresh:
+                results[index] = ResponseModel(status="ok", message="Update queued")
+            return results
+        if self.update_stream is not None:
+            await self.update_stream.publish_many([events[index] for index in fresh])
+            for index in fresh:
+                requests_total.inc(channel=events[index].channel, outcome="queued")
+                results[index] = ResponseModel(status="ok", message="Update queued")
+            return results
+        if background:
+            self._run_in_background(
+                self._process_in_order(
+                    [events[index] for index in fresh],
+                    source,
+                    received_at,
+                    root_trace=True,
+                )
+            )
+            for index in fresh:
+                results[index] = ResponseModel(status="ok", message="Update accepted")
+            return results
+        processed = await self._process_in_order(
+            [events[index] for index in fresh], source, received_at
+        )
+        for index, result in zip(fresh, processed):
+            results[index] = result
+        return results
+
+    async def _process_in_order(
+        self,
+        events: list[InboundEvent],
+        source: str,
+        received_at: float | None = None,
+        root_trace: bool = False,
+    ) -> list[ResponseModel]:
+        """
+        Answers a chat's events in order and different chats concurrently. When
+        cancelled, the events of each chat not processed yet are parked. With
+        `root_trace` (background runs, which outlive the request that started
+        them) every event gets a trace of its own.
+        """
+        results: list[ResponseModel | None] = [None] * len(events)
+        chats: dict[Any, list[int]] = {}
+        for index, event in enumerate(events):
+            chats.setdefault((event.channel, event.chat_id), []).append(index)
+
+        async def process_chat(indexes: list[int]) -> None:
+            for position, index in enumerate(indexes):
+                try:
+                    if root_trace:
+                        results[index] = await self._process_traced(
+                            events[index], source, received_at
+                        )
+                    else:
+                        results[index] = await self.process_event(
+                            events[index], source=source, received_at=received_at
+                        )
+                except asyncio.CancelledError:
+                    await self.park(
+                        [events[later] for later in indexes[position + 1 :]]
+                    )
+                    raise
+
+        await asyncio.gather(*(process_chat(indexes) for indexes in chats.values()))
+        return results
+
+    async def _process_traced(
+        self, event: InboundEvent, source: str, received_at: float | None = None
+    ) -> ResponseModel:
+        start_ns = int(received_at * 1e9) if received_at is not None else None
+        with tracer.start_trace(
+            f"{event.channel}_event",
+            start_ns=start_ns,
+            event_id=event.event_id,
+            source=source,
+        ):
+            return await self.process_event(
+                event, source=source, received_at=received_at
+            )
+
+    async def _find_duplicates(self, events: list[InboundEvent]) -> list[bool]:
+        duplicates = [False] * len(events)
+        if not self.cache_service:
+            return duplicates
+        for channel in {event.channel for event in events}:
+            indexes = [
+                index for index, event in enumerate(events) if event.channel == channel
+            ]
+            flags = await self.cache_service.are_duplicates(
+                f"{channel}_update", [events[index].event_id for index in indexes]
+            )
+            for index, flag in zip(indexes, flags):
+                duplicates[index] = flag
+        return duplicates
+
+    async def process_event(
+        self,
+        event: InboundEvent,
+        source: str = "webhook",
+        received_at: float | None = None,
+        before_reply: Callable[[], Awaitable[bool]] | None = None,
+    ) -> ResponseModel:
+        """
+        Answers the message of an event and sends the reply on its channel.
+        `source` ("webhook", "polling" or "stream") labels the stage metrics.
+        The answer has to be produced within the request deadline counted from
+        `received_at` (a time.time() timestamp, defaults to now). A run cancelled
+        during shutdown parks its event, except for stream entries, which stay
+        unacknowledged for the next partition owner. When `before_reply`
+        returns False the reply is not sent (the stream partition changed owner).
+        """
+        task = asyncio.current_task()
+        self._runs[task] = event
+        try:
+            return await self._answer(event, source, received_at, before_reply)
+        except asyncio.CancelledError:
+            if source != "stream":
+                log_message(
+                    f"Interrupted {event.channel} event {event.event_id}, parking it",
+                    "WARNING",
+                )
+                await self.park([event])
+            raise
+        finally:
+            self._runs.pop(task, None)
+
+    async def _answer(
+        self,
+        event: InboundEvent,
+        source: str,
+        received_at: float | None,
+        before_reply: Callable[[], Awaitable[bool]] | None = None,
+    ) -> ResponseModel:
+        with (
+            track_stage(source),
+            request_deadline(settings.llm_request_deadline, started_at=received_at),
+        ):
+            try:
+                log_message(f"Received {event.channel} event: {event.event_id}", "INFO")
+                # Ignore messages from bots to prevent infinite loops
+                if event.from_bot:
+                    log_message(
+                        f"Ignoring message from a bot in chat {event.chat_id} to prevent loops",
+                        "INFO",
+                    )
+                    requests_total.inc(channel=event.channel, outcome="ignored")
+                    return ResponseModel(status="ok", message="Bot message ignored")
+                if not event.text or event.text.strip() == "":
+                    log_message("Empty message text, ignoring", "WARNING")
+                    requests_total.inc(channel=event.channel, outcome="ignored")
+                    return ResponseModel(status="ok", message="Empty message ignored")
+                set_span_attributes(channel=event.channel, chat_id=event.chat_id)
+                reply = await self.user_request_service.process_user_request(
+                    event.text,
+                    event.chat_id,
+                    notify_busy=lambda: self.outbound.send(
+                        event.channel, event.chat_id, settings.admission_busy_message
+                    ),
+                )
+                if before_reply is not None and not await before_reply():
+                    log_message(
+                        f"Not replying to {event.channel} event {event.event_id}, handed over to another worker",
+                        "WARNING",
+                    )
+                    requests_total.inc(channel=event.channel, outcome="handed_over")
+                    return ResponseModel(
+                        status="ok", message="Handed over to another worker"
+                    )
+                response = await self.outbound.send(
+                    event.channel, event.chat_id, reply.content
+                )
+                log_message(
+                    f"Successfully processed {event.channel} event {event.event_id}",
+                    "INFO",
+                )
+                requests_total.inc(channel=event.channel, outcome="processed")
+                return ResponseModel(
+                    status="ok",
+                    message="Message processed successfully",
+                    data={"response": response},
+                )
+            except Exception as e:
+                log_message(f"Error processing {event.channel} event: {e!s}", "ERROR")
+                requests_total.inc(channel=event.channel, outcome="error")
+                return ResponseModel(
+                    status="error",
+                    message="Internal error occurred",
+                    data={"error": str(e)},
+                )
+
+    async def park(self, events: list[InboundEvent]) -> int:
+        """
+        Parks events in Redis for the next instance. Returns how many were stored.
+        """
+        if not events:
+            return 0
+        if not self.cache_service:
+            log_message(
+                f"No Redis to park {len(events)} events, they will not be answered",
+                "ERROR",
+            )
+            return 0
+        parked = await self.cache_service.park_events(events)
+        for event in events[:parked]:
+            requests_total.inc(channel=event.channel, outcome="parked")
+        return parked
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Stops taking new work and waits up to `timeout` seconds for the runs in
+        progress. Runs still going at the deadline are cancelled, which parks
+        their events. Returns how many runs were interrupted.
+        """
+        self.draining = True
+        if self._resume_loop is not None:
+            self._resume_loop.cancel()
+            await asyncio.gather(self._resume_loop, return_exceptions=True)
+            self._resume_loop = None
+        runs = set(self._runs) | self._background
+        if not runs:
+            return 0
+        log_message(f"Draining {len(runs)} runs in progress", "INFO")
+        _, pending = await asyncio.wait(runs, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return len(pending)
+
+    async def resume_parked(self) -> int:
+        """
+        Picks up the events parked by instances that shut down before answering
+        them: they are queued on the stream, or answered in the background.
+        Returns how many were resumed.
+        """
+        if not self.cache_service or self.draining:
+            return 0
+        events = await self.cache_service.take_parked_events()
+        if not events:
+            return 0
+        log_message(
+            f"Resuming {len(events)} events parked by a previous instance", "INFO"
+        )
+        if self.update_stream is not None:
+            await self.update_stream.publish_many(events)
+        else:
+            # Their original deadline has passed, so they get a fresh one
+            self._run_in_background(
+                self._process_in_order(events, source="resume", root_trace=True)
+            )
+        return len(events)
+
+    def start_resuming(self, interval: float) -> None:
+        """
+        Resumes parked events now and then every `interval` seconds, until the drain.
+        """
+        if self._resume_loop is None:
+            self._resume_loop = asyncio.create_task(self._resume_periodically(interval))
+
+    async def _resume_periodically(self, interval: float) -> None:
+        while not self.draining:
+            try:
+                await self.resume_parked()
+            except Exception as e:
+                log_message(f"Error resuming parked events: {e}", "ERROR")
+            await asyncio.sleep(interval)
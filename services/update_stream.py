@@ -0,0 +1,356 @@
+import asyncio
+import math
+import time
+import zlib
+from typing import Any
+
+from pydantic import ValidationError
+from redis.exceptions import ResponseError
+
+from core.leases import RedisLease
+from core.metrics import stage_duration, track_stage
+from core.tracing import tracer
+from models.models import InboundEvent, TelegramUpdate
+from utils.tools.log_tool import log_message
+
+GROUP = "workers"
+
+
+class UpdateStream:
+    """
+    Multi-worker event dispatch over Redis streams, shared by every channel.
+
+    Events are appended to one of `partitions` streams chosen by chat_id. Each
+    partition is consumed by exactly one worker at a time, which holds an
+    expiring lease on it, so a chat's updates are answered in order while
+    different partitions are processed in parallel across processes and hosts.
+    Workers heartbeat into a shared sorted set and rebalance so that each owns
+    about `partitions / live workers` partitions. When a worker dies its leases
+    expire, and the next owner claims the updates it had read but not
+    acknowledged before reading new ones (at-least-once delivery).
+
+    A partition given up in a rebalance is released in the background: its
+    consumer finishes the current event within `release_timeout` seconds (less
+    than the lease) while the other leases keep being renewed. A consumer only
+    replies and acknowledges while it still holds the lease.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        update_service: Any,
+        worker_id: str,
+        prefix: str = "espetos",
+        partitions: int = 32,
+        lease_ms: int = 15000,
+        max_len: int = 10000,
+        block_ms: int = 1000,
+        batch_size: int = 10,
+        admission_service: Any | None = None,
+    ):
+        self.redis_client = redis_client
+        self.update_service = update_service
+        self.worker_id = worker_id
+        self.prefix = prefix
+        self.partitions = partitions
+        self.lease_ms = lease_ms
+        self.max_len = max_len
+        self.block_ms = block_ms
+        self.batch_size = batch_size
+        self.admission_service = admission_service
+        self.workers_key = f"{prefix}:workers"
+        self.leases: dict[int, RedisLease] = {}
+        self.consumers: dict[int, asyncio.Task] = {}
+        self._stopping: dict[int, asyncio.Event] = {}
+        self._releasing: dict[int, asyncio.Task] = {}
+        self.release_timeout = lease_ms / 2000
+        self._in_progress: dict[int, int] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        """Updates read by this worker and not yet acknowledged."""
+        return sum(self._in_progress.values())
+
+    def partition(self, chat_id: int | str) -> int:
+        if isinstance(chat_id, int):
+            return chat_id % self.partitions
+        # WhatsApp chats are identified by phone numbers
+        return zlib.crc32(chat_id.encode("utf-8")) % self.partitions
+
+    def stream_key(self, partition: int) -> str:
+        return f"{self.prefix}:updates:{partition}"
+
+    def _fields(self, event: InboundEvent) -> dict[str, str]:
+        return {
+            "event": event.model_dump_json(exclude_none=True),
+            "enqueued_at": repr(time.time()),
+        }
+
+    async def publish(self, event: InboundEvent) -> str:
+        """
+        Appends an event to its chat's partition stream.
+        """
+        with track_stage("stream_publish"):
+            return await self.redis_client.xadd(
+                self.stream_key(self.partition(event.chat_id)),
+                self._fields(event),
+                maxlen=self.max_len,
+                approximate=True,
+            )
+
+    async def publish_many(self, events: list[InboundEvent]) -> list[str]:
+        """
+        Appends a batch of events in a single Redis round trip.
+        """
+        pipeline = self.redis_client.pipeline(transaction=False)
+        for event in events:
+            pipeline.xadd(
+                self.stream_key(self.partition(event.chat_id)),
+                self._fields(event),
+                maxlen=self.max_len,
+                approximate=True,
+            )
+        with track_stage("stream_publish"):
+            return await pipeline.execute()
+
+    async def start(self) -> None:
+        """
+        Creates the consumer groups and starts the partition coordinator.
+        """
+        for partition in range(self.partitions):
+            try:
+                await self.redis_client.xgroup_create(
+                    self.stream_key(partition), GROUP, id="0", mkstream=True
+                )
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        await self.rebalance()
+        self._task = asyncio.create_task(self._run())
+        log_message(
+            f"Update stream worker {self.worker_id} started with {len(self.leases)} partitions",
+            "INFO",
+        )
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """
+        Stops every consumer after its current event and hands the partitions
+        back. Consumers still busy after `timeout` seconds are cancelled; their
+        entries stay unacknowledged and are claimed by the next owner.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for stopping in self._stopping.values():
+            stopping.set()
+        if self.consumers:
+            _, pending = await asyncio.wait(
+                set(self.consumers.values()), timeout=timeout
+            )
+            for consumer in pending:
+                consumer.cancel()
+        await asyncio.gather(*self._releasing.values(), return_exceptions=True)
+        await asyncio.gather(
+            *(self._release(partition) for partition in list(self.leases))
+        )
+        await self.redis_client.zrem(self.workers_key, self.worker_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                log_message(f"Error rebalancing stream partitions: {e}", "ERROR")
+
+    async def rebalance(self) -> None:
+        """
+        Heartbeats, renews owned leases and moves this worker towards its fair
+        share of partitions. Never waits for a consumer: partitions over the
+        share are released in the background.
+        """
+        now = time.time()
+        await self.redis_client.zadd(self.workers_key, {self.worker_id: now})
+        await self.redis_client.zremrangebyscore(
+            self.workers_key, "-inf", now - self.lease_ms / 1000
+        )
+        live_workers = max(1, await self.redis_client.zcard(self.workers_key))
+        fair_share = math.ceil(self.partitions / live_workers)
+
+        for partition, lease in list(self.leases.items()):
+            if not await lease.renew():
+                log_message(f"Lost lease on partition {partition}", "WARNING")
+                self._drop(partition)
+        kept = [
+            partition for partition in self.leases if partition not in self._releasing
+        ]
+        for partition in sorted(kept, reverse=True)[: max(0, len(kept) - fair_share)]:
+            self._start_release(partition)
+        if len(self.leases) - len(self._releasing) < fair_share:
+            # Start from a worker-specific offset so workers do not race for the same partitions
+            start = zlib.crc32(self.worker_id.encode("utf-8")) % self.partitions
+            for step in range(self.partitions):
+                if len(self.leases) - len(self._releasing) >= fair_share:
+                    break
+                partition = (start + step) % self.partitions
+                if partition in self.leases:
+                    continue
+                lease = RedisLease(
+                    self.redis_client,
+                    f"{self.prefix}:lease:{partition}",
+                    self.worker_id,
+                    self.lease_ms,
+                )
+                if await lease.acquire():
+                    self.leases[partition] = lease
+                    self._stopping[partition] = asyncio.Event()
+                    self.consumers[partition] = asyncio.create_task(
+                        self._consume(partition)
+                    )
+
+    def _drop(self, partition: int) -> None:
+        self.leases.pop(partition, None)
+        self._stopping.pop(partition, None)
+        consumer = self.consumers.pop(partition, None)
+        if consumer:
+            consumer.cancel()
+
+    def _start_release(self, partition: int) -> None:
+        task = asyncio.create_task(
+            self._release(partition, timeout=self.release_timeout)
+        )
+        self._releasing[partition] = task
+        task.add_done_callback(lambda _: self._releasing.pop(partition, None))
+
+    async def _release(self, partition: int, timeout: float | None = None) -> None:
+        """
+        Stops the consumer after its current event, cancelling it after
+        `timeout` seconds (its entry is then claimed by the next owner), and
+        hands the lease back.
+        """
+        stopping = self._stopping.get(partition)
+        consumer = self.consumers.get(partition)
+        if stopping:
+            stopping.set()
+        if consumer:
+            _, pending = await asyncio.wait({consumer}, timeout=timeout)
+            if pending:
+                log_message(
+                    f"Partition {partition} consumer still busy, cancelling it to hand the partition over",
+                    "WARNING",
+                )
+                consumer.cancel()
+                await asyncio.gather(consumer, return_exceptions=True)
+        lease = self.leases.get(partition)
+        self._drop(partition)
+        if lease:
+            await lease.release()
+
+    async def _owns(self, partition: int) -> bool:
+        lease = self.leases.get(partition)
+        try:
+            return lease is not None and await lease.held()
+        except Exception as e:
+            log_message(
+                f"Error checking the lease on partition {partition}: {e}", "WARNING"
+            )
+            return False
+
+    async def _consume(self, partition: int) -> None:
+        stream = self.stream_key(partition)
+        stopping = self._stopping[partition]
+        # Take over what the previous owner read but never acknowledged
+        claim_from = "0-0"
+        while True:
+            with track_stage("stream_claim"):
+                result = await self.redis_client.xautoclaim(
+                    stream, GROUP, self.worker_id, 0, claim_from, count=100
+                )
+            claim_from = result[0]
+            if claim_from in ("0-0", b"0-0"):
+                break
+        backlog = "0"
+        while not stopping.is_set():
+            try:
+                # First our own pending entries in order, then new ones. The
+                # stage includes the time blocked waiting for entries.
+                with track_stage("stream_read"):
+                    response = await self.redis_client.xreadgroup(
+                        GROUP,
+                        self.worker_id,
+                        {stream: backlog},
+                        count=self.batch_size,
+                        block=self.block_ms,
+                    )
+                entries: list[tuple[str, dict[str, str]]] = (
+                    response[0][1] if response else []
+                )
+                if not entries:
+                    backlog = ">"
+                    # Yield even if the read returned without blocking
+                    await asyncio.sleep(0)
+                    continue
+                self._in_progress[partition] = len(entries)
+                for message_id, fields in entries:
+                    if stopping.is_set():
+                        break
+                    await self._handle(partition, stream, message_id, fields)
+                    self._in_progress[partition] -= 1
+                self._in_progress.pop(partition, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_message(f"Error consuming partition {partition}: {e}", "ERROR")
+                await asyncio.sleep(1.0)
+        self._in_progress.pop(partition, None)
+
+    async def _handle(
+        self, partition: int, stream: str, message_id: str, fields: dict[str, str]
+    ) -> None:
+        try:
+            if "event" in fields:
+                event = InboundEvent.model_validate_json(fields["event"])
+            else:
+                # Entry published as a Telegram update by an older worker
+                event = InboundEvent.from_telegram(
+                    TelegramUpdate.model_validate_json(fields["update"])
+                )
+                if event is None:
+                    raise ValueError("update without a message")
+        except (KeyError, ValueError, ValidationError) as e:
+            log_message(f"Dropping malformed stream entry {message_id}: {e}", "WARNING")
+            with track_stage("stream_ack"):
+                await self.redis_client.xack(stream, GROUP, message_id)
+            return
+        enqueued_at = float(fields.get("enqueued_at", time.time()))
+        queue_wait = max(0.0, time.time() - enqueued_at)
+        stage_duration.observe(queue_wait, stage="queue_wait")
+        if self.admission_service:
+            self.admission_service.observe_queue_wait(queue_wait)
+        with tracer.start_trace(
+            f"{event.channel}_stream",
+            start_ns=int(enqueued_at * 1e9),
+            event_id=event.event_id,
+            partition=partition,
+        ):
+            tracer.record_span("queue_wait", int(enqueued_at * 1e9), time.time_ns())
+            await self.update_service.process_event(
+                event,
+                source="stream",
+                received_at=enqueued_at,
+                before_reply=lambda: self._owns(partition),
+            )
+        if not await self._owns(partition):
+            # The next owner claims the entry
+            log_message(
+                f"Lost partition {partition} before acknowledging {message_id}",
+                "WARNING",
+            )
+            return
+        with track_stage("stream_ack"):
+            await self.redis_client.xack(stream, GROUP, message_id)
@@ -1,30 +1,110 @@
+import asyncio
 import threading
-from typing import Optional
-from agno.agent import Agent
-from agno.memory.v2.memory import Memory
-from agno.memory.v2.db.redis import RedisMemoryDb
-from agno.storage.redis import RedisStorage
-from utils.tools.log_tool import log_message
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any, Optional
+
+from core.metrics import admission_decisions, cache_requests, track_stage
+from core.resilience import LLMUnavailableError, ResilientCaller
 from core.settings import settings
+from core.tracing import set_span_attributes, tracer
+from models.agent_models import ModelDecision, RunResponse
+from models.intent_models import IntentMatch
+from services.admission_service import AdmissionService
+from services.cache_service import CacheService
+from services.catalogue_service import CatalogueService
+from services.intent_service import IntentService
 from services.knowledge_service import KnowledgeService
-from models.agent_models import RunResponse
-from agno.models.google import Gemini
+from services.model_router import ModelRouter
+from utils.tools.log_tool import log_message
+
+if TYPE_CHECKING:
+    from agno.agent import Agent
+
+
+class DeferredWriteStorage:
+    """
+    Wraps an agent's storage so the session it writes at the end of a run is
+    held back until `flush`. Reads go to the wrapped storage.
+    """
+
+    def __init__(self, storage: Any):
+        self.storage = storage
+        self.mode = getattr(storage, "mode", None)
+        self.session: Any = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.storage, name)
+
+    def upsert(self, session: Any) -> Any:
+        self.session = session
+        return session
+
+    def flush(self) -> None:
+        if self.session is not None:
+            self.storage.upsert(session=self.session)
+            self.session = None
+
 
 class UserRequestService:
     _instance: Optional["UserRequestService"] = None
     _lock: threading.Lock = threading.Lock()
-    
+
     def __new__(cls):
         if not cls._instance:
             with cls._lock:
                 if not cls._instance:
                     cls._instance = super().__new__(cls)
         return cls._instance
-    
-    async def initialize(self, knowledge_service: KnowledgeService) -> None:
-        """Initialize the UserRequestService with the provided knowledge service."""
+
+    async def initialize(
+        self,
+        knowledge_service: KnowledgeService,
+        cache_service: CacheService | None = None,
+        admission_service: AdmissionService | None = None,
+        catalogue_service: CatalogueService | None = None,
+    ) -> None:
+        """
+        Initialize the UserRequestService with the provided knowledge service.
+        With a cache service, answers to recognised FAQ-style questions are
+        shared between workers; with an admission service, agent runs are
+        bounded and degraded under load; with a catalogue service, price and
+        availability questions are answered from the SmartPOS snapshot and the
+        agent gets catalogue tools. Model calls go through a resilient caller
+        (deadline, retries, circuit breaker, optional hedging).
+        """
         try:
             self.knowledge_service = knowledge_service
+            self.cache_service = cache_service
+            self.admission_service = admission_service
+            self.catalogue_service = catalogue_service
+            self.model_router = ModelRouter()
+            # Agent instructions, storage and memory db, built on the first agent run
+            self._agent_resources: dict[str, Any] | None = None
+            self._memory_tasks: set[asyncio.Task] = set()
+            self.llm_caller = ResilientCaller(
+                attempt_timeout=settings.llm_attempt_timeout,
+                max_attempts=settings.llm_max_attempts,
+                retry_base_delay=settings.llm_retry_base_delay,
+                retry_max_delay=settings.llm_retry_max_delay,
+                breaker_failure_threshold=settings.llm_breaker_failure_threshold,
+                breaker_recovery_time=settings.llm_breaker_recovery_time,
+                hedging_enabled=settings.llm_hedging_enabled,
+                hedge_percentile=settings.llm_hedge_percentile,
+                hedge_min_samples=settings.llm_hedge_min_samples,
+            )
+            self.intent_service: IntentService | None = None
+            if settings.intent_router_enabled:
+                self.intent_service = IntentService()
+                await self.intent_service.initialize(
+                    documents=knowledge_service.notion_documents,
+                    embedder=settings.embedder
+                    if settings.intent_embeddings_enabled and settings.google_api_key
+                    else None,
+                    similarity_threshold=settings.intent_similarity_threshold,
+                    embedding_concurrency=settings.intent_embedding_concurrency,
+                    embedding_timeout=settings.intent_embedding_timeout,
+                )
             log_message("UserRequestService initialized successfully", "INFO")
         except Exception as e:
             log_message(f"Error initializing UserRequestService: {e}", "ERROR")
@@ -33,69 +113,309 @@ class UserRequestService:
     async def process_user_request(
         self,
         user_input: str,
-        chat_id: int
+        chat_id: int,
+        notify_busy: Callable[[], Awaitable] | None = None,
     ) -> RunResponse:
         """
         Process user requests and generate appropriate responses.
+        `notify_busy` is awaited when the request has to wait for agent capacity.
         """
-        try:
-            agent = await self.get_classic_agent()
-            response = agent.run(user_input, chat_id=chat_id)
-            if not response.content:
-                log_message("No content returned from agent, returning default response", "WARNING")
-                return RunResponse(answer="No content available", content="")
-            log_message(f"Processed user request: {user_input} -> {response.content}", "INFO")
-            return RunResponse(answer=response.content, content=response.content)
-        except Exception as e:
-            log_message(f"Error getting allmight agent: {e}", "ERROR")
-            return RunResponse(answer=f"Error processing request: {e}", content="")
+        with tracer.span("process_user_request", chat_id=chat_id):
+            try:
+                match = None
+                if self.intent_service:
+                    with track_stage("intent_classify"):
+                        match = await self.intent_service.classify(user_input)
+                    cache_requests.inc(
+                        cache="faq", result="hit" if match.is_templated else "miss"
+                    )
+                    if match.is_templated:
+                        log_message(
+                            f"Answered intent '{match.intent}' locally ({match.method})",
+                            "INFO",
+                        )
+                        return RunResponse(answer=match.answer, content=match.answer)
+                if self.catalogue_service:
+                    answer = self.catalogue_service.answer(user_input)
+                    if answer:
+                        log_message(
+                            f"Answered catalogue question locally: {user_input}", "INFO"
+                        )
+                        return RunResponse(
+                            answer=answer, content=answer, model="catalogue"
+                        )
+                cacheable = (
+                    self.cache_service is not None
+                    and match is not None
+                    and match.intent is not None
+                )
+                if cacheable:
+                    cached = await self.cache_service.get_answer(user_input)
+                    if cached:
+                        log_message(
+                            f"Answered intent '{match.intent}' from the answer cache",
+                            "INFO",
+                        )
+                        if (
+                            self.admission_service
+                            and self.admission_service.under_pressure
+                        ):
+                            admission_decisions.inc(decision="cache")
+                        return RunResponse(answer=cached, content=cached, model="cache")
+                under_pressure = (
+                    self.admission_service is not None
+                    and self.admission_service.under_pressure
+                )
+                if self.admission_service and not await self.admission_service.acquire(
+                    on_busy=notify_busy
+                ):
+                    log_message(
+                        f"Rejected request from chat {chat_id}: agent capacity exhausted",
+                        "WARNING",
+                    )
+                    return RunResponse(
+                        answer=settings.admission_overloaded_message,
+                        content=settings.admission_overloaded_message,
+                    )
+                try:
+                    response, decision = await self._run_agent(
+                        user_input, chat_id, match, under_pressure
+                    )
+                finally:
+                    if self.admission_service:
+                        self.admission_service.release()
+                if not response.content:
+                    log_message(
+                        "No content returned from agent, returning default response",
+                        "WARNING",
+                    )
+                    return RunResponse(
+                        answer="No content available",
+                        content="",
+                        model=decision.model_id,
+                    )
+                if cacheable:
+                    await self.cache_service.set_answer(user_input, response.content)
+                log_message(
+                    f"Processed user request with {decision.model_id} ({decision.reason}): {user_input} -> {response.content}",
+                    "INFO",
+                )
+                return RunResponse(
+                    answer=response.content,
+                    content=response.content,
+                    model=decision.model_id,
+                )
+            except LLMUnavailableError as e:
+                log_message(f"Model unavailable for chat {chat_id}: {e}", "WARNING")
+                return RunResponse(
+                    answer=settings.llm_unavailable_message,
+                    content=settings.llm_unavailable_message,
+                )
+            except Exception as e:
+                log_message(f"Error getting allmight agent: {e}", "ERROR")
+                return RunResponse(
+                    answer=settings.llm_unavailable_message,
+                    content=settings.llm_unavailable_message,
+                )
 
-    async def get_classic_agent(self) -> Agent:
+    async def _run_agent(
+        self,
+        user_input: str,
+        chat_id: int,
+        match: IntentMatch | None,
+        under_pressure: bool,
+    ) -> tuple[Any, ModelDecision]:
         """
-        Initializes and returns a classic agent with Gemini model.
+        Runs the agent on the routed model tier, escalating low-confidence
+        answers. Under pressure memory updates are deferred and there is no
+        escalation. A tier whose circuit is open is swapped for the other one,
+        and a failed escalation keeps the first answer.
+
+        A turn is persisted once: an attempt that may be escalated runs without
+        agentic memory and with its session write held back, and only the
+        answer that is kept is written to storage and memory.
         """
-        try:
+        decision = self.model_router.choose(
+            user_input, match, under_pressure=under_pressure
+        )
+        if not self.llm_caller.available(decision.model_id):
+            decision = self.model_router.fallback(decision)
+        may_escalate = self.model_router.may_escalate(decision)
+        agentic_memory = not under_pressure and not may_escalate
+        agent = await self.get_classic_agent(
+            decision.model_id, agentic_memory=agentic_memory
+        )
+        if under_pressure and getattr(agent, "memory", None) is not None:
+            memory = agent.memory
+            self.admission_service.defer(
+                lambda: memory.acreate_user_memories(message=user_input)
+            )
+        response, agent = await self._timed_run(
+            agent,
+            decision,
+            user_input,
+            chat_id,
+            agentic_memory,
+            defer_writes=may_escalate,
+        )
+        escalate, reason = self.model_router.needs_escalation(decision, response)
+        if escalate and self.llm_caller.available(settings.model_default):
+            escalated = self.model_router.escalate(reason)
+            try:
+                response, _ = await self._timed_run(
+                    await self.get_classic_agent(escalated.model_id),
+                    escalated,
+                    user_input,
+                    chat_id,
+                )
+                return response, escalated
+            except LLMUnavailableError as e:
+                log_message(
+                    f"Escalation failed, keeping the {decision.model_id} answer: {e}",
+                    "WARNING",
+                )
+        if may_escalate:
+            await self._persist_turn(agent, user_input)
+        return response, decision
+
+    async def _persist_turn(self, agent: "Agent", user_input: str) -> None:
+        """
+        Writes the held-back session of a kept first attempt and updates the
+        user memories it skipped, in the background.
+        """
+        storage = getattr(agent, "storage", None)
+        if isinstance(storage, DeferredWriteStorage):
+            try:
+                with track_stage("redis"):
+                    storage.flush()
+            except Exception as e:
+                log_message(f"Error writing agent session: {e}", "WARNING")
+        memory = getattr(agent, "memory", None)
+        if memory is None:
+            return
+        if self.admission_service:
+            self.admission_service.defer(
+                lambda: memory.acreate_user_memories(message=user_input)
+            )
+        else:
+            task = asyncio.create_task(memory.acreate_user_memories(message=user_input))
+            self._memory_tasks.add(task)
+            task.add_done_callback(self._memory_tasks.discard)
+
+    async def _timed_run(
+        self,
+        agent: "Agent",
+        decision: ModelDecision,
+        user_input: str,
+        chat_id: int,
+        agentic_memory: bool = True,
+        defer_writes: bool = False,
+    ) -> tuple[Any, "Agent"]:
+        """
+        Runs the agent through the resilient caller and returns the response
+        with the agent that produced it. Retries and hedged requests get a
+        fresh agent, as an agent must not run twice at once. With
+        `defer_writes` the agents hold back their session write.
+        """
+        agents = [agent]
+
+        async def attempt() -> tuple[Any, "Agent"]:
+            current = (
+                agents.pop()
+                if agents
+                else await self.get_classic_agent(
+                    decision.model_id, agentic_memory=agentic_memory
+                )
+            )
+            if defer_writes and getattr(current, "storage", None) is not None:
+                current.storage = DeferredWriteStorage(current.storage)
+            return await current.arun(user_input, chat_id=chat_id), current
+
+        started = time.perf_counter()
+        with track_stage("llm_generation"):
+            set_span_attributes(model=decision.model_id, reason=decision.reason)
+            try:
+                response, answered_by = await self.llm_caller.call(
+                    decision.model_id, attempt
+                )
+            finally:
+                if self.admission_service:
+                    self.admission_service.observe_llm_latency(
+                        time.perf_counter() - started
+                    )
+        return response, answered_by
+
+    def agent_resources(self) -> dict[str, Any]:
+        """
+        Loads the agent instructions and creates the Redis storage and memory
+        db once, on first use, instead of on every request.
+        """
+        if self._agent_resources is None:
+            from agno.memory.v2.db.redis import RedisMemoryDb
+            from agno.storage.redis import RedisStorage
+
             try:
                 with open("docs/agent_instructions.md", "r") as file:
                     instructions = file.read()
             except Exception as e:
                 log_message(f"Error reading agent instructions: {e}", "ERROR")
                 instructions = ""
-            # Initialize Redis storage and memory
-            memory = Memory(
-                db=RedisMemoryDb(
+            self._agent_resources = {
+                "instructions": instructions,
+                "memory_db": RedisMemoryDb(
                     prefix="session_memory",
-                    host=settings.postgres_host,
-                    port=6380,
-                    db=0,
+                    host=settings.redis_host,
+                    port=settings.redis_port,
+                    db=settings.redis_db,
                 ),
-                model=Gemini(
-                    id= "gemini-2.5-flash",
-                    api_key=settings.google_api_key
+                "storage": RedisStorage(
+                    prefix="celim_oracle",
+                    host=settings.redis_host,
+                    port=settings.redis_port,
+                    db=settings.redis_db,
                 ),
-            )
-            storage = RedisStorage(
-                prefix="celim_oracle",
-                host=settings.postgres_host,
-                port=6380,
-                db=0,
+            }
+        return self._agent_resources
+
+    async def get_classic_agent(
+        self, model_id: str | None = None, agentic_memory: bool = True
+    ) -> "Agent":
+        """
+        Initializes and returns a classic agent with Gemini model.
+        Uses the default model tier when no model id is given; without
+        `agentic_memory` the agent does not update user memories during the run.
+        agno is imported on the first call rather than at startup.
+        """
+        try:
+            from agno.agent import Agent
+            from agno.memory.v2.memory import Memory
+            from agno.models.google import Gemini
+
+            from agent.tools.smartpos_tools import catalogue_tools
+
+            resources = self.agent_resources()
+            # Initialize Redis storage and memory
+            memory = Memory(
+                db=resources["memory_db"],
+                model=Gemini(id=settings.model_memory, api_key=settings.google_api_key),
             )
             # await self.knowledge_service.combined_knowledge.aload(recreate=False, upsert=False)
             agent = Agent(
                 model=Gemini(
-                    id= "gemini-2.5-flash",
-                    api_key=settings.google_api_key
+                    id=model_id or settings.model_default,
+                    api_key=settings.google_api_key,
                 ),
                 knowledge=self.knowledge_service.combined_knowledge,
                 search_knowledge=True,
                 show_tool_calls=False,
                 add_history_to_messages=True,
-                instructions=instructions,
-                storage=storage,
+                instructions=resources["instructions"],
+                storage=resources["storage"],
                 memory=memory,
-                enable_agentic_memory=True
+                enable_agentic_memory=agentic_memory,
+                tools=catalogue_tools() if self.catalogue_service else None,
             )
             return agent
         except Exception as e:
             log_message(f"Error initializing classic agent: {e}", "ERROR")
-            raise RuntimeError(f"Could not initialize classic agent: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Could not initialize classic agent: {e}")
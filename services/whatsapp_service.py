@@ -0,0 +1,104 @@
+import hashlib
+import hmac
+import threading
+from typing import Optional
+
+import httpx
+
+from core.metrics import track_stage
+from core.settings import settings
+from utils.tools.log_tool import log_message
+
+
+class WhatsAppService:
+    """
+    WhatsApp Cloud API client: sends replies through the Graph API and checks
+    the signature and verification token of incoming webhooks.
+    """
+
+    _instance: Optional["WhatsAppService"] = None
+    _lock: threading.Lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    async def initialize(
+        self,
+        access_token: str,
+        phone_number_id: str,
+        verify_token: str = "",
+        app_secret: str = "",
+        timeout: float = 30.0,
+    ) -> None:
+        """
+        Initialize the client for the business phone number that sends replies.
+        The `app_secret` is required, as unsigned webhooks are rejected.
+        """
+        if not access_token or not phone_number_id:
+            raise ValueError("WhatsApp access token and phone number id are required")
+        if not app_secret:
+            raise ValueError(
+                "WhatsApp app secret is required to verify webhook signatures"
+            )
+        self.phone_number_id = phone_number_id
+        self.verify_token = verify_token
+        self.app_secret = app_secret
+        self.messages_endpoint = f"{settings.whatsapp_api_url}/{settings.whatsapp_api_version}/{phone_number_id}/messages"
+        # One keep-alive client for every send
+        self.client = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=timeout,
+        )
+        log_message("WhatsApp service initialized successfully", "INFO")
+
+    async def send_message(self, chat_id: str, text: str) -> dict:
+        """
+        Send a text message to a WhatsApp user (`chat_id` is their wa_id).
+        """
+        try:
+            log_message(
+                f"Sending WhatsApp message to {chat_id}: {text[:50]}...", "INFO"
+            )
+            payload = {
+                "messaging_product": "whatsapp",
+                "recipient_type": "individual",
+                "to": chat_id,
+                "type": "text",
+                "text": {"body": text},
+            }
+            with track_stage("whatsapp_send"):
+                response = await self.client.post(self.messages_endpoint, json=payload)
+                response.raise_for_status()
+                return response.json()
+        except Exception as e:
+            log_message(f"Error sending WhatsApp message: {e!s}", "ERROR")
+            raise e
+
+    def verify_subscription(self, mode: str | None, token: str | None) -> bool:
+        """Checks the hub.mode/hub.verify_token pair Meta sends when the webhook is registered."""
+        return (
+            mode == "subscribe"
+            and bool(self.verify_token)
+            and hmac.compare_digest(token or "", self.verify_token)
+        )
+
+    def verify_signature(self, body: bytes, signature: str | None) -> bool:
+        """Checks the X-Hub-Signature-256 header (HMAC-SHA256 of the body with the app secret)."""
+        if not self.app_secret:
+            return False
+        expected = (
+            "sha256="
+            + hmac.new(
+                self.app_secret.encode("utf-8"), body, hashlib.sha256
+            ).hexdigest()
+        )
+        return hmac.compare_digest(signature or "", expected)
+
+    async def close(self) -> None:
+        if getattr(self, "client", None) is not None:
+            await self.client.aclose()
+            self.client = None
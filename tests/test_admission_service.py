@@ -0,0 +1,104 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from core.metrics import admission_decisions
+from core.settings import settings
+from services.admission_service import AdmissionService
+from services.user_request_service import UserRequestService
+
+
+async def make_admission(**kwargs):
+    admission = AdmissionService()
+    await admission.initialize(**kwargs)
+    return admission
+
+
+def test_waiting_and_rejection_are_bounded():
+    async def run():
+        admission = await make_admission(max_in_flight=1, max_waiting=1, max_wait=5.0)
+        on_busy = AsyncMock()
+        assert await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire(on_busy=on_busy))
+        await asyncio.sleep(0)
+        rejected = await admission.acquire()
+        admission.release()
+        admitted = await waiter
+        admission.release()
+        return admission, on_busy, rejected, admitted
+
+    rejected_before = admission_decisions.value(decision="rejected")
+    admission, on_busy, rejected, admitted = asyncio.run(run())
+    assert rejected is False
+    assert admitted is True
+    on_busy.assert_awaited_once()
+    assert admission.in_flight == 0 and admission.waiting == 0
+    assert admission_decisions.value(decision="rejected") == rejected_before + 1
+
+
+def test_wait_is_limited_by_max_wait():
+    async def run():
+        admission = await make_admission(max_in_flight=1, max_waiting=5, max_wait=0.05)
+        await admission.acquire()
+        return await admission.acquire(), admission.queue_wait
+
+    admitted, queue_wait = asyncio.run(run())
+    assert admitted is False
+    assert queue_wait >= 0.05
+
+
+def test_deferred_work_waits_for_pressure_to_clear():
+    async def run():
+        admission = await make_admission(llm_latency_threshold=1.0, window=0.2)
+        admission.observe_llm_latency(5.0)
+        assert admission.under_pressure
+        done = asyncio.Event()
+
+        async def task():
+            done.set()
+
+        await admission.start()
+        admission.defer(task)
+        await asyncio.sleep(0.1)
+        ran_under_pressure = done.is_set()
+        await asyncio.wait_for(done.wait(), timeout=3.0)
+        await admission.stop()
+        return ran_under_pressure, admission.under_pressure
+
+    ran_under_pressure, still_under_pressure = asyncio.run(run())
+    assert ran_under_pressure is False
+    assert still_under_pressure is False
+
+
+def test_request_is_degraded_under_pressure():
+    memory = SimpleNamespace(acreate_user_memories=AsyncMock())
+    agent = SimpleNamespace(
+        memory=memory,
+        arun=AsyncMock(return_value=SimpleNamespace(content="Temos sim!", tools=[])),
+    )
+    calls = []
+
+    async def get_fake_agent(model_id=None, agentic_memory=True):
+        calls.append((model_id, agentic_memory))
+        return agent
+
+    async def run():
+        admission = await make_admission(llm_latency_threshold=1.0)
+        admission.observe_llm_latency(10.0)
+        service = UserRequestService()
+        await service.initialize(
+            SimpleNamespace(notion_documents=[]), admission_service=admission
+        )
+        service.get_classic_agent = get_fake_agent
+        response = await service.process_user_request(
+            "quero fazer um pedido de 3 espetos", 1
+        )
+        return admission, response
+
+    try:
+        admission, response = asyncio.run(run())
+    finally:
+        vars(UserRequestService()).pop("get_classic_agent", None)
+    assert response.content == "Temos sim!"
+    assert calls == [(settings.model_fast, False)]
+    assert admission.deferred.qsize() == 1
@@ -0,0 +1,81 @@
+import asyncio
+
+from benchmarks.fakes import FakeGemini, StubTelegramServer
+from benchmarks.replay import (
+    DEFAULT_PAYLOADS,
+    load_payloads,
+    percentile,
+    replies_sent,
+    run_benchmark,
+    run_polling_benchmark,
+)
+from core.settings import settings
+from main import app
+from services.user_request_service import UserRequestService
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def cleanup(telegram, telegram_api_url):
+    telegram.stop()
+    settings.telegram_api_url = telegram_api_url
+    for name in (
+        "knowledge_service",
+        "health_service",
+        "user_request_service",
+        "telegram_service",
+        "update_service",
+        "telegram_poller",
+    ):
+        if hasattr(app.state, name):
+            delattr(app.state, name)
+    vars(UserRequestService()).pop("get_classic_agent", None)
+
+
+def test_replay_against_stubs():
+    telegram_api_url = settings.telegram_api_url
+    telegram = StubTelegramServer().start()
+    try:
+        report = asyncio.run(
+            run_benchmark(
+                load_payloads(DEFAULT_PAYLOADS),
+                rate=200,
+                count=12,
+                fake_gemini=FakeGemini(latency=0, tokens_per_second=0),
+                telegram_url=telegram.url,
+            )
+        )
+    finally:
+        cleanup(telegram, telegram_api_url)
+
+    assert report["requests"] == 12
+    assert report["error_rate"] == 0.0
+    assert len(replies_sent(telegram)) == 12
+    assert report["latency_ms"]["p50"] <= report["latency_ms"]["p99"]
+
+
+def test_polling_replay_against_stubs():
+    telegram_api_url = settings.telegram_api_url
+    telegram = StubTelegramServer().start()
+    try:
+        report = asyncio.run(
+            run_polling_benchmark(
+                load_payloads(DEFAULT_PAYLOADS),
+                rate=200,
+                count=12,
+                fake_gemini=FakeGemini(latency=0, tokens_per_second=0),
+                telegram=telegram,
+                drain_timeout=20,
+            )
+        )
+    finally:
+        cleanup(telegram, telegram_api_url)
+
+    assert report["error_rate"] == 0.0
+    assert len(replies_sent(telegram)) == 12
+    assert telegram.updates == []
@@ -0,0 +1,166 @@
+import asyncio
+import json
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from agent.tools.smartpos_tools import check_product, list_products
+from benchmarks.fakes import FakeSmartPOSServer
+from models.catalogue_models import CataloguePage
+from services.catalogue_service import CatalogueService, SmartPOSClient, format_price
+from services.user_request_service import UserRequestService
+
+
+@pytest.fixture
+def smartpos():
+    server = FakeSmartPOSServer().start()
+    yield server
+    server.stop()
+
+
+async def make_catalogue(server, api_key="smartpos-test-key", max_staleness=900.0):
+    service = CatalogueService()
+    await service.initialize(
+        SmartPOSClient(server.url, api_key, page_size=3),
+        refresh_interval=60,
+        max_staleness=max_staleness,
+    )
+    await service.refresh()
+    return service
+
+
+def test_sync_indexes_every_page(smartpos):
+    async def run():
+        service = await make_catalogue(smartpos)
+        await service.client.close()
+        return service
+
+    service = asyncio.run(run())
+    assert len(service.index) == len(smartpos.products)
+    assert smartpos.requests == 3
+    assert service.lookup("ESP-001").name == "Espeto de Picanha"
+    assert service.lookup("espeto de picanha").sku == "ESP-001"
+    assert service.lookup("picanha").sku == "ESP-001"
+    assert service.lookup("coração").sku == "ESP-003"
+    assert service.lookup("espetos de linguiça").sku == "ESP-004"
+    # Names two products, so it is left to the agent
+    assert service.lookup("frango") is None
+    assert service.lookup("espeto de frango").sku == "ESP-002"
+    assert service.lookup("abacaxi") is None
+
+
+def test_prices_are_exact_decimals():
+    page = CataloguePage.model_validate_json(
+        '{"data": [{"sku": "X", "name": "Combo", "price": 0.1}, {"sku": "Y", "name": "Balde", "price": 1234.005}]}'
+    )
+    assert [product.price for product in page.data] == [
+        Decimal("0.1"),
+        Decimal("1234.005"),
+    ]
+    assert format_price(page.data[0].price * 3) == "R$ 0,30"
+    assert format_price(page.data[1].price) == "R$ 1.234,01"
+
+
+def test_questions_are_answered_from_the_index(smartpos):
+    async def run():
+        service = await make_catalogue(smartpos)
+        await service.client.close()
+        return service
+
+    service = asyncio.run(run())
+    assert (
+        service.answer("Tem picanha hoje?")
+        == "Temos sim! Espeto de Picanha está disponível hoje por R$ 14,00."
+    )
+    assert (
+        service.answer("vocês têm espeto de coração?")
+        == "Infelizmente Espeto de Coração de Frango está em falta hoje."
+    )
+    assert (
+        service.answer("Quanto custa o espeto de frango?")
+        == "Espeto de Frango custa R$ 9,50."
+    )
+    assert (
+        service.answer("qual o preço da cerveja long neck")
+        == "Cerveja Long Neck custa R$ 10,00."
+    )
+    assert service.answer("tem farofa?") == "Infelizmente Farofa está em falta hoje."
+    assert service.answer("tem abacaxi hoje?") is None
+    assert service.answer("tem frango?") is None
+    assert service.answer("qual o horário?") is None
+
+
+def test_refresh_updates_stock_and_keeps_snapshot_on_failure(smartpos):
+    async def run():
+        service = await make_catalogue(smartpos)
+        smartpos.set_stock("ESP-001", 0)
+        await service.refresh()
+        sold_out = service.answer("tem picanha?")
+        smartpos.fail = True
+        failed = await service.refresh()
+        await service.client.close()
+        return service, sold_out, failed
+
+    service, sold_out, failed = asyncio.run(run())
+    assert sold_out == "Infelizmente Espeto de Picanha está em falta hoje."
+    assert failed is False
+    assert len(service.index) == len(smartpos.products)
+
+
+def test_stale_or_unauthorized_catalogue_is_not_used(smartpos):
+    async def run():
+        unauthorized = await make_catalogue(smartpos, api_key="wrong")
+        await unauthorized.client.close()
+        empty = len(unauthorized.index)
+        stale = await make_catalogue(smartpos, max_staleness=0.0)
+        await stale.client.close()
+        return empty, stale
+
+    empty, stale = asyncio.run(run())
+    assert empty == 0
+    assert stale.answer("tem picanha hoje?") is None
+
+
+def test_agent_tools_read_the_index(smartpos):
+    async def run():
+        service = await make_catalogue(smartpos)
+        await service.client.close()
+
+    asyncio.run(run())
+    found = json.loads(check_product("queijo coalho"))
+    assert (
+        found["found"] is True
+        and found["price"] == "R$ 8,00"
+        and found["available"] is True
+    )
+    assert json.loads(check_product("abacaxi"))["found"] is False
+    drinks = json.loads(list_products("bebidas"))
+    assert [item["name"] for item in drinks] == [
+        "Refrigerante Lata",
+        "Cerveja Long Neck",
+    ]
+
+
+def test_catalogue_questions_skip_the_agent(smartpos):
+    async def get_agent(model_id=None, agentic_memory=True):
+        raise AssertionError("the agent must not run")
+
+    async def run():
+        catalogue = await make_catalogue(smartpos)
+        await catalogue.client.close()
+        service = UserRequestService()
+        await service.initialize(
+            SimpleNamespace(notion_documents=[]), catalogue_service=catalogue
+        )
+        service.get_classic_agent = get_agent
+        return await service.process_user_request(
+            "Quanto custa o espeto de picanha?", 1
+        )
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        vars(UserRequestService()).pop("get_classic_agent", None)
+    assert response.content == "Espeto de Picanha custa R$ 14,00."
+    assert response.model == "catalogue"
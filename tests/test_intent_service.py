@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+import pytest
+from agno.document.base import Document as AgnoDocument
+
+from services.intent_service import IntentService, normalize_text
+from utils.tools.intent_eval import evaluate
+
+documents = [
+    AgnoDocument(
+        content="Endereço: Rua das Flores, 123\nHorário: 18h às 23h", meta_data={}
+    ),
+    AgnoDocument(
+        content="Espeto de carne - R$ 10,00",
+        meta_data={"properties_Chave Pix": "espetos@pix.com"},
+    ),
+]
+
+
+class BagOfWordsEmbedder:
+    """Deterministic stand-in for the Gemini embedder: hashed word counts."""
+
+    def get_embedding(self, text: str):
+        vector = [0.0] * 64
+        for word in normalize_text(text).split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return vector
+
+
+def classify(text: str, docs=documents):
+    service = IntentService()
+    asyncio.run(service.initialize(documents=docs))
+    return asyncio.run(service.classify(text))
+
+
+def test_normalize_text():
+    assert normalize_text("  Olá, Tudo BEM?! ") == "ola tudo bem"
+
+
+def test_greeting_is_answered_locally():
+    match = classify("Bom dia!")
+    assert match.intent == "saudacao"
+    assert match.method == "rule"
+    assert match.is_templated
+
+
+def test_faq_answers_come_from_knowledge_base():
+    assert (
+        classify("qual o endereço?").answer == "Nosso endereço é: Rua das Flores, 123"
+    )
+    assert (
+        classify("Que horas abre?").answer
+        == "Nosso horário de funcionamento é: 18h às 23h"
+    )
+    assert (
+        classify("me passa a chave pix").answer == "Nossa chave Pix é: espetos@pix.com"
+    )
+
+
+def test_messages_only_mentioning_a_faq_keyword_go_to_llm():
+    for text in [
+        "meu endereço é rua x 12",
+        "vocês entregam no meu endereço?",
+        "já fiz o pix",
+        "o pix não caiu, pode conferir?",
+        "qual o horário do delivery?",
+    ]:
+        match = classify(text)
+        assert match.intent is None and not match.is_templated, text
+
+
+def test_faq_question_forms_are_answered_locally():
+    assert classify("Onde vocês ficam?").intent == "endereco"
+    assert classify("qual o horário de funcionamento?").intent == "horario"
+    assert classify("Vocês estão abertos hoje?").intent == "horario"
+    assert classify("aceita pix?").intent == "pix"
+
+
+def test_faq_without_knowledge_goes_to_llm():
+    match = classify("qual o endereço?", docs=[])
+    assert match.intent == "endereco"
+    assert not match.is_templated
+
+
+def test_open_ended_question_goes_to_llm():
+    assert not classify("quanto custa o espeto de frango com farofa?").is_templated
+    assert not classify("oi, qual o endereço e o horário?").is_templated
+
+
+def test_slow_embeddings_are_bounded_and_left_to_the_llm():
+    class SlowEmbedder(BagOfWordsEmbedder):
+        def __init__(self):
+            self.slow = False
+            self.running = self.max_running = 0
+            self.lock = threading.Lock()
+
+        def get_embedding(self, text: str):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.3 if self.slow else 0.01)
+            with self.lock:
+                self.running -= 1
+            return super().get_embedding(text)
+
+    embedder = SlowEmbedder()
+    service = IntentService.standalone()
+
+    async def run():
+        await service.initialize(
+            embedder=embedder, embedding_concurrency=2, embedding_timeout=0.05
+        )
+        fast = await service.classify("a chave pix")
+        embedder.slow = True
+        started = time.perf_counter()
+        slow = await asyncio.gather(
+            *(service.classify("a chave pix") for _ in range(4))
+        )
+        return fast, slow, time.perf_counter() - started
+
+    fast, slow, elapsed = asyncio.run(run())
+    assert fast.intent == "pix" and fast.method == "embedding"
+    assert all(match.intent is None for match in slow)
+    assert elapsed < 0.3
+    assert embedder.max_running <= 2
+
+
+def test_offline_evaluation(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    lines = [
+        {"text": "oi", "intent": "saudacao"},
+        {"message": {"text": "valeu!"}, "intent": "agradecimento"},
+        {"question": "vocês fazem entrega no centro?", "intent": "open_ended"},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines))
+    report = asyncio.run(evaluate(str(path)))
+    assert report["total"] == 3
+    assert report["answered_locally"] == 2
+    assert report["accuracy"] == 1.0
+    assert report["methods"] == {"rule": 2, "none": 1}
+
+
+def test_offline_evaluation_goes_through_the_embeddings(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    lines = [
+        {"text": "a chave pix", "intent": "pix"},
+        {"text": "já fiz o pix", "intent": "open_ended"},
+    ]
+    path.write_text("\n".join(json.dumps(line) for line in lines))
+    live = IntentService()
+    asyncio.run(live.initialize(documents=documents))
+    faq_table = dict(live.faq_table)
+    report = asyncio.run(evaluate(str(path), embedder=BagOfWordsEmbedder()))
+    assert report["embeddings"]
+    assert report["methods"] == {"embedding": 1, "none": 1}
+    assert report["accuracy"] == 1.0
+    # The service answering users keeps its FAQ table
+    assert IntentService().faq_table == faq_table
+
+
+def test_offline_evaluation_needs_questions(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    path.write_text(
+        json.dumps({"request_id": "user-001", "title": "Speed up", "body": "..."})
+    )
+    with pytest.raises(ValueError):
+        asyncio.run(evaluate(str(path)))
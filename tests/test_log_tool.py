@@ -0,0 +1,71 @@
+import io
+import json
+import os
+
+from core.metrics import log_records_dropped, registry
+from utils.tools.log_tool import (
+    configure_logging,
+    dropped_records,
+    log_message,
+    shutdown_logging,
+)
+
+
+def read_lines(stream: io.StringIO) -> list:
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def restore_logging():
+    configure_logging(
+        level=os.getenv("LOG_LEVEL", "INFO"), fmt=os.getenv("LOG_FORMAT", "json")
+    )
+
+
+def test_json_lines_with_level_filtering_and_truncation():
+    stream = io.StringIO()
+    configure_logging(level="INFO", max_chars=10, info_rate_limit=0, stream=stream)
+    try:
+        log_message("debug is filtered", "DEBUG")
+        log_message("x" * 25, "INFO")
+        log_message("errors are never truncated", "ERROR")
+        log_message("ready", "SUCCESS")
+        shutdown_logging()
+    finally:
+        restore_logging()
+    lines = read_lines(stream)
+    assert [line["level"] for line in lines] == ["INFO", "ERROR", "SUCCESS"]
+    assert lines[0]["message"] == "xxxxxxxxxx...(+15 chars)"
+    assert lines[1]["message"] == "errors are never truncated"
+
+
+def test_info_lines_are_rate_limited():
+    stream = io.StringIO()
+    configure_logging(level="INFO", info_rate_limit=3, stream=stream)
+    try:
+        for index in range(20):
+            log_message(f"line {index}", "INFO")
+        log_message("warnings are not limited", "WARNING")
+        shutdown_logging()
+    finally:
+        restore_logging()
+    lines = read_lines(stream)
+    assert len([line for line in lines if line["level"] == "INFO"]) == 3
+    assert lines[-1]["level"] == "WARNING"
+
+
+def test_dropped_records_are_exported():
+    before = dropped_records()
+    configure_logging(level="INFO", queue_size=1, stream=io.StringIO())
+    try:
+        # Nothing drains the queue once the listener is stopped
+        shutdown_logging()
+        for index in range(5):
+            log_message(f"warning {index}", "WARNING")
+    finally:
+        restore_logging()
+    assert dropped_records() == before + 4
+    assert (
+        f"espetos_log_records_dropped_total {before + 4}"
+        in registry.render().splitlines()
+    )
+    assert log_records_dropped.value() == before + 4
@@ -1,34 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
 from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock
+
 from main import app
+from services.health_service import HealthService
+from services.update_service import UpdateService
 
 client = TestClient(app)
 
+
+def setup_health_service(
+    redis_ok=True, postgres_error=None, knowledge_state="loaded", queue_depth=0
+):
+    redis_client = AsyncMock()
+    redis_client.ping.return_value = redis_ok
+    conn = AsyncMock()
+    conn.fetchval.return_value = 1
+    acquire = MagicMock()
+    acquire.return_value.__aenter__ = AsyncMock(
+        return_value=conn, side_effect=postgres_error
+    )
+    acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+    postgres_pool = MagicMock(acquire=acquire)
+    health_service = HealthService()
+    asyncio.run(
+        health_service.initialize(
+            redis_client=redis_client,
+            postgres_pool=postgres_pool,
+            knowledge_service=SimpleNamespace(load_state=knowledge_state),
+            queue_depth=lambda: queue_depth,
+            max_queue_depth=10,
+        )
+    )
+    asyncio.run(health_service.probe())
+    app.state.health_service = health_service
+    return health_service
+
+
+def setup_update_service():
+    user_request_service = MagicMock()
+    user_request_service.process_user_request = AsyncMock(
+        return_value=SimpleNamespace(content="Olá!")
+    )
+    telegram_service = MagicMock()
+    telegram_service.send_message = AsyncMock(return_value={"ok": True})
+    update_service = UpdateService()
+    asyncio.run(update_service.initialize(user_request_service, telegram_service))
+    app.state.knowledge_service = MagicMock()
+    app.state.user_request_service = user_request_service
+    app.state.telegram_service = telegram_service
+    app.state.update_service = update_service
+    return update_service
+
+
+def teardown_function():
+    for name in (
+        "health_service",
+        "knowledge_service",
+        "user_request_service",
+        "telegram_service",
+        "update_service",
+    ):
+        if hasattr(app.state, name):
+            delattr(app.state, name)
+
+
 def test_health_check_success():
-    with patch('asyncpg.connect', new_callable=AsyncMock) as mock_connect:
-        mock_conn = AsyncMock()
-        mock_conn.fetchval.return_value = 1
-        mock_connect.return_value = mock_conn
-        
-        with patch('redis.asyncio.Redis.ping', new_callable=AsyncMock) as mock_ping:
-            mock_ping.return_value = True
-            
-            response = client.get("/health/")
-            assert response.status_code == 200
-            assert response.json() == {"status": "ok", "details": {"redis": "ok", "postgres": "ok"}}
+    health_service = setup_health_service()
+    response = client.get("/health/")
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "ok",
+        "details": {"redis": "ok", "postgres": "ok"},
+    }
+    # Served from the cached probe: no new connections per request
+    client.get("/health/")
+    assert health_service.postgres_pool.acquire.call_count == 1
+    assert health_service.redis_client.ping.await_count == 1
+
 
 def test_health_check_db_fails():
-    with patch('asyncpg.connect', new_callable=AsyncMock) as mock_connect:
-        mock_connect.side_effect = Exception("DB connection failed")
-        
-        with patch('redis.asyncio.Redis.ping', new_callable=AsyncMock) as mock_ping:
-            mock_ping.return_value = True
+    setup_health_service(postgres_error=Exception("DB connection failed"))
+    response = client.get("/health/")
+    assert response.status_code == 503
+    assert response.json()["details"]["postgres"] == "error"
+
+
+def test_health_check_stale_probe():
+    health_service = setup_health_service()
+    health_service.checked_at -= health_service.max_staleness + 1
+    response = client.get("/health/")
+    assert response.status_code == 503
+
+
+def test_liveness():
+    response = client.get("/health/live")
+    assert response.status_code == 200
+
+
+def test_readiness():
+    setup_health_service()
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["details"]["knowledge"] == "loaded"
+
+
+def test_readiness_knowledge_not_loaded():
+    setup_health_service(knowledge_state="loading")
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+
+
+def test_readiness_queue_full():
+    setup_health_service(queue_depth=10)
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["details"]["queue_depth"] == 10
 
-            response = client.get("/health/")
-            assert response.status_code == 503
-            assert response.json()["details"]["postgres"] == "error"
 
 def test_telegram_webhook_empty_message():
+    setup_update_service()
     # Simulate a Telegram update with no text
     update_data = {
         "update_id": 12345,
@@ -37,14 +130,16 @@ def test_telegram_webhook_empty_message():
             "date": 1678886400,
             "chat": {"id": 111, "type": "private", "first_name": "Test"},
             "from": {"id": 111, "is_bot": False, "first_name": "Test"},
-            "text": ""
-        }
+            "text": "",
+        },
     }
     response = client.post("/webhook/telegram", json=update_data)
     assert response.status_code == 200
     assert response.json()["message"] == "Empty message ignored"
 
+
 def test_telegram_webhook_bot_message():
+    setup_update_service()
     # Simulate a message from a bot
     update_data = {
         "update_id": 12345,
@@ -53,9 +148,31 @@ def test_telegram_webhook_bot_message():
             "date": 1678886400,
             "chat": {"id": 111, "type": "private", "first_name": "Test"},
             "from": {"id": 987, "is_bot": True, "first_name": "AnotherBot"},
-            "text": "hello"
-        }
+            "text": "hello",
+        },
     }
     response = client.post("/webhook/telegram", json=update_data)
     assert response.status_code == 200
     assert response.json()["message"] == "Bot message ignored"
+
+
+def test_telegram_webhook_processes_message():
+    update_service = setup_update_service()
+    update_data = {
+        "update_id": 12346,
+        "message": {
+            "message_id": 54322,
+            "date": 1678886400,
+            "chat": {"id": 111, "type": "private", "first_name": "Test"},
+            "from": {"id": 111, "is_bot": False, "first_name": "Test"},
+            "text": "Oi",
+        },
+    }
+    response = client.post("/webhook/telegram", json=update_data)
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+    assert update_service.user_request_service.process_user_request.await_args.args == (
+        "Oi",
+        111,
+    )
+    update_service.telegram_service.send_message.assert_awaited_once_with(111, "Olá!")
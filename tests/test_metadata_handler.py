@@ -0,0 +1,103 @@
+import json
+from datetime import date
+from types import SimpleNamespace
+
+import httpx
+from agno.document import Document as AgnoDocument
+from langchain_core.documents.base import Document
+
+from benchmarks.notion_flatten import (
+    recursive_data_handler,
+    run_benchmark,
+    synthetic_metadata,
+)
+from core.instrumentation import StreamingDocumentKnowledgeBase
+from services.knowledge_service import KnowledgeService
+from utils.handlers.metadata_handler import data_handler, parse_properties
+from utils.handlers.to_agnodoc_handler import iter_agnodocs
+
+
+def test_flattening_matches_the_recursive_handler():
+    metadata = synthetic_metadata(3, depth=4, width=2)
+    metadata["Vazio"] = {"a": [], "b": 0, "c": None}
+    metadata["Quando"] = date(2025, 5, 1)
+    flattened = data_handler(metadata)
+    assert flattened == recursive_data_handler(metadata)
+    assert list(flattened) == list(recursive_data_handler(metadata))
+    assert flattened["Atualizado_start"] == "2025-01-04"
+    assert flattened["Responsável_0_name"] == "Pessoa 3"
+    assert flattened["Quando"] == "2025-05-01"
+    assert "Vazio_b" not in flattened
+
+
+def test_property_whitelist():
+    metadata = synthetic_metadata(1, depth=3, width=2)
+    flattened = data_handler(metadata, properties=parse_properties("Name, Preço"))
+    assert flattened == {"Name": "Espeto 1", "Preço": 11}
+    assert parse_properties("") is None
+
+
+def test_documents_are_converted_lazily():
+    pulled = []
+
+    def source():
+        for index in range(3):
+            pulled.append(index)
+            yield Document(
+                id=str(index),
+                page_content="Espeto",
+                metadata={"Name": f"Espeto {index}"},
+            )
+
+    knowledge_base = StreamingDocumentKnowledgeBase()
+    documents = knowledge_base.stream_from(iter_agnodocs(source()))
+    first = next(iter(knowledge_base.document_lists))
+    assert pulled == [0]
+    assert isinstance(first[0], AgnoDocument) and first[0].meta_data == {
+        "Name": "Espeto 0"
+    }
+    assert len(list(knowledge_base.document_lists)) == 3
+    # A second pass reuses the converted documents
+    assert len(list(knowledge_base.document_lists)) == 3
+    assert pulled == [0, 1, 2]
+    assert [document.id for document in documents] == ["0", "1", "2"]
+
+
+def test_notion_pages_are_queried_a_result_page_at_a_time():
+    queries = []
+
+    def handler(request):
+        query = json.loads(request.content)
+        queries.append(query)
+        if "start_cursor" not in query:
+            return httpx.Response(
+                200,
+                json={
+                    "results": [{"id": "a"}, {"id": "b"}],
+                    "has_more": True,
+                    "next_cursor": "c1",
+                },
+            )
+        return httpx.Response(
+            200, json={"results": [{"id": "c"}], "has_more": False, "next_cursor": None}
+        )
+
+    loader = SimpleNamespace(
+        database_id="db", filter_object={}, load_page=lambda summary: summary["id"]
+    )
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    pages = KnowledgeService.iter_notion_pages(loader, client=client, page_size=2)
+    assert next(pages) == "a"
+    assert len(queries) == 1
+    assert list(pages) == ["b", "c"]
+    assert queries == [{"page_size": 2}, {"page_size": 2, "start_cursor": "c1"}]
+
+
+def test_flatten_benchmark():
+    report = run_benchmark(
+        pages=20, depth=3, width=2, content_size=200, properties=["Name"]
+    )
+    assert report["conversion_memory"]["list"]["documents"] == 20
+    assert report["conversion_memory"]["generator"]["documents"] == 20
+    assert report["conversion_memory"]["knowledge_base"]["documents"] == 20
+    assert report["flatten_ms"]["iterative_whitelist"] is not None
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.metrics import (
+    Counter,
+    Histogram,
+    cache_requests,
+    registry,
+    stage_duration,
+    stage_errors,
+    track_stage,
+)
+from main import app
+from services.cache_service import CacheService
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram(
+        "test_duration_seconds",
+        "Test histogram.",
+        labels=("stage",),
+        buckets=(0.1, 1.0),
+    )
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+    lines = histogram.render()
+    assert 'test_duration_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_duration_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 'test_duration_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_duration_seconds_count{stage="a"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter("test_total", "Test counter.", labels=("model",))
+    counter.inc(model='a\\b "c"\nd')
+    assert counter.render()[-1] == 'test_total{model="a\\\\b \\"c\\"\\nd"} 1'
+
+
+def test_track_stage_counts_errors():
+    before = stage_errors.value(stage="test_stage")
+    with pytest.raises(ValueError), track_stage("test_stage"):
+        raise ValueError("boom")
+    assert stage_errors.value(stage="test_stage") == before + 1
+
+
+def test_metrics_endpoint():
+    cache_requests.inc(cache="test_cache", result="hit")
+    cache_requests.inc(cache="test_cache", result="miss")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'espetos_cache_hit_ratio{cache="test_cache"} 0.5' in response.text
+    assert "# TYPE espetos_stage_duration_seconds histogram" in registry.render()
+
+
+def test_cache_round_trips_are_timed():
+    fakeredis = pytest.importorskip("fakeredis")
+
+    async def run():
+        cache_service = CacheService()
+        await cache_service.initialize(
+            fakeredis.FakeAsyncRedis(decode_responses=True), prefix="test-metrics"
+        )
+        await cache_service.are_duplicates("telegram_update", [1, 2])
+        await cache_service.set_answer("oi", "Olá!")
+        return await cache_service.get_answer("oi")
+
+    before = stage_duration.count(stage="redis")
+    assert asyncio.run(run()) == "Olá!"
+    assert stage_duration.count(stage="redis") == before + 3
@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.settings import settings
+from models.intent_models import IntentMatch
+from services.model_router import ModelRouter
+from services.user_request_service import UserRequestService
+
+
+def test_short_question_uses_fast_tier():
+    decision = ModelRouter().choose("tem espeto de queijo?", IntentMatch(intent="pix"))
+    assert decision.tier == "fast"
+    assert decision.model_id == settings.model_fast
+
+
+def test_long_or_complex_question_uses_default_tier():
+    router = ModelRouter()
+    assert (
+        router.choose("quero fazer um pedido de 3 espetos").reason == "complex_request"
+    )
+    assert router.choose("quanto custa? e entrega?").reason == "multiple_questions"
+    assert router.choose(" ".join(["palavra"] * 40)).reason == "long_message"
+
+
+def test_low_confidence_fast_answer_is_escalated():
+    router = ModelRouter()
+    decision = router.choose("tem chopp?")
+    no_docs = SimpleNamespace(
+        content="Temos sim",
+        tools=[
+            SimpleNamespace(
+                tool_name="search_knowledge_base", result="No documents found"
+            )
+        ],
+    )
+    refusal = SimpleNamespace(
+        content="Não posso fornecer o valor do produto no momento.", tools=[]
+    )
+    assert router.needs_escalation(decision, no_docs) == (True, "no_retrieval")
+    assert router.needs_escalation(decision, refusal) == (True, "low_confidence_answer")
+    assert router.needs_escalation(
+        decision, SimpleNamespace(content="Chopp - R$ 12,00", tools=[])
+    ) == (False, "")
+    assert router.escalate("no_retrieval").tier == "default"
+    assert router.stats[("default", "escalated")] == 1
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.writes = []
+
+    def upsert(self, session):
+        self.writes.append(session)
+        return session
+
+
+def run_with_answers(answers):
+    """Runs one request with agents answering `answers` by tier, returns the storage writes and agent calls."""
+    storage = RecordingStorage()
+    calls = []
+
+    class FakeAgent:
+        def __init__(self, model_id):
+            self.model_id = model_id
+            self.storage = storage
+            self.memory = None
+
+        async def arun(self, message, **kwargs):
+            content = answers[self.model_id]
+            # Like agno, the session is written at the end of the run
+            self.storage.upsert(session=(self.model_id, content))
+            return SimpleNamespace(content=content, tools=[])
+
+    async def get_fake_agent(model_id=None, agentic_memory=True):
+        calls.append((model_id, agentic_memory))
+        return FakeAgent(model_id)
+
+    async def run():
+        service = UserRequestService()
+        await service.initialize(SimpleNamespace(notion_documents=[]))
+        service.get_classic_agent = get_fake_agent
+        return await service.process_user_request("tem chopp?", 1)
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        vars(UserRequestService()).pop("get_classic_agent", None)
+    return response, storage.writes, calls
+
+
+def test_escalated_turn_is_written_once():
+    response, writes, calls = run_with_answers(
+        {
+            settings.model_fast: "Não posso fornecer o valor do produto no momento.",
+            settings.model_default: "Chopp - R$ 12,00",
+        }
+    )
+    assert response.content == "Chopp - R$ 12,00"
+    assert writes == [(settings.model_default, "Chopp - R$ 12,00")]
+    # The first attempt does not update memories; the escalated one does
+    assert calls == [(settings.model_fast, False), (settings.model_default, True)]
+
+
+def test_kept_first_answer_is_written_once():
+    response, writes, _ = run_with_answers({settings.model_fast: "Chopp - R$ 12,00"})
+    assert response.model == settings.model_fast
+    assert writes == [(settings.model_fast, "Chopp - R$ 12,00")]
@@ -0,0 +1,168 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from agno.exceptions import ModelProviderError
+
+from benchmarks.fakes import FakeGemini
+from core.metrics import llm_calls
+from core.resilience import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    ResilientCaller,
+    is_transient,
+    remaining_time,
+    request_deadline,
+)
+from core.settings import settings
+from services.user_request_service import UserRequestService
+
+
+def make_caller(**kwargs):
+    options = {"retry_base_delay": 0.001, "retry_max_delay": 0.01}
+    options.update(kwargs)
+    return ResilientCaller(**options)
+
+
+def test_transient_errors_are_retried():
+    fake = FakeGemini(latency=0, tokens_per_second=0, fail_every=2)
+    caller = make_caller(max_attempts=3)
+
+    async def run():
+        # Calls 1 and 3 succeed, call 2 fails and is retried as call 3
+        await caller.call("model", lambda: fake.arun("Oi"))
+        return await caller.call("model", lambda: fake.arun("Oi"))
+
+    retries_before = llm_calls.value(model="model", outcome="retry")
+    response = asyncio.run(run())
+    assert response.content
+    assert fake.calls == 3
+    assert llm_calls.value(model="model", outcome="retry") == retries_before + 1
+
+
+def test_permanent_errors_are_not_retried():
+    calls = []
+
+    async def bad_request():
+        calls.append(1)
+        raise ValueError("400 INVALID_ARGUMENT")
+
+    with pytest.raises(ValueError):
+        asyncio.run(make_caller().call("model", bad_request))
+    assert len(calls) == 1
+    assert not is_transient(ValueError("400 INVALID_ARGUMENT"))
+    assert is_transient(RuntimeError("503 UNAVAILABLE"))
+
+
+def test_deadline_bounds_the_call():
+    fake = FakeGemini(latency=1.0, tokens_per_second=0)
+
+    async def run():
+        with request_deadline(0.05):
+            assert 0 < remaining_time() <= 0.05
+            await make_caller().call("model", lambda: fake.arun("Oi"))
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(run())
+    assert remaining_time() is None
+
+
+def test_deadline_counts_from_receipt():
+    async def run():
+        with request_deadline(10.0, started_at=0.0):
+            await make_caller().call("model", FakeGemini().arun)
+
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(run())
+
+
+def test_circuit_opens_and_recovers():
+    fake = FakeGemini(latency=0, tokens_per_second=0, fail_every=1)
+    caller = make_caller(
+        max_attempts=1, breaker_failure_threshold=2, breaker_recovery_time=0.05
+    )
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ModelProviderError):
+                await caller.call("model", lambda: fake.arun("Oi"))
+        calls_when_open = fake.calls
+        with pytest.raises(CircuitOpenError):
+            await caller.call("model", lambda: fake.arun("Oi"))
+        assert not caller.available("model")
+        await asyncio.sleep(0.06)
+        fake.fail_every = 0
+        response = await caller.call("model", lambda: fake.arun("Oi"))
+        return calls_when_open, response
+
+    calls_when_open, response = asyncio.run(run())
+    assert calls_when_open == 2 and fake.calls == 3
+    assert response.content
+    assert caller.breaker("model").state == "closed"
+
+
+def test_cancelled_trial_lets_the_next_call_through():
+    fake = FakeGemini(latency=0, tokens_per_second=0, fail_every=1)
+    caller = make_caller(
+        max_attempts=1, breaker_failure_threshold=1, breaker_recovery_time=0.05
+    )
+
+    async def run():
+        with pytest.raises(ModelProviderError):
+            await caller.call("model", lambda: fake.arun("Oi"))
+        await asyncio.sleep(0.06)
+        assert caller.breaker("model").state == "half_open"
+        # The trial is cancelled, as a hedge loser or a dropped event would be
+        trial = asyncio.create_task(caller.call("model", lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        fake.fail_every = 0
+        return await caller.call("model", lambda: fake.arun("Oi"))
+
+    response = asyncio.run(run())
+    assert response.content
+    assert caller.breaker("model").state == "closed"
+
+
+def test_slow_call_is_hedged():
+    fake = FakeGemini(latency=0.01, tokens_per_second=0, slow_every=6, slow_latency=2.0)
+    caller = make_caller(hedging_enabled=True, hedge_min_samples=5)
+
+    async def run():
+        for _ in range(5):
+            await caller.call("model", lambda: fake.arun("Oi"))
+        started = asyncio.get_running_loop().time()
+        # Call 6 is slow, the hedge (call 7) answers first
+        await caller.call("model", lambda: fake.arun("Oi"))
+        return asyncio.get_running_loop().time() - started
+
+    won_before = llm_calls.value(model="model", outcome="hedge_won")
+    elapsed = asyncio.run(run())
+    assert elapsed < 1.0
+    assert fake.calls == 7
+    assert llm_calls.value(model="model", outcome="hedge_won") == won_before + 1
+
+
+def test_unavailable_model_gets_a_friendly_reply():
+    fake = FakeGemini(latency=0, tokens_per_second=0, fail_every=1)
+
+    async def get_fake_agent(model_id=None, agentic_memory=True):
+        return fake
+
+    async def run():
+        service = UserRequestService()
+        await service.initialize(SimpleNamespace(notion_documents=[]))
+        service.get_classic_agent = get_fake_agent
+        service.llm_caller = make_caller(max_attempts=2)
+        return await service.process_user_request(
+            "Quanto custa o espeto de picanha?", 1
+        )
+
+    try:
+        response = asyncio.run(run())
+    finally:
+        vars(UserRequestService()).pop("get_classic_agent", None)
+    assert response.content == settings.llm_unavailable_message
+    assert fake.calls == 2
@@ -0,0 +1,359 @@
+import asyncio
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from core.server import create_server
+from core.settings import settings
+from main import close_postgres_pool, drain
+from models.models import InboundEvent, TelegramUpdate
+from routers.health import router as health_router
+from routers.webhooks import webhooks
+from services.cache_service import CacheService
+from services.health_service import HealthService
+from services.telegram_poller import TelegramPoller
+from services.update_service import UpdateService
+from services.update_stream import UpdateStream
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_event(event_id, chat_id, text="Oi"):
+    return InboundEvent(
+        channel="telegram", event_id=str(event_id), chat_id=chat_id, text=text
+    )
+
+
+def telegram_update(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1760900000,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+class SlowUserRequestService:
+    """Answers at once, except for the texts in `blocked`, which never finish."""
+
+    def __init__(self, blocked=()):
+        self.blocked = set(blocked)
+
+    async def process_user_request(self, text, chat_id, notify_busy=None):
+        if text in self.blocked:
+            await asyncio.Event().wait()
+        return SimpleNamespace(content=f"Resposta: {text}")
+
+
+async def make_update_service(redis_client, user_request_service):
+    cache_service = CacheService()
+    await cache_service.initialize(redis_client, prefix="test-shutdown")
+    telegram_service = MagicMock()
+    telegram_service.send_message = AsyncMock(return_value={"ok": True})
+    update_service = UpdateService()
+    await update_service.initialize(
+        user_request_service, telegram_service, cache_service=cache_service
+    )
+    return update_service
+
+
+def test_drain_parks_unfinished_runs_for_the_next_instance():
+    async def run():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        update_service = await make_update_service(
+            redis_client, SlowUserRequestService(blocked={"slow"})
+        )
+        health_service = HealthService()
+        await health_service.initialize(redis_client=redis_client, postgres_pool=None)
+        requests = asyncio.gather(
+            update_service.submit_events(
+                [make_event(1, 10, "slow"), make_event(2, 10, "depois")]
+            ),
+            update_service.submit_events([make_event(3, 11, "rápida")]),
+        )
+        await asyncio.sleep(0.05)
+        app = SimpleNamespace(
+            state=SimpleNamespace(
+                update_service=update_service, health_service=health_service
+            )
+        )
+        await drain(app, timeout=0.1)
+        ready, details = health_service.readiness()
+        interrupted = await asyncio.gather(requests, return_exceptions=True)
+        late = await update_service.submit_events([make_event(4, 12, "tarde")])
+        first_sends = list(update_service.telegram_service.send_message.await_args_list)
+        # The next instance starts with the same Redis
+        restarted = await make_update_service(redis_client, SlowUserRequestService())
+        resumed = await restarted.resume_parked()
+        await asyncio.gather(*restarted._background)
+        return ready, details, interrupted, late, first_sends, resumed, restarted
+
+    ready, details, interrupted, late, first_sends, resumed, restarted = asyncio.run(
+        run()
+    )
+    assert not ready and details["draining"] is True
+    assert isinstance(interrupted[0], asyncio.CancelledError)
+    assert [call.args for call in first_sends] == [(11, "Resposta: rápida")]
+    assert late[0].message == "Update queued"
+    assert resumed == 3
+    # Parked in order, so the chat's messages are still answered in order
+    assert [
+        call.args for call in restarted.telegram_service.send_message.await_args_list
+    ] == [(10, "Resposta: slow"), (10, "Resposta: depois"), (12, "Resposta: tarde")]
+    assert restarted.in_progress == 0
+
+
+def test_running_instances_pick_up_events_parked_after_they_started():
+    async def run():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        update_service = await make_update_service(
+            redis_client, SlowUserRequestService()
+        )
+        update_service.start_resuming(interval=0.02)
+        await asyncio.sleep(0.05)
+        # An older instance of a rolling deploy stops after this one started
+        await update_service.cache_service.park_events([make_event(5, 10, "tarde")])
+        while update_service.telegram_service.send_message.await_count == 0:
+            await asyncio.sleep(0.01)
+        await update_service.drain(timeout=1.0)
+        left = await update_service.cache_service.take_parked_events()
+        return update_service, left
+
+    update_service, left = asyncio.run(run())
+    assert [
+        call.args
+        for call in update_service.telegram_service.send_message.await_args_list
+    ] == [(10, "Resposta: tarde")]
+    assert left == [] and update_service._resume_loop is None
+
+
+def build_app(redis_server, order):
+    """App with the webhook and health routers whose lifespan shutdown is main.drain."""
+
+    @asynccontextmanager
+    async def lifespan(app):
+        redis_client = fakeredis.FakeAsyncRedis(
+            server=redis_server, decode_responses=True
+        )
+        app.state.update_service = await make_update_service(
+            redis_client, SlowUserRequestService(blocked={"slow"})
+        )
+        app.state.health_service = HealthService()
+        await app.state.health_service.initialize(
+            redis_client=redis_client, postgres_pool=None
+        )
+        park = app.state.update_service.park
+
+        async def recording_park(events):
+            if events:
+                order.append(("parked", [event.event_id for event in events]))
+            return await park(events)
+
+        app.state.update_service.park = recording_park
+        yield
+        order.append(("lifespan_shutdown", app.state.update_service.in_progress))
+        await drain(app, timeout=1.0)
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(webhooks)
+    app.include_router(health_router)
+    return app
+
+
+def test_sigterm_drains_before_uvicorn_stops_serving():
+    redis_server = fakeredis.FakeServer()
+    order = []
+    app = build_app(redis_server, order)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = create_server(
+        app,
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        timeout_graceful_shutdown=0.3,
+    )
+    # Off the main thread uvicorn installs no signal handlers; handle_exit is what they call
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            time.sleep(0.01)
+        with ThreadPoolExecutor(1) as pool:
+            request = pool.submit(
+                httpx.post,
+                f"http://127.0.0.1:{port}/webhook/telegram",
+                json=telegram_update(1, 10, "slow"),
+                timeout=10,
+            )
+            while app.state.update_service.in_progress == 0:
+                time.sleep(0.01)
+            server.handle_exit(signal.SIGTERM, None)
+            ready, details = app.state.health_service.readiness()
+            order.append(("signal", details["draining"]))
+            thread.join(timeout=10)
+            # Cancelled at the graceful timeout
+            assert request.result().status_code == 500
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        vars(UpdateService()).pop("park", None)
+
+    async def parked():
+        cache_service = CacheService()
+        await cache_service.initialize(
+            fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True),
+            prefix="test-shutdown",
+        )
+        return await cache_service.take_parked_events()
+
+    assert not ready
+    # Readiness flips on the signal; the request is cut at the graceful timeout,
+    # before the lifespan shutdown, and its update is parked
+    assert order == [("signal", True), ("parked", ["1"]), ("lifespan_shutdown", 0)]
+    assert [event.event_id for event in asyncio.run(parked())] == ["1"]
+
+
+def test_pre_stop_endpoint_parks_updates_received_while_draining():
+    redis_server = fakeredis.FakeServer()
+    order = []
+    app = build_app(redis_server, order)
+    token = settings.shutdown_drain_token
+    settings.shutdown_drain_token = "drain-me"
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://test"
+            ) as client:
+                forbidden = await client.post(
+                    "/health/drain", headers={"X-Drain-Token": "wrong"}
+                )
+                accepted = await client.post(
+                    "/health/drain", headers={"X-Drain-Token": "drain-me"}
+                )
+                ready = await client.get("/health/ready")
+                queued = await client.post(
+                    "/webhook/telegram", json=telegram_update(2, 11, "oi")
+                )
+        return forbidden, accepted, ready, queued
+
+    try:
+        forbidden, accepted, ready, queued = asyncio.run(run())
+    finally:
+        settings.shutdown_drain_token = token
+        vars(UpdateService()).pop("park", None)
+    assert forbidden.status_code == 403
+    assert accepted.status_code == 200
+    assert ready.status_code == 503 and ready.json()["details"]["draining"] is True
+    assert queued.json()["message"] == "Update queued"
+    assert order[0] == ("parked", ["2"])
+
+
+def test_poller_parks_updates_still_waiting_at_the_deadline():
+    def make_update(update_id, chat_id, text):
+        return TelegramUpdate.model_validate(telegram_update(update_id, chat_id, text))
+
+    async def run():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        update_service = await make_update_service(
+            redis_client, SlowUserRequestService(blocked={"slow"})
+        )
+        poller = TelegramPoller()
+        await poller.initialize(
+            MagicMock(), update_service, timeout=0, limit=10, concurrency=4
+        )
+        for update in (
+            make_update(1, 10, "slow"),
+            make_update(2, 10, "waiting"),
+            make_update(3, 11, "fast"),
+        ):
+            poller.dispatch(update)
+        await asyncio.sleep(0.05)
+        await poller.stop(timeout=0.1)
+        parked = await update_service.cache_service.take_parked_events()
+        return poller, parked, update_service
+
+    poller, parked, update_service = asyncio.run(run())
+    assert poller.pending == 0
+    assert sorted(event.event_id for event in parked) == ["1", "2"]
+    assert [
+        call.args
+        for call in update_service.telegram_service.send_message.await_args_list
+    ] == [(11, "Resposta: fast")]
+
+
+def test_stream_entries_interrupted_at_the_deadline_are_taken_over():
+    class RecordingUpdateService:
+        def __init__(self, block_on=None):
+            self.block_on = block_on
+            self.processed = []
+
+        async def process_event(
+            self, event, source="stream", received_at=None, before_reply=None
+        ):
+            if event.event_id == self.block_on:
+                await asyncio.Event().wait()
+            self.processed.append(event.event_id)
+
+    async def run():
+        server = fakeredis.FakeServer()
+        options = {
+            "prefix": "test-shutdown",
+            "partitions": 1,
+            "lease_ms": 300,
+            "block_ms": 20,
+        }
+        stopping = UpdateStream(
+            fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+            RecordingUpdateService(block_on="1"),
+            "worker-a",
+            **options,
+        )
+        await stopping.start()
+        await stopping.publish_many([make_event(1, 10), make_event(2, 10)])
+        while stopping.pending == 0:
+            await asyncio.sleep(0.01)
+        await stopping.stop(timeout=0.1)
+        update_service = RecordingUpdateService()
+        successor = UpdateStream(
+            fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+            update_service,
+            "worker-b",
+            **options,
+        )
+        # The lease was handed back, so the successor does not wait for it to expire
+        await successor.start()
+        while len(update_service.processed) < 2:
+            await asyncio.sleep(0.01)
+        await successor.stop()
+        return stopping, update_service
+
+    stopping, update_service = asyncio.run(run())
+    assert stopping.leases == {} and stopping.consumers == {}
+    assert update_service.processed == ["1", "2"]
+
+
+def test_postgres_pool_is_terminated_when_it_does_not_close_in_time():
+    async def never_closes():
+        await asyncio.Event().wait()
+
+    pool = MagicMock()
+    pool.close = never_closes
+    asyncio.run(close_postgres_pool(pool, timeout=0.05))
+    pool.terminate.assert_called_once()
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+from benchmarks.cold_start import (
+    ROOT,
+    benchmark_env,
+    measure_first_request,
+    measure_import,
+)
+from benchmarks.fakes import StubTelegramServer
+from core.metrics import startup_phase_duration
+from core.startup import StartupTimer
+
+
+def test_startup_timer_records_phases():
+    timer = StartupTimer()
+    with timer.phase("test_phase"):
+        import core.resilience  # noqa: F401
+    timer.record("test_import", 0.25, 10)
+    report = {item["phase"]: item for item in timer.report()}
+    assert set(report) == {"test_phase", "test_import"}
+    assert report["test_import"] == {"phase": "test_import", "ms": 250.0, "modules": 10}
+    assert startup_phase_duration.value(phase="test_import") == 0.25
+    assert timer.total >= 0.25
+
+
+def test_import_phase_starts_before_any_project_module():
+    script = (
+        "import sys; import core.startup; "
+        "print(sorted(name for name in sys.modules if name.split('.')[0] in ('core', 'utils', 'httpx')))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == "['core', 'core.startup']"
+
+
+def test_importing_main_defers_heavy_dependencies():
+    result = measure_import()
+    assert result["heavy_modules"] == []
+
+
+def test_time_to_first_request():
+    telegram = StubTelegramServer().start()
+    try:
+        result = measure_first_request(benchmark_env(telegram.url), timeout=30.0)
+    finally:
+        telegram.stop()
+    assert result["seconds"] < 30.0
+    assert {"import", "knowledge", "ingestion"} <= set(result["phases_ms"])
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from models.models import TelegramUpdate
+from services.telegram_poller import TelegramPoller
+
+
+def make_update(update_id, chat_id, text="Oi"):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1678886400,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+async def make_poller(batches, update_service):
+    telegram_service = MagicMock()
+    telegram_service.get_updates = AsyncMock(side_effect=batches)
+    poller = TelegramPoller()
+    await poller.initialize(
+        telegram_service, update_service, timeout=0, limit=10, concurrency=4
+    )
+    return poller, telegram_service
+
+
+def test_poll_advances_offset_and_skips_malformed_updates():
+    update_service = MagicMock()
+    update_service.submit = AsyncMock()
+
+    async def run():
+        poller, telegram_service = await make_poller(
+            [
+                [
+                    make_update(5, 1),
+                    {"update_id": 6, "message": {"bad": True}},
+                    make_update(7, 2),
+                ],
+                [],
+            ],
+            update_service,
+        )
+        assert await poller.poll_once() == 3
+        await asyncio.gather(*poller.tasks)
+        await poller.poll_once()
+        return poller, telegram_service
+
+    poller, telegram_service = asyncio.run(run())
+    assert poller.offset == 8
+    assert telegram_service.get_updates.await_args_list[1].kwargs["offset"] == 8
+    handled = [call.args[0].update_id for call in update_service.submit.await_args_list]
+    assert handled == [5, 7]
+    assert all(
+        call.kwargs["source"] == "polling"
+        for call in update_service.submit.await_args_list
+    )
+
+
+def test_updates_are_ordered_within_a_chat_and_concurrent_across_chats():
+    events = []
+
+    async def submit(update: TelegramUpdate, source: str, received_at=None):
+        chat_id = update.message.chat.id
+        events.append(("start", chat_id, update.update_id))
+        await asyncio.sleep(0.01 if update.update_id == 1 else 0)
+        events.append(("end", chat_id, update.update_id))
+        return SimpleNamespace(status="ok")
+
+    update_service = MagicMock()
+    update_service.submit = submit
+
+    async def run():
+        poller, _ = await make_poller(
+            [[make_update(1, 10), make_update(2, 10), make_update(3, 20)]],
+            update_service,
+        )
+        await poller.poll_once()
+        await poller.stop()
+        return poller
+
+    poller = asyncio.run(run())
+    # Chat 10 runs update 1 before 2; chat 20 does not wait for chat 10
+    assert events.index(("end", 10, 1)) < events.index(("start", 10, 2))
+    assert events.index(("end", 20, 3)) < events.index(("end", 10, 1))
+    assert poller.pending == 0
+    assert poller._chat_locks == {}
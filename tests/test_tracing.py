@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from core.settings import settings
+from core.tracing import (
+    FileSpanExporter,
+    SpanExporter,
+    Tracer,
+    create_span_exporter,
+    current_request_id,
+    format_span_tree,
+    tracer,
+)
+
+
+def test_spans_are_nested_under_the_trace():
+    local_tracer = Tracer()
+    with local_tracer.start_trace("telegram_webhook", update_id=1) as root:
+        request_id = current_request_id()
+        with (
+            local_tracer.span("process_user_request") as parent,
+            local_tracer.span("llm_generation", model="fake") as child,
+        ):
+            pass
+    assert request_id == root.trace_id
+    assert parent.parent_id == root.span_id
+    assert child.parent_id == parent.span_id
+    tree = format_span_tree([root, parent, child])
+    assert tree.splitlines()[2].startswith("    llm_generation")
+    assert current_request_id() is None
+
+
+def test_span_outside_trace_is_a_no_op():
+    with tracer.span("orphan") as span:
+        assert span is None
+
+
+def test_slow_and_sampled_traces_are_exported(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = FileSpanExporter(str(path))
+    local_tracer = Tracer()
+    local_tracer.configure(sample_rate=0.0, slow_threshold=0.0, exporter=exporter)
+    with local_tracer.start_trace("telegram_webhook"):
+        pass
+    exporter.shutdown()
+    payload = json.loads(path.read_text().splitlines()[0])
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert spans[0]["name"] == "telegram_webhook"
+    assert len(spans[0]["traceId"]) == 32
+
+
+def test_span_export_is_opt_in():
+    with pytest.raises(TypeError):
+        SpanExporter()
+    for kind in ("none", ""):
+        assert create_span_exporter(kind, settings.tracing_file_path) is None
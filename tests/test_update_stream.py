@@ -0,0 +1,252 @@
+import asyncio
+
+import pytest
+
+from models.models import InboundEvent, TelegramUpdate
+from services.cache_service import CacheService
+from services.update_service import UpdateService
+from services.update_stream import GROUP, UpdateStream
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_update(update_id, chat_id, text="Oi"):
+    return TelegramUpdate.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1678886400,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+                "text": text,
+            },
+        }
+    )
+
+
+class RecordingUpdateService:
+    def __init__(self, delay=0.0, block_on=None):
+        self.processed = []
+        self.delay = delay
+        self.block_on = block_on
+
+    async def process_event(
+        self, event, source="webhook", received_at=None, before_reply=None
+    ):
+        if event.event_id == self.block_on:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delay)
+        self.processed.append((event.chat_id, event.event_id, source))
+
+
+def make_stream(server, update_service, worker_id, **kwargs):
+    redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    options = {"prefix": "test", "partitions": 4, "lease_ms": 300, "block_ms": 20}
+    options.update(kwargs)
+    return UpdateStream(redis_client, update_service, worker_id, **options)
+
+
+async def wait_for(condition, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.01)
+
+
+def test_updates_are_processed_in_order_per_chat():
+    async def run():
+        server = fakeredis.FakeServer()
+        update_service = RecordingUpdateService()
+        stream = make_stream(server, update_service, "worker-a")
+        await stream.start()
+        for update_id, chat_id in [(1, 10), (2, 11), (3, 10), (4, 11), (5, 10)]:
+            await stream.publish(
+                InboundEvent.from_telegram(make_update(update_id, chat_id))
+            )
+        await wait_for(lambda: len(update_service.processed) == 5)
+        pending = await stream.redis_client.xpending(
+            stream.stream_key(stream.partition(10)), GROUP
+        )
+        await stream.stop()
+        return stream, update_service, pending
+
+    stream, update_service, pending = asyncio.run(run())
+    assert [
+        event_id for chat_id, event_id, _ in update_service.processed if chat_id == 10
+    ] == ["1", "3", "5"]
+    assert all(source == "stream" for _, _, source in update_service.processed)
+    assert pending["pending"] == 0
+    assert stream.leases == {}
+
+
+def test_workers_share_partitions():
+    async def run():
+        server = fakeredis.FakeServer()
+        first = make_stream(server, RecordingUpdateService(), "worker-a")
+        second = make_stream(server, RecordingUpdateService(), "worker-b")
+        await first.start()
+        owned_alone = set(first.leases)
+        await second.start()
+        await first.rebalance()
+        # Partitions over the share are handed back in the background
+        await asyncio.gather(*first._releasing.values())
+        await second.rebalance()
+        owned = (set(first.leases), set(second.leases))
+        await first.stop()
+        await second.stop()
+        return owned_alone, owned
+
+    owned_alone, (first, second) = asyncio.run(run())
+    assert owned_alone == {0, 1, 2, 3}
+    assert len(first) == 2 and len(second) == 2
+    assert first.isdisjoint(second)
+
+
+def test_slow_event_during_a_rebalance_is_answered_once():
+    completed = []
+
+    class SlowUpdateService:
+        def __init__(self, worker_id):
+            self.worker_id = worker_id
+
+        async def process_event(
+            self, event, source="webhook", received_at=None, before_reply=None
+        ):
+            await asyncio.sleep(0.6)
+            if before_reply is None or await before_reply():
+                completed.append((self.worker_id, event.event_id))
+
+    async def run():
+        server = fakeredis.FakeServer()
+        first = make_stream(server, SlowUpdateService("a"), "worker-a", partitions=2)
+        await first.start()
+        # Chat 10 goes to partition 0, which worker-a keeps; chat 11 to partition 1, which it gives up
+        await first.publish_many(
+            [
+                InboundEvent.from_telegram(make_update(1, 10)),
+                InboundEvent.from_telegram(make_update(2, 11)),
+            ]
+        )
+        await wait_for(lambda: first.pending == 2)
+        second = make_stream(server, SlowUpdateService("b"), "worker-b", partitions=2)
+        await second.start()
+        # Both events outlive the 300ms lease; the kept lease must be renewed meanwhile
+        await wait_for(lambda: len(completed) == 2)
+        await asyncio.sleep(0.3)
+        owned = (set(first.leases), set(second.leases))
+        await first.stop()
+        await second.stop()
+        return owned
+
+    owned = asyncio.run(run())
+    assert owned == ({0}, {1})
+    # The event in the kept partition is not claimed by the new worker, and the
+    # one in the released partition is answered by its new owner only
+    assert sorted(completed) == [("a", "1"), ("b", "2")]
+
+
+def test_unacknowledged_updates_are_taken_over():
+    async def run():
+        server = fakeredis.FakeServer()
+        crashed = make_stream(
+            server, RecordingUpdateService(block_on="1"), "worker-a", partitions=1
+        )
+        await crashed.start()
+        await crashed.publish_many(
+            [
+                InboundEvent.from_telegram(make_update(update_id, 10))
+                for update_id in (1, 2)
+            ]
+        )
+        await wait_for(lambda: crashed.pending > 0)
+        # Simulate a crash: tasks die without acking or releasing the lease
+        crashed._task.cancel()
+        for consumer in crashed.consumers.values():
+            consumer.cancel()
+        await asyncio.sleep(0.4)
+        update_service = RecordingUpdateService()
+        survivor = make_stream(server, update_service, "worker-b", partitions=1)
+        await survivor.start()
+        await wait_for(lambda: len(update_service.processed) == 2)
+        await survivor.stop()
+        return update_service
+
+    update_service = asyncio.run(run())
+    assert [event_id for _, event_id, _ in update_service.processed] == ["1", "2"]
+
+
+def test_submit_drops_duplicates_and_queues():
+    async def run():
+        server = fakeredis.FakeServer()
+        redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        cache_service = CacheService()
+        await cache_service.initialize(redis_client, prefix="test")
+        stream = make_stream(server, RecordingUpdateService(), "worker-a")
+        update_service = UpdateService()
+        await update_service.initialize(
+            None, None, cache_service=cache_service, update_stream=stream
+        )
+        first = await update_service.submit(make_update(7, 10))
+        second = await update_service.submit(make_update(7, 10))
+        length = await redis_client.xlen(stream.stream_key(stream.partition(10)))
+        return first, second, length
+
+    first, second, length = asyncio.run(run())
+    assert first.message == "Update queued"
+    assert second.message == "Duplicate update ignored"
+    assert length == 1
+
+
+def test_whatsapp_events_share_the_stream():
+    async def run():
+        server = fakeredis.FakeServer()
+        update_service = RecordingUpdateService()
+        stream = make_stream(server, update_service, "worker-a")
+        await stream.start()
+        await stream.publish_many(
+            [
+                InboundEvent(
+                    channel="whatsapp",
+                    event_id=f"wamid.{index}",
+                    chat_id="5511987650001",
+                    text="Oi",
+                )
+                for index in range(3)
+            ]
+        )
+        # Older workers published Telegram updates as such
+        await stream.redis_client.xadd(
+            stream.stream_key(stream.partition(10)),
+            {
+                "update": make_update(4, 10).model_dump_json(by_alias=True),
+                "enqueued_at": "0",
+            },
+        )
+        await wait_for(lambda: len(update_service.processed) == 4)
+        await stream.stop()
+        return update_service
+
+    update_service = asyncio.run(run())
+    assert [
+        event_id
+        for chat_id, event_id, _ in update_service.processed
+        if chat_id == "5511987650001"
+    ] == ["wamid.0", "wamid.1", "wamid.2"]
+    assert (10, "4", "stream") in update_service.processed
+
+
+def test_answer_cache_is_shared_and_normalized():
+    async def run():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        cache_service = CacheService()
+        await cache_service.initialize(redis_client, prefix="test", answer_ttl=60)
+        await cache_service.set_answer("Qual o horário?", "Das 18h às 23h")
+        return await cache_service.get_answer(
+            "qual o horario"
+        ), await cache_service.get_answer("outra coisa")
+
+    hit, miss = asyncio.run(run())
+    assert hit == "Das 18h às 23h"
+    assert miss is None
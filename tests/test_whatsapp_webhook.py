@@ -0,0 +1,340 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from benchmarks.fakes import StubGraphAPIServer
+from core.metrics import message_statuses
+from core.settings import settings
+from core.tracing import FileSpanExporter, tracer
+from main import app
+from models.models import TelegramUpdate, WhatsAppWebhook
+from services.cache_service import CacheService
+from services.update_service import UpdateService
+from services.update_stream import UpdateStream
+from services.whatsapp_service import WhatsAppService
+
+fakeredis = pytest.importorskip("fakeredis")
+
+PAYLOADS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "benchmarks",
+    "payloads",
+    "whatsapp_webhooks.jsonl",
+)
+APP_SECRET = "whatsapp-test-secret"
+
+
+def load_payloads():
+    with open(PAYLOADS, encoding="utf-8") as f:
+        return [line.strip().encode("utf-8") for line in f if line.strip()]
+
+
+def sign(body, secret=APP_SECRET):
+    return (
+        "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    )
+
+
+@pytest.fixture
+def graph_api():
+    server = StubGraphAPIServer().start()
+    api_url = settings.whatsapp_api_url
+    settings.whatsapp_api_url = server.url
+    yield server
+    settings.whatsapp_api_url = api_url
+    server.stop()
+    for name in (
+        "knowledge_service",
+        "user_request_service",
+        "telegram_service",
+        "update_service",
+        "whatsapp_service",
+    ):
+        if hasattr(app.state, name):
+            delattr(app.state, name)
+
+
+async def setup_pipeline():
+    user_request_service = MagicMock()
+    user_request_service.process_user_request = AsyncMock(
+        side_effect=lambda text, chat_id, notify_busy=None: SimpleNamespace(
+            content=f"Resposta: {text}"
+        )
+    )
+    whatsapp_service = WhatsAppService()
+    await whatsapp_service.initialize(
+        access_token="graph-test-token",
+        phone_number_id="106540352242922",
+        verify_token="verify-me",
+        app_secret=APP_SECRET,
+    )
+    cache_service = CacheService()
+    await cache_service.initialize(
+        fakeredis.FakeAsyncRedis(decode_responses=True), prefix="test-whatsapp"
+    )
+    update_service = UpdateService()
+    await update_service.initialize(
+        user_request_service,
+        MagicMock(),
+        cache_service=cache_service,
+        whatsapp_service=whatsapp_service,
+    )
+    app.state.knowledge_service = MagicMock()
+    app.state.user_request_service = user_request_service
+    app.state.telegram_service = update_service.telegram_service
+    app.state.update_service = update_service
+    app.state.whatsapp_service = whatsapp_service
+    return update_service
+
+
+def test_payloads_are_normalised_in_bulk():
+    batch = WhatsAppWebhook.model_validate_json(load_payloads()[1])
+    events = batch.events()
+    assert [(event.chat_id, event.text) for event in events] == [
+        ("5511987650002", "Vocês abrem hoje?"),
+        ("5521998760003", "Quanto custa o espeto de picanha?"),
+        ("5511987650002", "E até que horas?"),
+    ]
+    assert all(
+        event.channel == "whatsapp" and event.event_id.startswith("wamid.")
+        for event in events
+    )
+    assert [status.status for status in batch.statuses()] == ["delivered"]
+    media = WhatsAppWebhook.model_validate_json(load_payloads()[3]).events()
+    assert [event.text for event in media] == [None, "Ver cardápio"]
+
+
+def test_webhook_verification(graph_api):
+    async def run():
+        await setup_pipeline()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            params = {
+                "hub.mode": "subscribe",
+                "hub.verify_token": "verify-me",
+                "hub.challenge": "1158201444",
+            }
+            accepted = await client.get("/webhook/whatsapp", params=params)
+            rejected = await client.get(
+                "/webhook/whatsapp",
+                params=dict(params, **{"hub.verify_token": "wrong"}),
+            )
+        await app.state.whatsapp_service.close()
+        return accepted, rejected
+
+    accepted, rejected = asyncio.run(run())
+    assert accepted.status_code == 200 and accepted.text == "1158201444"
+    assert rejected.status_code == 403
+
+
+def test_recorded_webhooks_are_answered_through_the_graph_api(graph_api):
+    async def run():
+        update_service = await setup_pipeline()
+        transport = httpx.ASGITransport(app=app)
+        responses = []
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            for body in load_payloads():
+                response = await client.post(
+                    "/webhook/whatsapp",
+                    content=body,
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Hub-Signature-256": sign(body),
+                    },
+                )
+                responses.append(response.json())
+            forged = await client.post(
+                "/webhook/whatsapp",
+                content=load_payloads()[0],
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Hub-Signature-256": sign(load_payloads()[0], "other"),
+                },
+            )
+        # Acknowledged at once, answered in the background
+        await asyncio.gather(*update_service._background)
+        await app.state.whatsapp_service.close()
+        return update_service, responses, forged
+
+    failed_before = message_statuses.value(channel="whatsapp", status="failed")
+    update_service, responses, forged = asyncio.run(run())
+    assert [response["data"]["results"] for response in responses] == [
+        ["Update accepted"],
+        ["Update accepted"] * 3,
+        [],
+        ["Update accepted"] * 2,
+        ["Duplicate update ignored"],
+    ]
+    assert responses[2]["message"] == "Processed 0 messages and 2 statuses"
+    assert (
+        message_statuses.value(channel="whatsapp", status="failed") == failed_before + 1
+    )
+    assert forged.status_code == 401
+    sent = [
+        (message["to"], message["text"]["body"]) for message in graph_api.sent_messages
+    ]
+    assert len(sent) == 5
+    assert sent[0] == ("5511987650001", "Resposta: Oi, boa noite!")
+    # In order within a chat, whatever the interleaving with other chats
+    assert [body for to, body in sent if to == "5511987650002"] == [
+        "Resposta: Vocês abrem hoje?",
+        "Resposta: E até que horas?",
+    ]
+    assert ("5521998760003", "Resposta: Ver cardápio") in sent
+    assert all(
+        message["phone_number_id"] == "106540352242922"
+        for message in graph_api.sent_messages
+    )
+    assert update_service.outbound.pending == 0
+
+
+def test_webhook_is_acknowledged_before_the_answer(graph_api):
+    async def run():
+        update_service = await setup_pipeline()
+        answering = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_answer(text, chat_id, notify_busy=None):
+            answering.set()
+            await release.wait()
+            return SimpleNamespace(content=f"Resposta: {text}")
+
+        update_service.user_request_service.process_user_request = AsyncMock(
+            side_effect=slow_answer
+        )
+        body = load_payloads()[0]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            response = await client.post(
+                "/webhook/whatsapp",
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Hub-Signature-256": sign(body),
+                },
+            )
+        await answering.wait()
+        sent_before = len(graph_api.sent_messages)
+        release.set()
+        await asyncio.gather(*update_service._background)
+        await app.state.whatsapp_service.close()
+        return response, sent_before
+
+    response, sent_before = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.json()["data"]["results"] == ["Update accepted"]
+    assert sent_before == 0
+    assert len(graph_api.sent_messages) == 1
+
+
+def test_whatsapp_requires_an_app_secret():
+    with pytest.raises(ValueError):
+        asyncio.run(
+            WhatsAppService().initialize(
+                access_token="graph-test-token", phone_number_id="106540352242922"
+            )
+        )
+    # Without a secret no signature is valid
+    body = load_payloads()[0]
+    assert not WhatsAppService.verify_signature(
+        SimpleNamespace(app_secret=""), body, sign(body)
+    )
+
+
+def test_whatsapp_and_telegram_share_the_queue():
+    async def run():
+        server = fakeredis.FakeServer()
+        redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        stream = UpdateStream(
+            redis_client, None, "worker-a", prefix="test-channels", partitions=4
+        )
+        update_service = UpdateService()
+        await update_service.initialize(None, None, update_stream=stream)
+        result = await update_service.submit_whatsapp(
+            WhatsAppWebhook.model_validate_json(load_payloads()[1])
+        )
+        await update_service.submit(
+            TelegramUpdate.model_validate(
+                {
+                    "update_id": 1,
+                    "message": {
+                        "message_id": 1,
+                        "date": 1760900000,
+                        "chat": {"id": 10, "type": "private"},
+                        "text": "Oi",
+                    },
+                }
+            )
+        )
+        lengths = [
+            await redis_client.xlen(stream.stream_key(partition))
+            for partition in range(4)
+        ]
+        entries = await redis_client.xrange(
+            stream.stream_key(stream.partition("5511987650002"))
+        )
+        return result, lengths, entries
+
+    result, lengths, entries = asyncio.run(run())
+    assert result.data["results"] == ["Update queued"] * 3
+    assert sum(lengths) == 4
+    assert [
+        json.loads(fields["event"])["text"]
+        for _, fields in entries
+        if "5511987650002" in fields["event"]
+    ] == ["Vocês abrem hoje?", "E até que horas?"]
+
+
+def test_background_answers_get_a_trace_of_their_own(graph_api, tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = FileSpanExporter(str(path))
+
+    async def run():
+        update_service = await setup_pipeline()
+        body = load_payloads()[0]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            await client.post(
+                "/webhook/whatsapp",
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Hub-Signature-256": sign(body),
+                },
+            )
+        await asyncio.gather(*update_service._background)
+        await app.state.whatsapp_service.close()
+
+    previous = vars(tracer).copy()
+    tracer.configure(sample_rate=1.0, exporter=exporter)
+    try:
+        asyncio.run(run())
+    finally:
+        vars(tracer).update(previous)
+        exporter.shutdown()
+    traces = [
+        json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        for line in path.read_text().splitlines()
+    ]
+    roots = {spans[0]["name"]: spans for spans in traces}
+    assert set(roots) == {"whatsapp_webhook", "whatsapp_event"}
+    event_spans = roots["whatsapp_event"]
+    assert event_spans[0]["parentSpanId"] == ""
+    stage = next(span for span in event_spans if span["name"] == "webhook")
+    assert stage["parentSpanId"] == event_spans[0]["spanId"]
+    assert stage["traceId"] != roots["whatsapp_webhook"][0]["traceId"]
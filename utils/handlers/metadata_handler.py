@@ -1,55 +1,66 @@
-from datetime import datetime, date
-from typing import Any, Dict, List, Union
+from collections.abc import Iterable
+from datetime import date, datetime
+from typing import Any
 
-def data_handler(data: Union[Dict, List, Any], parent_key: str = "") -> Dict[str, Any]:
+
+def parse_properties(value: str) -> list[str] | None:
+    """
+    Parses a comma separated property whitelist. An empty string means every property.
+    """
+    properties = [name.strip() for name in value.split(",") if name.strip()]
+    return properties or None
+
+
+def data_handler(
+    data: dict | list | Any,
+    parent_key: str = "",
+    properties: Iterable[str] | None = None,
+) -> dict[str, Any]:
     """
     Handles metadata retrieval for any data source.
 
     Returns:
         A dictionary with cleaned metadata.
         If the input is a dictionary, it flattens the structure and handles special cases.
+        With `properties`, only those top-level keys are kept.
+
+    The structure is walked with an explicit stack and every value is written
+    once into a single result dict, so the cost is linear in the size of the
+    metadata however deep it is nested.
     """
+    cleaned_data: dict[str, Any] = {}
     if not data:
-        return {}
-
-    cleaned_data = {}
-
-    if isinstance(data, dict):
-        # Special handling for Notion-style date objects
-        if 'start' in data or 'end' in data:
-            start_date = data.get('start')
-            end_date = data.get('end')
-            if start_date:
-                cleaned_data[f"{parent_key}_start"] = str(start_date)
-            if end_date:
-                cleaned_data[f"{parent_key}_end"] = str(end_date)
-            return cleaned_data
-
-        # Generic dictionary flattening
-        for key, value in data.items():
-            new_key = f"{parent_key}_{key}" if parent_key else key
-            cleaned_data.update(data_handler(value, new_key))
-        return cleaned_data
-    
-    elif isinstance(data, list):
-        # Handle lists by recursively processing each item
-        for index, item in enumerate(data):
-            new_key = f"{parent_key}_{index}" if parent_key else str(index)
-            cleaned_data.update(data_handler(item, new_key))
         return cleaned_data
+    whitelist = set(properties) if properties is not None else None
+    if isinstance(data, dict) and whitelist is not None:
+        data = {key: value for key, value in data.items() if key in whitelist}
 
-    elif isinstance(data, (str, int, float, bool)) or data is None:
-        if parent_key:
-            cleaned_data[parent_key] = data
-        return cleaned_data
-
-    elif isinstance(data, (datetime, date)):
-        # If data is a datetime object, convert it to ISO format
-        if parent_key:
-            cleaned_data[parent_key] = data.isoformat()
-        return cleaned_data
-    
-    else:
-        if parent_key:
-            cleaned_data[parent_key] = data
-        return cleaned_data
\ No newline at end of file
+    stack: list[tuple[str, Any]] = [(parent_key, data)]
+    pop, push = stack.pop, stack.append
+    while stack:
+        key, value = pop()
+        if not value:
+            continue
+        if isinstance(value, dict):
+            # Special handling for Notion-style date objects
+            if "start" in value or "end" in value:
+                if value.get("start"):
+                    cleaned_data[f"{key}_start"] = str(value["start"])
+                if value.get("end"):
+                    cleaned_data[f"{key}_end"] = str(value["end"])
+                continue
+            # Children are pushed in reverse so they come out in their original order
+            prefix = key + "_" if key else ""
+            for child in reversed(value):
+                push((prefix + str(child), value[child]))
+        elif isinstance(value, list):
+            prefix = key + "_" if key else ""
+            for index in range(len(value) - 1, -1, -1):
+                push((prefix + str(index), value[index]))
+        elif isinstance(value, (datetime, date)):
+            # If data is a datetime object, convert it to ISO format
+            if key:
+                cleaned_data[key] = value.isoformat()
+        elif key:
+            cleaned_data[key] = value
+    return cleaned_data
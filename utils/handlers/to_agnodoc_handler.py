@@ -1,23 +1,38 @@
-from langchain_core.documents.base import Document
+from collections.abc import Iterable, Iterator
+
 from agno.document.base import Document as AgnoDocument
+from langchain_core.documents.base import Document
+
 from utils.handlers.metadata_handler import data_handler
 from utils.tools.log_tool import log_message
 
-async def to_agnodoc_helper(documents: list[Document]) -> list[AgnoDocument]:
-        """
-        Converts LangChain Document objects to Agno Document objects.
-        """
-        agno_docs: list[AgnoDocument] = []
+
+def iter_agnodocs(
+    documents: Iterable[Document], properties: Iterable[str] | None = None
+) -> Iterator[AgnoDocument]:
+    """
+    Lazily converts LangChain Document objects to Agno Document objects, one
+    at a time, so ingestion can start before the source is exhausted.
+    Documents that fail to convert are logged and skipped.
+    """
+    properties = list(properties) if properties is not None else None
+    for doc in documents:
         try:
-            for doc in documents:
-                cleaned_metadata = data_handler(doc.metadata)
-                agno_doc = AgnoDocument(
-                    id=doc.id,
-                    content=doc.page_content,
-                    meta_data=cleaned_metadata
-                )
-                agno_docs.append(agno_doc)
-            return agno_docs
+            yield AgnoDocument(
+                id=doc.id,
+                content=doc.page_content,
+                meta_data=data_handler(doc.metadata, properties=properties),
+            )
         except Exception as e:
-            log_message(f"Error converting documents: {e}", "ERROR")
-        return agno_docs
\ No newline at end of file
+            log_message(
+                f"Error converting document {getattr(doc, 'id', None)}: {e}", "ERROR"
+            )
+
+
+async def to_agnodoc_helper(
+    documents: list[Document], properties: Iterable[str] | None = None
+) -> list[AgnoDocument]:
+    """
+    Converts LangChain Document objects to Agno Document objects.
+    """
+    return list(iter_agnodocs(documents, properties))
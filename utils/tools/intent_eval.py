@@ -0,0 +1,118 @@
+"""
+Offline evaluation of the local intent router over logged questions.
+
+Usage:
+    python -m utils.tools.intent_eval [questions.jsonl]
+
+Each JSONL line may be a plain record ({"text": ...} / {"question": ...}) or a
+recorded Telegram update ({"message": {"text": ...}}). An optional "intent"
+field is used as the expected label to compute accuracy.
+
+Questions go through the whole classifier, rules then embedding nearest
+neighbour, with the embedder the bot uses (when configured). The evaluation
+runs on an instance of its own, never on the service answering users.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator
+from typing import Any
+
+from core.settings import settings
+from services.intent_service import IntentService
+
+
+def extract_question(record: dict[str, Any]) -> str | None:
+    for key in ("text", "question", "user_input"):
+        if isinstance(record.get(key), str):
+            return record[key]
+    for key in ("message", "edited_message"):
+        message = record.get(key)
+        if isinstance(message, dict) and isinstance(message.get("text"), str):
+            return message["text"]
+    return None
+
+
+def read_questions(path: str) -> Iterator[tuple[str, str | None]]:
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            question = extract_question(record)
+            if question:
+                yield question, record.get("intent")
+
+
+async def evaluate(
+    path: str,
+    documents: list | None = None,
+    embedder: Any | None = None,
+    similarity_threshold: float | None = None,
+) -> dict[str, Any]:
+    """
+    Classifies every logged question and returns a summary. Raises ValueError
+    when the file has no question in a known format.
+    """
+    service = IntentService.standalone()
+    await service.initialize(
+        documents=documents,
+        embedder=embedder,
+        similarity_threshold=similarity_threshold,
+    )
+
+    intents: Counter = Counter()
+    methods: Counter = Counter()
+    total = templated = labelled = correct = 0
+    latencies = []
+    for question, expected in read_questions(path):
+        start = time.perf_counter()
+        match = await service.classify(question)
+        latencies.append(time.perf_counter() - start)
+        total += 1
+        intents[match.intent or "open_ended"] += 1
+        methods[match.method] += 1
+        templated += int(match.is_templated)
+        if expected is not None:
+            labelled += 1
+            correct += int((match.intent or "open_ended") == expected)
+    if not total:
+        raise ValueError(f"No questions found in {path}")
+
+    latencies.sort()
+    return {
+        "total": total,
+        "answered_locally": templated,
+        "local_ratio": templated / total,
+        "intents": dict(intents),
+        "methods": dict(methods),
+        "embeddings": bool(service.example_embeddings),
+        "accuracy": correct / labelled if labelled else None,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    embedder = (
+        settings.embedder
+        if settings.intent_embeddings_enabled and settings.google_api_key
+        else None
+    )
+    try:
+        report = asyncio.run(
+            evaluate(
+                sys.argv[1] if len(sys.argv) > 1 else "questions.jsonl",
+                embedder=embedder,
+            )
+        )
+    except ValueError as e:
+        sys.exit(str(e))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
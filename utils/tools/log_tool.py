@@ -1,22 +1,219 @@
+"""
+Structured, non-blocking logging.
+
+`log_message` keeps its original signature, but records are now pushed onto a
+bounded queue and written as JSON lines (or coloured text with
+LOG_FORMAT=console) by a background listener thread, so stdout I/O is off the
+request path. INFO and DEBUG messages are truncated to LOG_MAX_CHARS (warnings
+and errors, such as slow-request span trees, are kept whole), records below LOG_LEVEL
+are dropped before any formatting, and INFO lines are sampled
+(LOG_INFO_SAMPLE_RATE) and rate-limited (LOG_INFO_RATE_LIMIT per second).
+Records dropped because the queue was full are counted (`dropped_records`)
+and exported as a metric.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import TextIO
+
 # Define ANSI escape codes for colors and reset
-RED = '\033[91m'
-GREEN = '\033[92m'
-BLUE = '\033[94m'
-YELLOW = '\033[93m'
-MAGENTA = '\033[95m'
-RESET = '\033[0m'
+RED = "\033[91m"
+GREEN = "\033[92m"
+BLUE = "\033[94m"
+YELLOW = "\033[93m"
+MAGENTA = "\033[95m"
+RESET = "\033[0m"
+
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "SUCCESS": SUCCESS,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+COLORS = {
+    "INFO": BLUE,
+    "SUCCESS": GREEN,
+    "ERROR": RED,
+    "WARNING": YELLOW,
+    "DEBUG": MAGENTA,
+}
+
+logger = logging.getLogger("espetos")
+logger.propagate = False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed_info_lines"] = suppressed
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        color = COLORS.get(record.levelname, RESET)
+        return f"{color}{record.levelname} {RESET}{record.getMessage()}"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler over a bounded queue that drops records instead of blocking.
+    """
+
+    dropped: int = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class InfoRateLimiter:
+    """
+    Token bucket shared by all INFO records, plus random sampling.
+    """
+
+    def __init__(self, rate: float, sample_rate: float):
+        self.rate = rate
+        self.sample_rate = sample_rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.suppressed += 1
+            return False
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+            return True
+
+
+class _LogState:
+    level: int = logging.INFO
+    max_chars: int = 1000
+    handler: DroppingQueueHandler | None = None
+    # Dropped by the handlers of earlier configurations
+    dropped: int = 0
+    listener: logging.handlers.QueueListener | None = None
+    limiter: InfoRateLimiter = InfoRateLimiter(rate=0, sample_rate=1.0)
+
+
+_state = _LogState()
+
+
+def configure_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    max_chars: int = 1000,
+    info_rate_limit: float = 50.0,
+    info_sample_rate: float = 1.0,
+    queue_size: int = 10000,
+    stream: TextIO | None = None,
+) -> None:
+    """
+    (Re)configures the logging backend and starts the background listener.
+    """
+    shutdown_logging()
+    if _state.handler is not None:
+        _state.dropped += _state.handler.dropped
+    _state.level = LEVELS.get(level.upper(), logging.INFO)
+    _state.max_chars = max_chars
+    _state.limiter = InfoRateLimiter(rate=info_rate_limit, sample_rate=info_sample_rate)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(ConsoleFormatter() if fmt == "console" else JsonFormatter())
+    _state.handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _state.listener = logging.handlers.QueueListener(_state.handler.queue, output)
+    logger.handlers = [_state.handler]
+    logger.setLevel(_state.level)
+    _state.listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flushes the queued records and stops the background listener.
+    """
+    if _state.listener is not None:
+        _state.listener.stop()
+        _state.listener = None
+
+
+def dropped_records() -> int:
+    """
+    Records dropped since startup because the log queue was full.
+    """
+    return _state.dropped + (_state.handler.dropped if _state.handler else 0)
+
+
+def _request_id() -> str | None:
+    # Imported lazily: core.tracing itself logs through this module
+    tracing = sys.modules.get("core.tracing")
+    return tracing.current_request_id() if tracing else None
+
+
+def _truncate(message: str) -> str:
+    if _state.max_chars and len(message) > _state.max_chars:
+        return f"{message[: _state.max_chars]}...(+{len(message) - _state.max_chars} chars)"
+    return message
+
 
 def log_message(message: str, level: str = "INFO") -> None:
     """
-    Logs a message with a specific level and color.
-        message (str): The message to log.
+    Logs a message with a specific level.
+        message (str): The log message.
         level (str): The log level (e.g., "INFO", "SUCCESS", "ERROR", "WARNING", "DEBUG").
     """
-    color = {
-        "INFO": BLUE,
-        "SUCCESS": GREEN,
-        "ERROR": RED,
-        "WARNING": YELLOW,
-        "DEBUG": MAGENTA
-    }.get(level, RESET)
-    print(f"{color}{level} {RESET}{message}")
\ No newline at end of file
+    levelno = LEVELS.get(level, logging.INFO)
+    if levelno < _state.level:
+        return
+    suppressed = 0
+    if levelno == logging.INFO:
+        if not _state.limiter.allow():
+            return
+        suppressed, _state.limiter.suppressed = _state.limiter.suppressed, 0
+    message = _truncate(str(message)) if levelno < logging.WARNING else str(message)
+    logger.log(
+        levelno, message, extra={"request_id": _request_id(), "suppressed": suppressed}
+    )
+
+
+configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    fmt=os.getenv("LOG_FORMAT", "json"),
+    max_chars=int(os.getenv("LOG_MAX_CHARS", "1000")),
+    info_rate_limit=float(os.getenv("LOG_INFO_RATE_LIMIT", "50")),
+    info_sample_rate=float(os.getenv("LOG_INFO_SAMPLE_RATE", "1.0")),
+)
+atexit.register(shutdown_logging)